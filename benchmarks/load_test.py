@@ -0,0 +1,269 @@
+"""
+Load test of the API against a local SQLite database.
+
+Seeds a fresh SQLite file with ``--users`` users of ``--sessions`` sessions
+each (through the same chunked import path as ``POST /users:import``, so the
+stats rollups are populated), boots ``main:app`` under uvicorn in a
+subprocess, then drives a weighted mix of CRUD and list requests from
+``--concurrency`` threads, each on its own keep-alive connection, for
+``--duration`` seconds. Throughput and p50/p95/p99 latency per scenario are
+written as JSON (keys sorted, so two reports diff cleanly) and printed.
+
+    python -m benchmarks.load_test [--users 2000] [--sessions 10] [--concurrency 8]
+                                   [--duration 20] [--output load.json] [--compare old.json]
+
+Pass ``--compare`` with a report from another commit to print the change in
+throughput and latency next to the new numbers.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+# Scenario name -> relative weight in the request mix
+SCENARIOS = {
+    "GET /users": 10,
+    "GET /users/{user_id}": 25,
+    "GET /users/{user_id}/matcha-sessions": 15,
+    "GET /matcha-sessions": 10,
+    "GET /matcha-sessions/{session_id}": 20,
+    "POST /matcha-sessions": 10,
+    "PUT /matcha-sessions/{session_id}": 10,
+}
+
+MATCHA_TYPES = ("Ceremonial Grade", "Premium Grade", "Culinary Grade", "Latte Grade")
+BRANDS = ("Ippodo", "Marukyu Koyamaen", "Aiya", "Encha", None)
+
+
+def session_body(rng: random.Random) -> dict:
+    return {
+        "session_date": (date(2024, 1, 1) + timedelta(days=rng.randrange(730))).isoformat(),
+        "location": rng.choice(("Home", "Office", "Cafe")),
+        "matcha_type": rng.choice(MATCHA_TYPES),
+        "brand": rng.choice(BRANDS),
+        "rating": round(rng.uniform(1, 5), 1),
+    }
+
+
+def seed(users: int, sessions: int, rng: random.Random):
+    """Fill the database named by DATABASE_URL; return (user ids, session ids)."""
+    from models.db_models import MatchaSessionDB, UserDB
+    from services.bulk import import_users_chunk
+    from utils.database import SessionLocal, init_db
+
+    init_db()
+    chunk = []
+    for i in range(users):
+        line = {
+            "username": f"load_user_{i}", "email": f"load_user_{i}@example.com",
+            "first_name": "Load", "last_name": f"User{i}",
+            "matcha_sessions": [session_body(rng) for _ in range(sessions)],
+        }
+        chunk.append((i + 1, json.dumps(line).encode()))
+        if len(chunk) == 500 or i == users - 1:
+            db = SessionLocal()
+            try:
+                import_users_chunk(db, chunk)
+            finally:
+                db.close()
+            chunk = []
+    db = SessionLocal()
+    try:
+        return [r[0] for r in db.query(UserDB.id)], [r[0] for r in db.query(MatchaSessionDB.id)]
+    finally:
+        db.close()
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: int, env: dict, workers: int) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        env=env,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"server exited with status {server.returncode}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/")
+            conn.getresponse().read()
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("server did not start within 30 seconds")
+
+
+class Worker(threading.Thread):
+    """Sends requests from the scenario mix until ``stop_at`` and records (scenario, seconds, ok)."""
+
+    def __init__(self, port: int, user_ids, session_ids, stop_at: float, seed_value: int):
+        super().__init__(daemon=True)
+        self.port = port
+        self.user_ids = user_ids
+        self.session_ids = session_ids
+        self.stop_at = stop_at
+        self.rng = random.Random(seed_value)
+        self.results = []
+        self.names = list(SCENARIOS)
+        self.weights = list(SCENARIOS.values())
+
+    def request(self, scenario: str):
+        rng = self.rng
+        if scenario == "GET /users":
+            return "GET", "/users?limit=20", None
+        if scenario == "GET /users/{user_id}":
+            return "GET", f"/users/{rng.choice(self.user_ids)}", None
+        if scenario == "GET /users/{user_id}/matcha-sessions":
+            return "GET", f"/users/{rng.choice(self.user_ids)}/matcha-sessions?limit=20", None
+        if scenario == "GET /matcha-sessions":
+            return "GET", f"/matcha-sessions?limit=20&matcha_type={rng.choice(MATCHA_TYPES).replace(' ', '%20')}", None
+        if scenario == "GET /matcha-sessions/{session_id}":
+            return "GET", f"/matcha-sessions/{rng.choice(self.session_ids)}", None
+        if scenario == "POST /matcha-sessions":
+            return "POST", "/matcha-sessions", session_body(rng)
+        return "PUT", f"/matcha-sessions/{rng.choice(self.session_ids)}", {"rating": round(rng.uniform(1, 5), 1)}
+
+    def run(self):
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=30)
+        while time.monotonic() < self.stop_at:
+            scenario = self.rng.choices(self.names, self.weights)[0]
+            method, path, body = self.request(scenario)
+            payload = json.dumps(body).encode() if body is not None else None
+            headers = {"Content-Type": "application/json"} if payload else {}
+            started = time.perf_counter()
+            try:
+                conn.request(method, path, body=payload, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                ok = response.status < 400
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=30)
+                ok = False
+            self.results.append((scenario, time.perf_counter() - started, ok))
+        conn.close()
+
+
+def percentile(sorted_values, fraction: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples, elapsed: float) -> dict:
+    latencies = sorted(seconds for _, seconds, _ in samples)
+    return {
+        "requests": len(samples),
+        "errors": sum(not ok for _, _, ok in samples),
+        "throughput_rps": round(len(samples) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_report(report: dict, baseline: dict = None) -> None:
+    print(f"{'scenario':<40} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>6}")
+    rows = dict(report["scenarios"], total=report["total"])
+    for name, stats in rows.items():
+        line = (f"{name:<40} {stats['throughput_rps']:>8.1f} {stats['p50_ms']:>8.2f} "
+                f"{stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f} {stats['errors']:>6}")
+        old = (baseline or {}).get("scenarios", {}).get(name) if name != "total" else (baseline or {}).get("total")
+        if old:
+            line += (f"   vs {baseline['commit']}: "
+                     f"{(stats['throughput_rps'] / old['throughput_rps'] - 1) if old['throughput_rps'] else 0:+.1%} req/s, "
+                     f"{(stats['p95_ms'] / old['p95_ms'] - 1) if old['p95_ms'] else 0:+.1%} p95")
+        print(line)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=2000, help="users to seed")
+    parser.add_argument("--sessions", type=int, default=10, help="sessions per seeded user")
+    parser.add_argument("--concurrency", type=int, default=8, help="client threads")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds of load")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for data and request mix")
+    parser.add_argument("--output", default="load-test.json", help="JSON report path")
+    parser.add_argument("--compare", help="earlier JSON report to compare against")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'load.db')}")
+        env.setdefault("DB_SLOW_QUERY_MS", "0")
+        os.environ.update(DATABASE_URL=env["DATABASE_URL"])
+        started = time.perf_counter()
+        user_ids, session_ids = seed(args.users, args.sessions, rng)
+        print(f"seeded {len(user_ids)} users, {len(session_ids)} sessions in {time.perf_counter() - started:.1f}s")
+
+        port = free_port()
+        server = start_server(port, env, args.workers)
+        try:
+            stop_at = time.monotonic() + args.duration
+            workers = [
+                Worker(port, user_ids, session_ids, stop_at, args.seed * 1000 + i) for i in range(args.concurrency)
+            ]
+            started = time.perf_counter()
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            elapsed = time.perf_counter() - started
+        finally:
+            server.terminate()
+            server.wait(timeout=10)
+
+    samples = [sample for worker in workers for sample in worker.results]
+    report = {
+        "commit": git_commit(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        "duration_s": round(elapsed, 2),
+        "scenarios": {
+            name: summarize([s for s in samples if s[0] == name], elapsed)
+            for name in SCENARIOS
+        },
+        "total": summarize(samples, elapsed),
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    print(f"report written to {args.output}")
+    return 1 if report["total"]["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
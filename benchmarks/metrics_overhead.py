@@ -0,0 +1,92 @@
+"""
+Per-request cost of the metrics middleware.
+
+Drives a small FastAPI app (one static and one templated route, like the
+real endpoints) directly through its ASGI interface, with and without
+:class:`MetricsMiddleware`, so the difference is the middleware alone with no
+network or database noise. Also times a ``/metrics`` render after the run,
+which grows with the number of route/status series, not with traffic.
+
+    python -m benchmarks.metrics_overhead [--requests 20000] [--repeat 5]
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+from fastapi import FastAPI
+
+from middleware.metrics import MetricsMiddleware, MetricsRegistry
+
+
+def build_app(registry=None) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        return {"id": item_id}
+
+    if registry is not None:
+        app.add_middleware(MetricsMiddleware, registry=registry)
+    return app
+
+
+async def drive(app, requests: int) -> float:
+    """Seconds taken to serve ``requests`` GETs through ``app``."""
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    started = time.perf_counter()
+    for i in range(requests):
+        path = "/ping" if i % 2 else f"/items/{i}"
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+            "query_string": b"", "headers": [], "client": ("127.0.0.1", 1234), "server": ("test", 80),
+        }
+        await app(scope, receive, send)
+    return time.perf_counter() - started
+
+
+async def run(args) -> int:
+    registry = MetricsRegistry()
+    plain, instrumented = build_app(), build_app(registry)
+    # Warm up both apps: builds the middleware stacks and the route caches
+    await drive(plain, 200)
+    await drive(instrumented, 200)
+
+    best_plain = best_instrumented = float("inf")
+    for _ in range(args.repeat):
+        best_plain = min(best_plain, await drive(plain, args.requests))
+        best_instrumented = min(best_instrumented, await drive(instrumented, args.requests))
+    per_plain = best_plain / args.requests * 1e6
+    per_instrumented = best_instrumented / args.requests * 1e6
+    overhead = per_instrumented - per_plain
+
+    started = time.perf_counter()
+    body = registry.render()
+    render_ms = (time.perf_counter() - started) * 1e3
+
+    print(f"without middleware  {per_plain:8.1f} us/request")
+    print(f"with middleware     {per_instrumented:8.1f} us/request")
+    print(f"overhead            {overhead:8.1f} us/request ({overhead / per_plain:.1%})")
+    print(f"/metrics render     {render_ms:8.2f} ms ({len(body.splitlines())} lines)")
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=20000, help="requests per timed run")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per app (best is reported)")
+    return asyncio.run(run(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""
+Query-plan check for GET /matcha-sessions filter combinations.
+
+Seeds an in-memory SQLite database, runs the same filtered keyset-paginated
+query the endpoint builds for each common filter combination, and asks SQLite
+for its plan. The check fails (exit status 1) if any of them reads
+matcha_sessions with a full table scan instead of an index.
+
+    python -m benchmarks.query_plans [--rows 50000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+from uuid import uuid4
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("DB_POOL_CLASS", "static")
+
+from sqlalchemy import event, insert  # noqa: E402
+
+from models.db_models import MatchaSessionDB  # noqa: E402
+from utils.database import SessionLocal, engine, init_db  # noqa: E402
+from utils.filters import MatchaSessionFilters  # noqa: E402
+from utils.pagination import paginate  # noqa: E402
+
+LOCATIONS = ["Home", "Office", "Cha Cha Matcha", "Tea House", "Cafe Kitsune", "Park"]
+TYPES = ["Ceremonial Grade", "Premium Grade", "Culinary Grade", "Latte Grade"]
+BRANDS = ["Ippodo", "Marukyu Koyamaen", "Aiya", "Encha", None]
+
+# Filter combinations clients send, as GET /matcha-sessions query parameters
+COMBINATIONS = [
+    {},
+    {"location": "Home"},
+    {"matcha_type": "Ceremonial Grade"},
+    {"brand": "Ippodo"},
+    {"session_date": "2025-03-01"},
+    {"session_date_from": date(2025, 3, 1), "session_date_to": date(2025, 3, 31)},
+    {"min_rating": 4.0},
+    {"min_rating": 2.0, "max_rating": 4.0},
+    {"location": "Home", "matcha_type": "Ceremonial Grade"},
+    {"matcha_type": "Premium Grade", "min_rating": 4.5},
+    {"brand": "Ippodo", "session_date_from": date(2025, 1, 1)},
+    {"location": "Tea House", "session_date_from": date(2025, 2, 1), "session_date_to": date(2025, 2, 28)},
+]
+
+FILTER_FIELDS = [
+    "session_date", "session_date_from", "session_date_to", "location",
+    "matcha_type", "brand", "min_rating", "max_rating",
+]
+
+
+def seed(rows: int) -> None:
+    rng = random.Random(42)
+    start = datetime(2025, 1, 1)
+    batch = []
+    with engine.begin() as conn:
+        for i in range(rows):
+            created = start + timedelta(seconds=i * 60)
+            batch.append({
+                "id": uuid4(),
+                "user_id": None,
+                "session_date": (start + timedelta(days=rng.randrange(365))).date(),
+                "location": rng.choice(LOCATIONS),
+                "matcha_type": rng.choice(TYPES),
+                "brand": rng.choice(BRANDS),
+                "rating": round(rng.uniform(0, 5), 1),
+                "notes": None,
+                "created_at": created,
+                "updated_at": created,
+            })
+            if len(batch) == 5000:
+                conn.execute(insert(MatchaSessionDB), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(MatchaSessionDB), batch)
+        conn.exec_driver_sql("ANALYZE")
+
+
+def plan_for(params: dict):
+    """Run the endpoint's query for ``params``; return (plan lines, seconds)."""
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            captured.append((statement, parameters))
+
+    filters = MatchaSessionFilters(**{f: params.get(f) for f in FILTER_FIELDS})
+    db = SessionLocal()
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        started = time.perf_counter()
+        paginate(
+            filters.apply(db.query(MatchaSessionDB)),
+            [MatchaSessionDB.created_at, MatchaSessionDB.id],
+            None,
+            50,
+        )
+        elapsed = time.perf_counter() - started
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    statement, parameters = captured[-1]
+    plan = db.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+    db.close()
+    return [row[-1] for row in plan], elapsed
+
+
+def uses_table_scan(plan_lines) -> bool:
+    return any(line.strip() == "SCAN matcha_sessions" for line in plan_lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=50000, help="matcha_sessions rows to seed")
+    args = parser.parse_args(argv)
+
+    init_db()
+    seed(args.rows)
+
+    failures = 0
+    for params in COMBINATIONS:
+        plan, elapsed = plan_for(params)
+        scan = uses_table_scan(plan)
+        failures += scan
+        label = ", ".join(f"{k}={v}" for k, v in params.items()) or "(no filters)"
+        print(f"{'FAIL' if scan else 'ok  '} {elapsed * 1000:7.2f} ms  {label}")
+        for line in plan:
+            print(f"         {line}")
+    print(f"{len(COMBINATIONS) - failures}/{len(COMBINATIONS)} combinations use an index")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""
+Per-row cost of serializing GET /users pages.
+
+Builds in-memory UserDB rows with embedded sessions and times two ways of
+turning a page of them into a JSON body:
+
+- before: copy each row into UserRead/MatchaSessionRead instances (parsing
+  every ID with ``UUID()`` and re-validating every email), then run FastAPI's
+  own response_model handling (dump, re-validate, jsonable dump) and
+  JSONResponse rendering;
+- after: ``utils.serialization.dump_json``, one from_attributes validation
+  and one JSON encode, both in pydantic-core.
+
+No database is needed.
+
+    python -m benchmarks.serialization [--users 50 200] [--sessions 0 5 20] [--repeat 20]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import date, datetime
+from uuid import UUID, uuid4
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("DB_POOL_CLASS", "static")
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_model_field  # noqa: E402
+from pydantic import EmailStr, Field  # noqa: E402
+
+from models.db_models import MatchaSessionDB, UserDB  # noqa: E402
+from models.matcha_session import MatchaSessionRead  # noqa: E402
+from models.pagination import Page  # noqa: E402
+from models.user import UserRead  # noqa: E402
+from utils.serialization import dump_json  # noqa: E402
+
+
+def make_users(count: int, sessions: int):
+    now = datetime.utcnow()
+    users = []
+    for i in range(count):
+        user = UserDB(
+            id=str(uuid4()), username=f"user_{i}", email=f"user_{i}@example.com",
+            first_name="Sakura", last_name="Tanaka", phone="+1-212-555-0199",
+            favorite_matcha_powder="Ceremonial Grade - Ippodo", favorite_matcha_place="Home",
+            matcha_budget=150.0, join_date=date(2024, 1, 15), created_at=now, updated_at=now,
+        )
+        user.matcha_sessions = [
+            MatchaSessionDB(
+                id=str(uuid4()), user_id=user.id, session_date=date(2025, 1, 15), location="Home",
+                matcha_type="Ceremonial Grade", brand="Ippodo", rating=4.5, notes="Perfect morning ritual",
+                created_at=now, updated_at=now,
+            )
+            for _ in range(sessions)
+        ]
+        users.append(user)
+    return users
+
+
+class LegacyUserRead(UserRead):
+    """UserRead as it was before, validating ``email`` as EmailStr."""
+    email: EmailStr = Field(...)
+
+
+def session_to_read(s: MatchaSessionDB) -> MatchaSessionRead:
+    return MatchaSessionRead(
+        id=UUID(s.id), session_date=s.session_date, location=s.location, matcha_type=s.matcha_type,
+        brand=s.brand, rating=s.rating, notes=s.notes, created_at=s.created_at, updated_at=s.updated_at,
+    )
+
+
+def user_to_read(u: UserDB) -> LegacyUserRead:
+    return LegacyUserRead(
+        id=UUID(u.id), username=u.username, email=u.email, first_name=u.first_name, last_name=u.last_name,
+        phone=u.phone, favorite_matcha_powder=u.favorite_matcha_powder,
+        favorite_matcha_place=u.favorite_matcha_place, matcha_budget=u.matcha_budget, join_date=u.join_date,
+        matcha_sessions=[session_to_read(s) for s in u.matcha_sessions],
+        created_at=u.created_at, updated_at=u.updated_at,
+    )
+
+
+PAGE_FIELD = create_model_field(name="Response_list_users", type_=Page[LegacyUserRead], mode="serialization")
+
+
+async def before(users) -> bytes:
+    page = Page[LegacyUserRead](items=[user_to_read(u) for u in users], next_cursor=None)
+    content = await serialize_response(field=PAGE_FIELD, response_content=page, is_coroutine=True)
+    return JSONResponse(content).body
+
+
+async def after(users) -> bytes:
+    return dump_json(Page[UserRead], {"items": users, "next_cursor": None})
+
+
+async def time_per_row(encode, users, repeat: int) -> float:
+    """Best-of-``repeat`` microseconds per user row."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await encode(users)
+        best = min(best, time.perf_counter() - started)
+    return best / len(users) * 1e6
+
+
+async def run(args) -> int:
+    print(f"{'users':>6} {'sessions':>8}  {'before us/row':>13} {'after us/row':>12} {'speedup':>8}")
+    for count in args.users:
+        for sessions in args.sessions:
+            users = make_users(count, sessions)
+            if await before(users) != await after(users):
+                print(f"bodies differ for {count} users x {sessions} sessions")
+                return 1
+            old = await time_per_row(before, users, args.repeat)
+            new = await time_per_row(after, users, args.repeat)
+            print(f"{count:>6} {sessions:>8}  {old:>13.1f} {new:>12.1f} {old / new:>7.1f}x")
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, nargs="+", default=[50, 200], help="users per page")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[0, 5, 20], help="sessions per user")
+    parser.add_argument("--repeat", type=int, default=20, help="timed runs per case (best is reported)")
+    return asyncio.run(run(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
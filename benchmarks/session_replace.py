@@ -0,0 +1,111 @@
+"""
+Cost of replacing a user's matcha sessions through PUT /users/{user_id}.
+
+For users with a growing number of stored sessions, sends the full session
+list back with only a few sessions changed and measures the time and the
+number of rows written, once with the diff-based replacement the endpoint
+uses and once with the previous delete-everything-and-reinsert approach. The
+diff's writes should track the number of changed sessions, not the total.
+
+    python -m benchmarks.session_replace [--totals 100 1000 5000] [--changed 0 1 10 100]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+from uuid import uuid4
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("DB_POOL_CLASS", "static")
+
+from sqlalchemy import event, insert  # noqa: E402
+
+from models.db_models import MatchaSessionDB, UserDB  # noqa: E402
+from models.matcha_session import MatchaSessionCreate  # noqa: E402
+from services.bulk import replace_user_sessions, session_to_row  # noqa: E402
+from utils.database import SessionLocal, engine, init_db  # noqa: E402
+
+
+def make_user(db, total: int):
+    """Store a user with ``total`` sessions; return (user id, session list as sent by a client)."""
+    user_id = uuid4()
+    now = datetime.utcnow()
+    db.execute(insert(UserDB), [{
+        "id": user_id, "username": str(user_id)[:20], "email": f"{user_id}@example.com",
+        "first_name": "Bench", "last_name": "User", "created_at": now, "updated_at": now,
+    }])
+    sessions = [
+        MatchaSessionCreate(
+            session_date=date(2025, 1, 1) + timedelta(days=i % 365),
+            location="Home",
+            matcha_type="Ceremonial Grade",
+            brand="Ippodo",
+            rating=4.0,
+        )
+        for i in range(total)
+    ]
+    db.execute(insert(MatchaSessionDB), [session_to_row(s, user_id, now) for s in sessions])
+    db.commit()
+    return user_id, sessions
+
+
+def with_changes(sessions, changed: int):
+    """The same list with ``changed`` sessions rated differently."""
+    return [s.model_copy(update={"rating": 1.0}) if i < changed else s for i, s in enumerate(sessions)]
+
+
+def full_replace(db, user_id: str, sessions) -> None:
+    """The previous behaviour: delete every stored session, insert the whole list."""
+    db.query(MatchaSessionDB).filter(MatchaSessionDB.user_id == user_id).delete()
+    now = datetime.utcnow()
+    db.execute(insert(MatchaSessionDB), [session_to_row(s, user_id, now) for s in sessions])
+
+
+def measure(replace, total: int, changed: int):
+    """Return (milliseconds, rows written) for one replacement."""
+    written = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        if not statement.lstrip().upper().startswith("SELECT"):
+            written.append(max(cursor.rowcount, 0))
+
+    db = SessionLocal()
+    try:
+        user_id, sessions = make_user(db, total)
+        payload = with_changes(sessions, changed)
+        event.listen(engine, "after_cursor_execute", count)
+        try:
+            started = time.perf_counter()
+            replace(db, user_id, payload)
+            db.commit()
+            elapsed = time.perf_counter() - started
+        finally:
+            event.remove(engine, "after_cursor_execute", count)
+    finally:
+        db.close()
+    return elapsed * 1000, sum(written)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--totals", type=int, nargs="+", default=[100, 1000, 5000],
+                        help="stored sessions per user")
+    parser.add_argument("--changed", type=int, nargs="+", default=[0, 1, 10, 100],
+                        help="sessions changed in the replacement list")
+    args = parser.parse_args(argv)
+
+    init_db()
+    print(f"{'total':>6} {'changed':>7}  {'diff ms':>8} {'rows':>6}  {'full ms':>8} {'rows':>6}")
+    for total in args.totals:
+        for changed in args.changed:
+            if changed > total:
+                continue
+            diff_ms, diff_rows = measure(replace_user_sessions, total, changed)
+            full_ms, full_rows = measure(full_replace, total, changed)
+            print(f"{total:>6} {changed:>7}  {diff_ms:>8.2f} {diff_rows:>6}  {full_ms:>8.2f} {full_rows:>6}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
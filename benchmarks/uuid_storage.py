@@ -0,0 +1,209 @@
+"""
+Storage size and lookup/join speed of CHAR(36) IDs versus BinaryUUID.
+
+Builds two SQLite files with the same users and matcha sessions. "before"
+declares users.id, matcha_sessions.id and matcha_sessions.user_id as
+``CHAR(36)`` holding text, "after" uses the current models, which store
+:class:`utils.binary_uuid.BinaryUUID` (16-byte BLOBs). Both carry every index
+the models declare. It then reports:
+
+- the on-disk size of each table and index (SQLite's ``dbstat``);
+- primary key lookups of random sessions;
+- a join per user: one user's sessions with the username, by user ID;
+- a full join of every session to its user, grouped by username.
+
+Each query is timed twice: through SQLAlchemy, including bind and result
+processing (parsing the UUID on the way in, building ``uuid.UUID`` objects on
+the way out, as the API does), and straight through the DBAPI cursor with
+ready-made parameters, which is the database's share. MySQL gains more than SQLite on size: InnoDB appends the
+primary key to every secondary index entry.
+
+    python -m benchmarks.uuid_storage [--users 20000] [--sessions 20] [--lookups 5000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from uuid import UUID
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("DB_POOL_CLASS", "static")
+
+from sqlalchemy import CHAR, MetaData, bindparam, create_engine, func, insert, select, text  # noqa: E402
+
+from models.db_models import MatchaSessionDB, UserDB  # noqa: E402
+
+TABLES = (UserDB.__table__, MatchaSessionDB.__table__)
+ID_COLUMNS = {"users": ("id",), "matcha_sessions": ("id", "user_id")}
+
+
+def _copy(table, metadata: MetaData):
+    copy = table.to_metadata(metadata)
+    # to_metadata() drops ddl_if(), which would build MySQL's FULLTEXT index here
+    skipped = {index.name for index in table.indexes if index._ddl_if is not None}
+    copy.indexes = {index for index in copy.indexes if index.name not in skipped}
+    return copy
+
+
+def char_schema() -> MetaData:
+    """The users and matcha_sessions tables as they were, with CHAR(36) IDs."""
+    metadata = MetaData()
+    for table in TABLES:
+        copy = _copy(table, metadata)
+        for name in ID_COLUMNS[table.name]:
+            copy.c[name].type = CHAR(36)
+    return metadata
+
+
+def binary_schema() -> MetaData:
+    metadata = MetaData()
+    for table in TABLES:
+        _copy(table, metadata)
+    return metadata
+
+
+def generate(users: int, sessions: int, rng: random.Random):
+    now = datetime(2025, 6, 1)
+    user_rows, session_rows = [], []
+    for i in range(users):
+        user_id = UUID(int=rng.getrandbits(128), version=4)
+        user_rows.append({
+            "id": user_id, "username": f"bench_{i}", "email": f"bench_{i}@example.com",
+            "first_name": "Bench", "last_name": "User", "created_at": now, "updated_at": now,
+        })
+        for _ in range(sessions):
+            session_rows.append({
+                "id": UUID(int=rng.getrandbits(128), version=4), "user_id": user_id,
+                "session_date": date(2024, 1, 1) + timedelta(days=rng.randrange(500)),
+                "location": "Home", "matcha_type": "Ceremonial Grade", "brand": "Ippodo", "rating": 4.0,
+                "created_at": now, "updated_at": now,
+            })
+    return user_rows, session_rows
+
+
+def as_text(rows, columns):
+    return [{**row, **{c: str(row[c]) for c in columns if row[c] is not None}} for row in rows]
+
+
+def build(path: str, metadata: MetaData, user_rows, session_rows, text_ids: bool):
+    engine = create_engine(f"sqlite:///{path}")
+    metadata.create_all(engine)
+    users, sessions = metadata.tables["users"], metadata.tables["matcha_sessions"]
+    if text_ids:
+        user_rows = as_text(user_rows, ID_COLUMNS["users"])
+        session_rows = as_text(session_rows, ID_COLUMNS["matcha_sessions"])
+    with engine.begin() as conn:
+        conn.execute(insert(users), user_rows)
+        for start in range(0, len(session_rows), 50000):
+            conn.execute(insert(sessions), session_rows[start:start + 50000])
+    with engine.connect() as conn:
+        conn.exec_driver_sql("VACUUM")
+        conn.exec_driver_sql("ANALYZE")
+    return engine, users, sessions
+
+
+def sizes(engine) -> dict:
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT name, SUM(pgsize) FROM dbstat WHERE name NOT LIKE 'sqlite_stat%' "
+            "AND name != 'sqlite_schema' GROUP BY name"
+        ))
+        return dict(rows.all())
+
+
+def timed(engine, statement, params, repeat: int = 1) -> float:
+    """Seconds per execution of ``statement`` over ``params``, fetching every row."""
+    with engine.connect() as conn:
+        conn.execute(statement, params[0]).all()  # warm the statement cache
+        started = time.perf_counter()
+        for _ in range(repeat):
+            for p in params:
+                conn.execute(statement, p).all()
+        return (time.perf_counter() - started) / (repeat * len(params))
+
+
+def timed_raw(engine, statement, params, repeat: int = 1) -> float:
+    """Like :func:`timed`, but through the DBAPI with ready-made parameters: the database's share."""
+    sql = str(statement.compile(dialect=engine.dialect))
+    with engine.connect() as conn:
+        cursor = conn.connection.driver_connection.cursor()
+        cursor.execute(sql, params[0]).fetchall()
+        started = time.perf_counter()
+        for _ in range(repeat):
+            for p in params:
+                cursor.execute(sql, p).fetchall()
+        return (time.perf_counter() - started) / (repeat * len(params))
+
+
+def measure(engine, users, sessions, session_ids, usernames, text_ids: bool) -> dict:
+    """Seconds per primary key lookup, per-user join and full join, with and without type processing."""
+    ids = [{"id": str(i) if text_ids else i} for i in session_ids]
+    raw_ids = [(str(i) if text_ids else i.bytes,) for i in session_ids]
+    lookup = select(sessions).where(sessions.c.id == bindparam("id"))
+    per_user = (
+        select(sessions.c.id, sessions.c.session_date, users.c.username)
+        .join(users, users.c.id == sessions.c.user_id)
+        .where(users.c.username == bindparam("username"))
+    )
+    full = (
+        select(users.c.username, func.count())
+        .join(sessions, sessions.c.user_id == users.c.id)
+        .group_by(users.c.username)
+    )
+    return {
+        "lookup": timed(engine, lookup, ids),
+        "lookup, DBAPI only": timed_raw(engine, lookup, raw_ids),
+        "per-user join": timed(engine, per_user, [{"username": name} for name in usernames]),
+        "per-user join, DBAPI only": timed_raw(engine, per_user, [(name,) for name in usernames]),
+        "full join": timed(engine, full, [{}], repeat=3),
+        "full join, DBAPI only": timed_raw(engine, full, [()], repeat=3),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=20000, help="users to create")
+    parser.add_argument("--sessions", type=int, default=20, help="sessions per user")
+    parser.add_argument("--lookups", type=int, default=5000, help="primary key lookups and per-user joins timed")
+    parser.add_argument("--seed", type=int, default=1, help="random seed")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    user_rows, session_rows = generate(args.users, args.sessions, rng)
+    session_ids = [row["id"] for row in rng.sample(session_rows, min(args.lookups, len(session_rows)))]
+    usernames = [row["username"] for row in rng.sample(user_rows, min(args.lookups, len(user_rows)))]
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, metadata, text_ids in (("before", char_schema(), True), ("after", binary_schema(), False)):
+            started = time.perf_counter()
+            engine, users, sessions = build(
+                os.path.join(tmp, f"{name}.db"), metadata, user_rows, session_rows, text_ids
+            )
+            print(f"built {name}: {len(user_rows)} users, {len(session_rows)} sessions "
+                  f"in {time.perf_counter() - started:.1f}s")
+            results[name] = (sizes(engine), measure(engine, users, sessions, session_ids, usernames, text_ids))
+            engine.dispose()
+
+    before_sizes, before_times = results["before"]
+    after_sizes, after_times = results["after"]
+    print(f"\n{'table / index':<42} {'before KiB':>11} {'after KiB':>10} {'change':>8}")
+    for name in sorted(before_sizes, key=lambda n: -before_sizes[n]):
+        old, new = before_sizes[name], after_sizes.get(name, 0)
+        print(f"{name:<42} {old / 1024:>11,.0f} {new / 1024:>10,.0f} {new / old - 1:>+8.0%}")
+    old, new = sum(before_sizes.values()), sum(after_sizes.values())
+    print(f"{'total':<42} {old / 1024:>11,.0f} {new / 1024:>10,.0f} {new / old - 1:>+8.0%}")
+
+    print(f"\n{'query':<42} {'before':>11} {'after':>10} {'change':>8}")
+    for name in before_times:
+        unit, scale = ("ms", 1e3) if name.startswith("full") else ("us", 1e6)
+        old, new = before_times[name], after_times[name]
+        print(f"{name + ' (' + unit + ')':<42} {old * scale:>11.1f} {new * scale:>10.1f} {new / old - 1:>+8.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
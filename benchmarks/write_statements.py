@@ -0,0 +1,123 @@
+"""
+Statement budget check for the single-entity write endpoints.
+
+Calls each write endpoint against an in-memory SQLite database and counts the
+SQL statements it executes (BEGIN/COMMIT excluded). The check fails (exit
+status 1) if any endpoint exceeds its budget, e.g. because an existence
+SELECT or a post-commit refresh crept back in.
+
+    python -m benchmarks.write_statements
+
+``tests/test_write_statements.py`` holds the endpoints to the same
+:data:`BUDGETS` under pytest, through HTTP requests.
+"""
+import os
+import sys
+from datetime import date
+from uuid import uuid4
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("DB_POOL_CLASS", "static")
+
+import main as api  # noqa: E402
+from models.matcha_session import MatchaSessionCreate, MatchaSessionUpdate  # noqa: E402
+from models.user import UserCreate, UserRead, UserUpdate  # noqa: E402
+from utils.database import SessionLocal, init_db, record_statements  # noqa: E402
+
+# Maximum statements per call. Rollup upserts, the owner's updated_at bump and
+# the change log INSERT are counted; a call that changes no stats fields skips
+# the upsert.
+BUDGETS = {
+    # INSERT session, upsert rollups, INSERT change log
+    "POST /matcha-sessions": 3,
+    # INSERT user, INSERT search trigrams, INSERT sessions, upsert rollups, INSERT change log
+    "POST /users (with sessions)": 5,
+    # SELECT session, UPDATE session, upsert rollups, UPDATE owner, INSERT change log
+    "PUT /matcha-sessions/{id}": 5,
+    # SELECT ... FOR UPDATE, upsert session, upsert rollups, INSERT change log
+    # (UPDATE owner when replacing an owned one)
+    "PUT /matcha-sessions/{id}?upsert=true": 4,
+    # SELECT user, DELETE + INSERT changed search trigrams, UPDATE user, INSERT change log,
+    # SELECT sessions for the response
+    "PUT /users/{id}": 6,
+    # SELECT user, SELECT sessions, UPDATE + INSERT changed sessions, upsert rollups, UPDATE user,
+    # INSERT change log
+    "PUT /users/{id} (matcha_sessions)": 7,
+    # SELECT session, DELETE session, upsert rollups, UPDATE owner, INSERT change log
+    "DELETE /matcha-sessions/{id}": 5,
+    # SELECT user, SELECT sessions, upsert rollups, DELETE rollups, DELETE search trigrams,
+    # INSERT change log, DELETE sessions, DELETE user
+    "DELETE /users/{id}": 8,
+}
+
+
+def session(**fields) -> MatchaSessionCreate:
+    values = {"session_date": date(2025, 1, 15), "location": "Home", "matcha_type": "Ceremonial Grade", "rating": 4.0}
+    values.update(fields)
+    return MatchaSessionCreate(**values)
+
+
+def count_statements(call):
+    """Run ``call(db)`` in a fresh session; return (result, statements executed)."""
+    db = SessionLocal()
+    try:
+        with record_statements() as statements:
+            result = call(db)
+        return result, statements
+    finally:
+        db.close()
+
+
+def report(name: str, statements) -> bool:
+    """Print one endpoint's count against its budget; return True when over it."""
+    budget = BUDGETS[name]
+    over = len(statements) > budget
+    print(f"{'FAIL' if over else 'ok  '} {len(statements):>2}/{budget:<2} {name}")
+    if over:
+        for statement in statements:
+            print("         " + " ".join(statement.split())[:100])
+    return over
+
+
+def main(argv=None) -> int:
+    init_db()
+    failures = 0
+
+    new_user = UserCreate(
+        username="budget_user", email="budget@example.com", first_name="Budget", last_name="User",
+        matcha_sessions=[session(), session(brand="Ippodo")],
+    )
+    _, statements = count_statements(lambda db: api.create_matcha_session(session(), db=db))
+    failures += report("POST /matcha-sessions", statements)
+    response, statements = count_statements(lambda db: api.create_user(new_user, db=db))
+    failures += report("POST /users (with sessions)", statements)
+    user = UserRead.model_validate_json(response.body)
+
+    owned = user.matcha_sessions[0]
+    replacement = [s.model_copy(update={"rating": 2.0}) if s.id == owned.id else s for s in user.matcha_sessions]
+    replacement.append(session(location="Cafe"))
+    calls = [
+        ("PUT /matcha-sessions/{id}", lambda db: api.update_matcha_session(
+            owned.id, MatchaSessionUpdate(rating=5.0), upsert=False, if_match=None, db=db
+        )),
+        ("PUT /matcha-sessions/{id}?upsert=true", lambda db: api.update_matcha_session(
+            uuid4(), MatchaSessionUpdate(**session().model_dump(exclude={"id"})), upsert=True,
+            if_match=None, db=db,
+        )),
+        ("PUT /users/{id}", lambda db: api.update_user(
+            user.id, UserUpdate(first_name="Budgeted"), if_match=None, db=db
+        )),
+        ("PUT /users/{id} (matcha_sessions)", lambda db: api.update_user(
+            user.id, UserUpdate(matcha_sessions=replacement), if_match=None, db=db
+        )),
+        ("DELETE /matcha-sessions/{id}", lambda db: api.delete_matcha_session(owned.id, if_match=None, db=db)),
+        ("DELETE /users/{id}", lambda db: api.delete_user(user.id, if_match=None, db=db)),
+    ]
+    for name, call in calls:
+        _, statements = count_statements(call)
+        failures += report(name, statements)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,21 +2,68 @@ from __future__ import annotations
 
 import os
 import socket
-from datetime import datetime, date
-from typing import List
-from uuid import UUID
+from datetime import datetime
+from uuid import UUID, uuid4
 
-from fastapi import FastAPI, HTTPException, Depends
-from fastapi import Query, Path
+from fastapi import APIRouter, FastAPI, HTTPException, Depends, Request
+from fastapi import Body, Header, Query, Path
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Optional
-from sqlalchemy.orm import Session
-
-from models.user import UserCreate, UserRead, UserUpdate
-from models.matcha_session import MatchaSessionCreate, MatchaSessionRead, MatchaSessionUpdate
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from typing import Any, Dict, List, Optional
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+
+from middleware.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsMiddleware, MetricsRegistry, pool_metrics
+from middleware.query_stats import QueryStatsMiddleware
+from models.user import UserCreate, UserImportIssue, UserImportResult, UserRead, UserSearchHit, UserUpdate
+from models.matcha_session import (
+    MatchaSessionBatchItemResult,
+    MatchaSessionBatchResult,
+    MatchaSessionCreate,
+    MatchaSessionRead,
+    MatchaSessionSearchHit,
+    MatchaSessionUpdate,
+)
+from models.change import ChangeFeed
 from models.health import Health
+from models.pagination import Page
+from models.stats import MatchaStats
 from models.db_models import UserDB, MatchaSessionDB
-from utils.database import get_db, init_db
+from services.cache import entity_cache, session_key, user_key
+from services.changes import read_changes, record_changes, session_change, session_changes, user_change
+from services.bulk import (
+    SESSION_FIELDS,
+    existing_session_ids,
+    import_users_chunk,
+    replace_user_sessions,
+    session_to_row,
+)
+from services.export import EXPORT_FORMATS, stream_export
+from services.search import search_sessions
+from services.stats import GLOBAL_SCOPE, apply_session_changes, forget_user, read_stats, session_facts, user_scope
+from services.user_search import index_users, reindex_user, search_users, unindex_user, user_names
+from utils.async_routes import asyncify_router
+from utils.database import (
+    ASYNC_DB_ENABLED,
+    SchemaOutdatedError,
+    get_db,
+    get_pool_stats,
+    init_db,
+    init_db_async,
+    run_db,
+    schema_log,
+)
+from utils.etag import entity_etag, match_fails, none_match, page_etag
+from utils.filters import MatchaSessionFilters, UserFilters
+from utils.ndjson import LineTooLongError, iter_ndjson_chunks
+from utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, InvalidCursorError, paginate
+from utils.projection import UserProjection
+from utils.serialization import dump_json, json_response
+from utils.upsert import upsert_statement
 
 port = int(os.environ.get("FASTAPIPORT", 8000))
 port = int(os.environ.get("PORT", port))  # Cloud Run uses PORT
@@ -36,14 +83,59 @@ app.add_middleware(
 )
 
 
+def env_flag(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Per-route request counts, status codes and latency, served at GET /metrics.
+# Added last so it wraps the other middleware and times the whole request.
+metrics = MetricsRegistry()
+metrics.add_collector(lambda: pool_metrics(get_pool_stats()))
+METRICS_ENABLED = env_flag("METRICS_ENABLED", True)
+
+# SQL statements and database time per request, as response headers and metrics
+app.add_middleware(
+    QueryStatsMiddleware,
+    registry=metrics if METRICS_ENABLED else None,
+    headers=env_flag("DB_QUERY_HEADERS", True),
+)
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware, registry=metrics)
+
+# User and matcha-session CRUD endpoints. They are written against a sync
+# Session and registered on the app at the bottom of this module, either as-is
+# or, with DB_ASYNC enabled, re-wrapped to run on the async engine.
+router = APIRouter()
+
+# Largest number of items accepted by POST /matcha-sessions:batch
+MAX_BATCH_SIZE = 5000
+
+# Number of skipped-line details kept in a POST /users:import response
+MAX_IMPORT_ISSUES = 1000
+
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize database tables on startup."""
     try:
-        init_db()
-    except Exception as e:
-        # Log error but don't fail startup - tables might already exist
-        print(f"Database initialization note: {e}")
+        if ASYNC_DB_ENABLED:
+            await init_db_async()
+        else:
+            init_db()
+    except SchemaOutdatedError:
+        # Serving against this schema would answer every If-Match with 412
+        raise
+    except Exception:
+        # Don't fail startup - another instance may have created the tables first
+        schema_log.exception("Database initialization failed")
+
+
+@app.exception_handler(InvalidCursorError)
+async def invalid_cursor_handler(request, exc: InvalidCursorError):
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
 
 
 # -----------------------------------------------------------------------------
@@ -66,6 +158,24 @@ def get_health_no_path(echo: str | None = Query(None, description="Optional echo
     return make_health(echo=echo, path_echo=None)
 
 
+@app.get("/health/pool")
+def get_pool_health():
+    """Connection pool occupancy and checkout wait statistics for this worker."""
+    return get_pool_stats()
+
+
+@app.get("/health/cache")
+def get_cache_health():
+    """Entity cache hit/miss counters for this worker."""
+    return entity_cache.stats()
+
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Request and connection pool metrics for this worker, in Prometheus text format."""
+    return Response(content=metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
+
 @app.get("/health/{path_echo}", response_model=Health)
 def get_health_with_path(
     path_echo: str = Path(..., description="Required echo in the URL path"),
@@ -78,53 +188,123 @@ def get_health_with_path(
 # Helper functions for model conversion
 # -----------------------------------------------------------------------------
 
-def db_session_to_read(db_session: MatchaSessionDB) -> MatchaSessionRead:
-    """Convert MatchaSessionDB to MatchaSessionRead."""
-    return MatchaSessionRead(
-        id=UUID(db_session.id),
-        session_date=db_session.session_date,
-        location=db_session.location,
-        matcha_type=db_session.matcha_type,
-        brand=db_session.brand,
-        rating=db_session.rating,
-        notes=db_session.notes,
-        created_at=db_session.created_at,
-        updated_at=db_session.updated_at,
-    )
+def load_user_sessions(db: Session, users: List[UserDB]) -> None:
+    """Populate ``matcha_sessions`` for all ``users`` with a single IN query."""
+    by_user = {u.id: [] for u in users}
+    if by_user:
+        for s in db.query(MatchaSessionDB).filter(MatchaSessionDB.user_id.in_(list(by_user))):
+            by_user[s.user_id].append(s)
+    for u in users:
+        set_committed_value(u, "matcha_sessions", by_user[u.id])
+
+
+def touch_user(db: Session, user_id: Optional[UUID]) -> None:
+    """Bump a user's updated_at so its ETag changes with its embedded sessions."""
+    if user_id:
+        db.query(UserDB).filter(UserDB.id == user_id).update(
+            {UserDB.updated_at: datetime.utcnow()}, synchronize_session=False
+        )
+
+
+DUPLICATE_SESSION_ID = "Matcha session with this ID already exists"
+
+
+def conflict_detail(error: IntegrityError, duplicate_id: Optional[str] = None) -> Optional[str]:
+    """
+    The 400 detail for a violated unique key, or None for other integrity errors.
+
+    Unique keys are told apart by name. A primary key violation names no
+    column on every backend, so its detail is ``duplicate_id``, given by the
+    caller that knows whose client-supplied ID it inserted.
+    """
+    message = str(error.orig)
+    # MySQL 8.0: "Duplicate entry 'x' for key 'users.ix_users_email'"
+    # MySQL 5.7: "Duplicate entry 'x' for key 'ix_users_email'" (and 'PRIMARY')
+    # SQLite: "UNIQUE constraint failed: users.email"
+    for marker in ("for key", "constraint failed:"):
+        if marker in message:
+            key = message.rsplit(marker, 1)[1].strip(" '\")")
+            break
+    else:
+        return None
+    if "username" in key:
+        return "Username already exists"
+    if "email" in key:
+        return "Email already exists"
+    if key == "PRIMARY" or key.endswith((".PRIMARY", ".id")):
+        return duplicate_id
+    return None
 
 
-def db_user_to_read(db_user: UserDB) -> UserRead:
-    """Convert UserDB to UserRead."""
-    return UserRead(
-        id=UUID(db_user.id),
-        username=db_user.username,
-        email=db_user.email,
-        first_name=db_user.first_name,
-        last_name=db_user.last_name,
-        phone=db_user.phone,
-        favorite_matcha_powder=db_user.favorite_matcha_powder,
-        favorite_matcha_place=db_user.favorite_matcha_place,
-        matcha_budget=db_user.matcha_budget,
-        join_date=db_user.join_date,
-        matcha_sessions=[db_session_to_read(s) for s in db_user.matcha_sessions],
-        created_at=db_user.created_at,
-        updated_at=db_user.updated_at,
-    )
+def is_deadlock(error: OperationalError) -> bool:
+    """Whether the database rolled the transaction back to break a lock conflict."""
+    args = error.orig.args
+    # MySQL: ER_LOCK_DEADLOCK (1213). SQLite has no deadlock detection; a
+    # writer that cannot take the database lock fails with "database is locked".
+    return (bool(args) and args[0] == 1213) or "database is locked" in str(error.orig)
+
+
+def commit_or_conflict(db: Session, duplicate_id: Optional[str] = None) -> None:
+    """
+    Commit, turning unique-key violations into the endpoints' 400 responses.
+
+    Usernames, emails and session IDs are checked by the database constraints
+    as part of the write rather than with a SELECT before it, which also
+    closes the race between such a check and the INSERT. ``duplicate_id`` is
+    the detail for a primary key violation (see :func:`conflict_detail`).
+    """
+    try:
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        detail = conflict_detail(e, duplicate_id)
+        if detail is None:
+            raise
+        raise HTTPException(status_code=400, detail=detail) from None
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
+
+
+def cached_entity_response(request: Request, key: str, load_etag, load_body) -> Response:
+    """
+    Serve one entity through the entity cache with If-None-Match handling.
+
+    ``load_etag()`` computes the current ETag from the id/updated_at columns
+    only and ``load_body()`` returns ``(etag, json_bytes)`` for the full entity;
+    both raise 404 when it does not exist. A conditional request on a cache
+    miss is validated with ``load_etag()`` first, so an unchanged entity is
+    never loaded or serialized. Cache values hold the ETag, a newline, then
+    the body.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    cached = entity_cache.get(key)
+    if cached is not None:
+        etag, body = cached.split(b"\n", 1)
+        etag = etag.decode()
+    else:
+        generation = entity_cache.generation(key)
+        if if_none_match:
+            etag = load_etag()
+            if none_match(if_none_match, etag):
+                return not_modified(etag)
+        etag, body = load_body()
+        # Not stored if a write invalidated the key while it was loading
+        entity_cache.set(key, etag.encode() + b"\n" + body, generation)
+    if none_match(if_none_match, etag):
+        return not_modified(etag)
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
 
 
 # -----------------------------------------------------------------------------
 # Matcha Session endpoints
 # -----------------------------------------------------------------------------
 
-@app.post("/matcha-sessions", response_model=MatchaSessionRead, status_code=201)
+@router.post("/matcha-sessions", response_model=MatchaSessionRead, status_code=201)
 def create_matcha_session(session: MatchaSessionCreate, db: Session = Depends(get_db)):
-    # Check if session with this ID already exists
-    existing = db.query(MatchaSessionDB).filter(MatchaSessionDB.id == str(session.id)).first()
-    if existing:
-        raise HTTPException(status_code=400, detail="Matcha session with this ID already exists")
-    
     db_session = MatchaSessionDB(
-        id=str(session.id),
+        id=session.id,
         session_date=session.session_date,
         location=session.location,
         matcha_type=session.matcha_type,
@@ -133,71 +313,252 @@ def create_matcha_session(session: MatchaSessionCreate, db: Session = Depends(ge
         notes=session.notes,
     )
     db.add(db_session)
-    db.commit()
-    db.refresh(db_session)
-    return db_session_to_read(db_session)
+    apply_session_changes(db, added=[db_session])
+    record_changes(db, [session_change("created", db_session)])
+    commit_or_conflict(db, DUPLICATE_SESSION_ID)
+    return json_response(MatchaSessionRead, db_session, status_code=201)
+
+
+@router.post("/matcha-sessions:batch", response_model=MatchaSessionBatchResult)
+def create_matcha_sessions_batch(
+    items: List[Any] = Body(
+        ...,
+        max_length=MAX_BATCH_SIZE,
+        description=f"Up to {MAX_BATCH_SIZE} MatchaSessionCreate objects, validated one by one",
+    ),
+    db: Session = Depends(get_db),
+):
+    results: List[Optional[MatchaSessionBatchItemResult]] = [None] * len(items)
+    valid = {}  # session id -> (request index, MatchaSessionCreate)
+    for index, item in enumerate(items):
+        try:
+            session = MatchaSessionCreate.model_validate(item)
+        except ValidationError as e:
+            results[index] = MatchaSessionBatchItemResult(
+                index=index,
+                status="invalid",
+                errors=e.errors(include_url=False, include_context=False, include_input=False),
+            )
+            continue
+        if session.id in valid:
+            results[index] = MatchaSessionBatchItemResult(index=index, id=session.id, status="duplicate")
+        else:
+            valid[session.id] = (index, session)
+
+    # One existence lookup, one multi-row INSERT and one commit for the whole
+    # batch. A concurrent writer can still claim one of the IDs in between, so
+    # re-check once and retry instead of failing the batch on the first race.
+    for attempt in range(2):
+        existing = existing_session_ids(db, list(valid))
+        new_ids = [sid for sid in valid if sid not in existing]
+        now = datetime.utcnow()
+        rows = [session_to_row(valid[sid][1], None, now) for sid in new_ids]
+        try:
+            if rows:
+                # Through the table: an ORM insert would split the rows wherever their NULL columns differ
+                db.execute(insert(MatchaSessionDB.__table__), rows)
+                apply_session_changes(db, added=rows)
+                record_changes(db, [session_change("created", row) for row in rows])
+            db.commit()
+            break
+        except IntegrityError:
+            db.rollback()
+            if attempt:
+                raise HTTPException(status_code=409, detail="Conflicting concurrent writes, retry the batch")
+
+    created = set(new_ids)
+    for sid, (index, session) in valid.items():
+        results[index] = MatchaSessionBatchItemResult(
+            index=index, id=session.id, status="created" if sid in created else "duplicate"
+        )
+    return MatchaSessionBatchResult(
+        created=len(created),
+        duplicates=sum(r.status == "duplicate" for r in results),
+        invalid=sum(r.status == "invalid" for r in results),
+        results=results,
+    )
 
 
-@app.get("/matcha-sessions", response_model=List[MatchaSessionRead])
+@router.get("/matcha-sessions", response_model=Page[MatchaSessionRead])
 def list_matcha_sessions(
-    session_date: Optional[str] = Query(None, description="Filter by session date (YYYY-MM-DD)"),
-    location: Optional[str] = Query(None, description="Filter by location"),
-    matcha_type: Optional[str] = Query(None, description="Filter by matcha type"),
-    brand: Optional[str] = Query(None, description="Filter by brand"),
-    min_rating: Optional[float] = Query(None, description="Filter by minimum rating (0.0-5.0)"),
-    max_rating: Optional[float] = Query(None, description="Filter by maximum rating (0.0-5.0)"),
+    request: Request,
+    filters: MatchaSessionFilters = Depends(),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of items per page"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's next_cursor"),
     db: Session = Depends(get_db),
 ):
-    query = db.query(MatchaSessionDB)
-    
-    if session_date is not None:
-        query = query.filter(MatchaSessionDB.session_date == date.fromisoformat(session_date))
-    if location is not None:
-        query = query.filter(MatchaSessionDB.location == location)
-    if matcha_type is not None:
-        query = query.filter(MatchaSessionDB.matcha_type == matcha_type)
-    if brand is not None:
-        query = query.filter(MatchaSessionDB.brand == brand)
-    if min_rating is not None:
-        query = query.filter(MatchaSessionDB.rating >= min_rating)
-    if max_rating is not None:
-        query = query.filter(MatchaSessionDB.rating <= max_rating)
-    
-    results = query.all()
-    return [db_session_to_read(s) for s in results]
+    query = filters.apply(db.query(MatchaSessionDB))
+    results, next_cursor = paginate(
+        query, [MatchaSessionDB.created_at, MatchaSessionDB.id], cursor, limit
+    )
+    etag = page_etag(results, next_cursor)
+    if none_match(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+    return json_response(
+        Page[MatchaSessionRead], {"items": results, "next_cursor": next_cursor}, headers={"ETag": etag}
+    )
 
 
-@app.get("/matcha-sessions/{session_id}", response_model=MatchaSessionRead)
-def get_matcha_session(session_id: UUID, db: Session = Depends(get_db)):
-    db_session = db.query(MatchaSessionDB).filter(MatchaSessionDB.id == str(session_id)).first()
-    if not db_session:
-        raise HTTPException(status_code=404, detail="Matcha session not found")
-    return db_session_to_read(db_session)
+# Registered before /matcha-sessions/{session_id}, which would take "search" as an ID
+@router.get("/matcha-sessions/search", response_model=Page[MatchaSessionSearchHit])
+def search_matcha_sessions(
+    q: str = Query(..., min_length=1, max_length=200, description="Words to find in session notes and locations"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of items per page"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's next_cursor"),
+    db: Session = Depends(get_db),
+):
+    try:
+        results, next_cursor = search_sessions(db, q, limit, cursor)
+    except InvalidCursorError:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except NotImplementedError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    return json_response(Page[MatchaSessionSearchHit], {"items": results, "next_cursor": next_cursor})
+
+
+@router.get("/matcha-sessions/{session_id}", response_model=MatchaSessionRead)
+def get_matcha_session(session_id: UUID, request: Request, db: Session = Depends(get_db)):
+    def load_etag():
+        updated_at = (
+            db.query(MatchaSessionDB.updated_at).filter(MatchaSessionDB.id == session_id).scalar()
+        )
+        if updated_at is None:
+            raise HTTPException(status_code=404, detail="Matcha session not found")
+        return entity_etag(session_id, updated_at)
+
+    def load_body():
+        db_session = db.query(MatchaSessionDB).filter(MatchaSessionDB.id == session_id).first()
+        if not db_session:
+            raise HTTPException(status_code=404, detail="Matcha session not found")
+        etag = entity_etag(session_id, db_session.updated_at)
+        return etag, dump_json(MatchaSessionRead, db_session)
+
+    return cached_entity_response(request, session_key(session_id), load_etag, load_body)
+
+
+def upsert_matcha_session(
+    session_id: UUID, update: MatchaSessionUpdate, if_match: Optional[str], db: Session
+) -> Response:
+    """
+    Create the session or replace all of its fields.
+
+    The stored row is read with a row lock first: its owner and old values
+    feed the rollups and the owner's ETag, and the lock makes concurrent
+    replacements of the same session apply one after the other. The write
+    itself is an INSERT ... ON DUPLICATE KEY UPDATE (ON CONFLICT on SQLite),
+    so two clients creating the same ID never fail with a duplicate key; the
+    rollups and change log are written in the same transaction. A deadlock
+    between two such creators is retried once.
+    """
+    try:
+        session = MatchaSessionCreate(id=session_id, **update.model_dump(exclude_unset=True))
+    except ValidationError as e:
+        raise RequestValidationError(
+            [{**err, "loc": ("body", *err["loc"])} for err in e.errors(include_url=False, include_input=False)]
+        )
+
+    for attempt in range(2):
+        old = (
+            db.query(*MatchaSessionDB.__table__.columns)
+            .filter(MatchaSessionDB.id == session_id)
+            .with_for_update()
+            .first()
+        )
+        if if_match and (old is None or match_fails(if_match, entity_etag(session_id, old.updated_at))):
+            raise HTTPException(status_code=412, detail="Matcha session has been modified")
+        row = session_to_row(session, old and old.user_id, datetime.utcnow())
+        try:
+            db.execute(upsert_statement(
+                db,
+                MatchaSessionDB.__table__,
+                [row],
+                ["id"],
+                lambda new: {f: new[f] for f in SESSION_FIELDS + ("updated_at",)},
+            ))
+            apply_session_changes(db, added=[row], removed=[old] if old else [])
+            touch_user(db, row["user_id"])
+            record_changes(db, session_changes("updated" if old else "created", row))
+            db.commit()
+            break
+        except OperationalError as e:
+            # Two first-time creators of one ID can deadlock on MySQL's gap
+            # locks; the one rolled back retries once and finds the row.
+            # Anything else (a lost connection, a lock wait timeout) is not
+            # resolved by retrying.
+            db.rollback()
+            if not is_deadlock(e):
+                raise
+            if attempt:
+                raise HTTPException(status_code=409, detail="Conflicting concurrent writes, retry the request")
+
+    entity_cache.invalidate(session_key(session_id), row["user_id"] and user_key(row["user_id"]))
+    if old:
+        row["created_at"] = old.created_at
+    return json_response(
+        MatchaSessionRead,
+        row,
+        status_code=200 if old else 201,
+        headers={"ETag": entity_etag(session_id, row["updated_at"])},
+    )
 
 
-@app.put("/matcha-sessions/{session_id}", response_model=MatchaSessionRead)
-def update_matcha_session(session_id: UUID, update: MatchaSessionUpdate, db: Session = Depends(get_db)):
-    db_session = db.query(MatchaSessionDB).filter(MatchaSessionDB.id == str(session_id)).first()
+@router.put("/matcha-sessions/{session_id}", response_model=MatchaSessionRead)
+def update_matcha_session(
+    session_id: UUID,
+    update: MatchaSessionUpdate,
+    upsert: bool = Query(
+        False,
+        description="Create the session if it does not exist, or replace every field if it does; "
+        "session_date, location and matcha_type are then required",
+    ),
+    if_match: Optional[str] = Header(None, description="Only update if the session's ETag matches"),
+    db: Session = Depends(get_db),
+):
+    if upsert:
+        return upsert_matcha_session(session_id, update, if_match, db)
+    db_session = db.query(MatchaSessionDB).filter(MatchaSessionDB.id == session_id).first()
     if not db_session:
         raise HTTPException(status_code=404, detail="Matcha session not found")
+    if match_fails(if_match, entity_etag(session_id, db_session.updated_at)):
+        raise HTTPException(status_code=412, detail="Matcha session has been modified")
     
+    before = session_facts(db_session)
     update_data = update.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(db_session, field, value)
     
     db_session.updated_at = datetime.utcnow()
+    apply_session_changes(db, added=[db_session], removed=[before])
+    # The session is also embedded in its owner's body and ETag
+    touch_user(db, db_session.user_id)
+    record_changes(db, session_changes("updated", db_session))
     db.commit()
-    db.refresh(db_session)
-    return db_session_to_read(db_session)
+    entity_cache.invalidate(session_key(session_id), db_session.user_id and user_key(db_session.user_id))
+    return json_response(
+        MatchaSessionRead, db_session, headers={"ETag": entity_etag(session_id, db_session.updated_at)}
+    )
 
 
-@app.delete("/matcha-sessions/{session_id}", status_code=204)
-def delete_matcha_session(session_id: UUID, db: Session = Depends(get_db)):
-    db_session = db.query(MatchaSessionDB).filter(MatchaSessionDB.id == str(session_id)).first()
+@router.delete("/matcha-sessions/{session_id}", status_code=204)
+def delete_matcha_session(
+    session_id: UUID,
+    if_match: Optional[str] = Header(None, description="Only delete if the session's ETag matches"),
+    db: Session = Depends(get_db),
+):
+    db_session = db.query(MatchaSessionDB).filter(MatchaSessionDB.id == session_id).first()
     if not db_session:
         raise HTTPException(status_code=404, detail="Matcha session not found")
+    if match_fails(if_match, entity_etag(session_id, db_session.updated_at)):
+        raise HTTPException(status_code=412, detail="Matcha session has been modified")
+    owner_id = db_session.user_id
     db.delete(db_session)
+    apply_session_changes(db, removed=[db_session])
+    touch_user(db, owner_id)
+    record_changes(db, session_changes("deleted", db_session))
     db.commit()
+    entity_cache.invalidate(session_key(session_id), owner_id and user_key(owner_id))
     return None
 
 
@@ -205,19 +566,11 @@ def delete_matcha_session(session_id: UUID, db: Session = Depends(get_db)):
 # User endpoints
 # -----------------------------------------------------------------------------
 
-@app.post("/users", response_model=UserRead, status_code=201)
+@router.post("/users", response_model=UserRead, status_code=201)
 def create_user(user: UserCreate, db: Session = Depends(get_db)):
-    # Check if username or email already exists
-    existing_username = db.query(UserDB).filter(UserDB.username == user.username).first()
-    if existing_username:
-        raise HTTPException(status_code=400, detail="Username already exists")
-    
-    existing_email = db.query(UserDB).filter(UserDB.email == user.email).first()
-    if existing_email:
-        raise HTTPException(status_code=400, detail="Email already exists")
-    
-    # Create user
+    # Create user; the ID is assigned here so sessions can reference it before the flush
     db_user = UserDB(
+        id=uuid4(),
         username=user.username,
         email=user.email,
         first_name=user.first_name,
@@ -229,13 +582,13 @@ def create_user(user: UserCreate, db: Session = Depends(get_db)):
         join_date=user.join_date,
     )
     db.add(db_user)
-    db.flush()  # Get the user ID
+    index_users(db, [db_user])
     
     # Create matcha sessions if provided
     if user.matcha_sessions:
         for session in user.matcha_sessions:
             db_session = MatchaSessionDB(
-                id=str(session.id),
+                id=session.id,
                 user_id=db_user.id,
                 session_date=session.session_date,
                 location=session.location,
@@ -244,120 +597,312 @@ def create_user(user: UserCreate, db: Session = Depends(get_db)):
                 rating=session.rating,
                 notes=session.notes,
             )
-            db.add(db_session)
+            # Appending also fills the collection the response is built from
+            db_user.matcha_sessions.append(db_session)
+        apply_session_changes(db, added=db_user.matcha_sessions)
     
-    db.commit()
-    db.refresh(db_user)
-    return db_user_to_read(db_user)
+    record_changes(
+        db, [user_change("created", db_user.id)] + [session_change("created", s) for s in db_user.matcha_sessions]
+    )
+    commit_or_conflict(db, DUPLICATE_SESSION_ID)
+    return json_response(UserRead, db_user, status_code=201)
 
 
-@app.get("/users", response_model=List[UserRead])
+@app.post("/users:import", response_model=UserImportResult)
+async def import_users(
+    request: Request,
+    chunk_size: int = Query(500, ge=1, le=5000, description="Lines validated and written per transaction"),
+):
+    """
+    Stream an NDJSON body of UserCreate objects (one per line) into the database.
+
+    The body is read incrementally and each chunk of lines is written in its
+    own transaction, so memory stays bounded by ``chunk_size`` and chunks that
+    were already committed stay committed if a later one fails.
+    """
+    result = UserImportResult()
+    try:
+        async for chunk in iter_ndjson_chunks(request.stream(), chunk_size):
+            result.received += len(chunk)
+            for outcome in await run_db(import_users_chunk, chunk):
+                if outcome["status"] == "created":
+                    result.created += 1
+                    continue
+                if outcome["status"] == "conflict":
+                    result.conflicts += 1
+                else:
+                    result.invalid += 1
+                if len(result.issues) < MAX_IMPORT_ISSUES:
+                    result.issues.append(UserImportIssue(**outcome))
+    except LineTooLongError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    return result
+
+
+@router.get("/users", response_model=Page[UserRead])
 def list_users(
-    username: Optional[str] = Query(None, description="Filter by username"),
-    first_name: Optional[str] = Query(None, description="Filter by first name"),
-    last_name: Optional[str] = Query(None, description="Filter by last name"),
-    email: Optional[str] = Query(None, description="Filter by email"),
-    phone: Optional[str] = Query(None, description="Filter by phone number"),
-    favorite_matcha_powder: Optional[str] = Query(None, description="Filter by favorite matcha powder"),
-    favorite_matcha_place: Optional[str] = Query(None, description="Filter by favorite matcha place"),
-    min_budget: Optional[float] = Query(None, description="Filter by minimum matcha budget"),
-    max_budget: Optional[float] = Query(None, description="Filter by maximum matcha budget"),
-    join_date: Optional[str] = Query(None, description="Filter by join date (YYYY-MM-DD)"),
+    request: Request,
+    filters: UserFilters = Depends(),
+    projection: UserProjection = Depends(),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of items per page"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's next_cursor"),
     db: Session = Depends(get_db),
 ):
-    query = db.query(UserDB)
-    
-    if username is not None:
-        query = query.filter(UserDB.username == username)
-    if first_name is not None:
-        query = query.filter(UserDB.first_name == first_name)
-    if last_name is not None:
-        query = query.filter(UserDB.last_name == last_name)
-    if email is not None:
-        query = query.filter(UserDB.email == email)
-    if phone is not None:
-        query = query.filter(UserDB.phone == phone)
-    if favorite_matcha_powder is not None:
-        query = query.filter(UserDB.favorite_matcha_powder == favorite_matcha_powder)
-    if favorite_matcha_place is not None:
-        query = query.filter(UserDB.favorite_matcha_place == favorite_matcha_place)
-    if min_budget is not None:
-        query = query.filter(UserDB.matcha_budget >= min_budget)
-    if max_budget is not None:
-        query = query.filter(UserDB.matcha_budget <= max_budget)
-    if join_date is not None:
-        query = query.filter(UserDB.join_date == date.fromisoformat(join_date))
-    
-    results = query.all()
-    return [db_user_to_read(u) for u in results]
+    if not projection.is_default:
+        return sparse_users_page(request, db, filters, projection, limit, cursor)
+    query = filters.apply(db.query(UserDB))
+    results, next_cursor = paginate(query, [UserDB.created_at, UserDB.id], cursor, limit)
+    # Session changes bump the owner's updated_at, so the page ETag covers them
+    etag = page_etag(results, next_cursor)
+    if none_match(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+    # Load every user's sessions in one batched IN query instead of one per user
+    load_user_sessions(db, results)
+    return json_response(Page[UserRead], {"items": results, "next_cursor": next_cursor}, headers={"ETag": etag})
+
+
+def sparse_users_page(request: Request, db: Session, filters: UserFilters, projection: UserProjection,
+                      limit: int, cursor: Optional[str]) -> Response:
+    """A GET /users page with only the projected columns and at most the requested sessions."""
+    query = filters.apply(db.query(*projection.user_columns()))
+    rows, next_cursor = paginate(query, [UserDB.created_at, UserDB.id], cursor, limit)
+    etag = projection.etag(page_etag(rows, next_cursor))
+    if none_match(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+    sessions = projection.load_sessions(db, [row.id for row in rows])
+    items = [projection.render(row, sessions) for row in rows]
+    return json_response(
+        Page[Dict[str, Any]], {"items": items, "next_cursor": next_cursor}, headers={"ETag": etag}
+    )
 
 
-@app.get("/users/{user_id}", response_model=UserRead)
-def get_user(user_id: UUID, db: Session = Depends(get_db)):
-    db_user = db.query(UserDB).filter(UserDB.id == str(user_id)).first()
-    if not db_user:
+@router.get("/users/search", response_model=List[UserSearchHit])
+def search_users_typeahead(
+    q: str = Query(..., min_length=1, max_length=100, description="What the user has typed so far"),
+    limit: int = Query(10, ge=1, le=50, description="Maximum number of suggestions"),
+    db: Session = Depends(get_db),
+):
+    # Registered before /users/{user_id}, which would otherwise match "search"
+    try:
+        hits = search_users(db, q, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return json_response(List[UserSearchHit], hits)
+
+
+@router.get("/users/{user_id}", response_model=UserRead)
+def get_user(
+    user_id: UUID,
+    request: Request,
+    projection: UserProjection = Depends(),
+    db: Session = Depends(get_db),
+):
+    if not projection.is_default:
+        # Projected variants bypass the entity cache, which holds the full body
+        row = db.query(*projection.user_columns()).filter(UserDB.id == user_id).first()
+        if row is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        etag = projection.etag(entity_etag(user_id, row.updated_at))
+        if none_match(request.headers.get("if-none-match"), etag):
+            return not_modified(etag)
+        item = projection.render(row, projection.load_sessions(db, [row.id]))
+        return json_response(Dict[str, Any], item, headers={"ETag": etag})
+
+    def load_etag():
+        updated_at = db.query(UserDB.updated_at).filter(UserDB.id == user_id).scalar()
+        if updated_at is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        return entity_etag(user_id, updated_at)
+
+    def load_body():
+        db_user = (
+            db.query(UserDB)
+            .options(selectinload(UserDB.matcha_sessions))
+            .filter(UserDB.id == user_id)
+            .first()
+        )
+        if not db_user:
+            raise HTTPException(status_code=404, detail="User not found")
+        return entity_etag(user_id, db_user.updated_at), dump_json(UserRead, db_user)
+
+    return cached_entity_response(request, user_key(user_id), load_etag, load_body)
+
+
+@router.get("/users/{user_id}/stats", response_model=MatchaStats)
+def get_user_stats(
+    user_id: UUID,
+    top_brands: int = Query(5, ge=1, le=50, description="Number of brands to include in top_brands"),
+    db: Session = Depends(get_db),
+):
+    """Session count, ratings, monthly counts, matcha types and top brands of one user."""
+    stats = read_stats(db, user_scope(user_id), top_brands)
+    if not stats.total_sessions and not db.query(UserDB.id).filter(UserDB.id == user_id).first():
+        raise HTTPException(status_code=404, detail="User not found")
+    return stats
+
+
+@router.get("/users/{user_id}/matcha-sessions", response_model=Page[MatchaSessionRead])
+def list_user_matcha_sessions(
+    user_id: UUID,
+    request: Request,
+    filters: MatchaSessionFilters = Depends(),
+    order: str = Query("desc", pattern="^(asc|desc)$", description="Sort by session_date: desc (newest first) or asc"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of items per page"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's next_cursor"),
+    db: Session = Depends(get_db),
+):
+    # One range read of ix_matcha_sessions_user_date per page, in either direction
+    query = filters.apply(db.query(MatchaSessionDB).filter(MatchaSessionDB.user_id == user_id))
+    results, next_cursor = paginate(
+        query, [MatchaSessionDB.session_date, MatchaSessionDB.id], cursor, limit, descending=order == "desc"
+    )
+    if not results and not db.query(UserDB.id).filter(UserDB.id == user_id).first():
         raise HTTPException(status_code=404, detail="User not found")
-    return db_user_to_read(db_user)
+    etag = page_etag(results, next_cursor)
+    if none_match(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+    return json_response(
+        Page[MatchaSessionRead], {"items": results, "next_cursor": next_cursor}, headers={"ETag": etag}
+    )
 
 
-@app.put("/users/{user_id}", response_model=UserRead)
-def update_user(user_id: UUID, update: UserUpdate, db: Session = Depends(get_db)):
-    db_user = db.query(UserDB).filter(UserDB.id == str(user_id)).first()
+@router.put("/users/{user_id}", response_model=UserRead)
+def update_user(
+    user_id: UUID,
+    update: UserUpdate,
+    if_match: Optional[str] = Header(None, description="Only update if the user's ETag matches"),
+    db: Session = Depends(get_db),
+):
+    db_user = db.query(UserDB).filter(UserDB.id == user_id).first()
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
+    if match_fails(if_match, entity_etag(user_id, db_user.updated_at)):
+        raise HTTPException(status_code=412, detail="User has been modified")
     
     update_data = update.model_dump(exclude_unset=True)
     
-    # Check for unique constraints if updating username or email
-    if "username" in update_data and update_data["username"] != db_user.username:
-        existing = db.query(UserDB).filter(UserDB.username == update_data["username"]).first()
-        if existing:
-            raise HTTPException(status_code=400, detail="Username already exists")
-    
-    if "email" in update_data and update_data["email"] != db_user.email:
-        existing = db.query(UserDB).filter(UserDB.email == update_data["email"]).first()
-        if existing:
-            raise HTTPException(status_code=400, detail="Email already exists")
-    
-    # Handle matcha_sessions separately if provided
-    if "matcha_sessions" in update_data:
-        # Delete existing sessions
-        db.query(MatchaSessionDB).filter(MatchaSessionDB.user_id == str(user_id)).delete()
-        # Create new sessions
-        for session in update_data["matcha_sessions"]:
-            db_session = MatchaSessionDB(
-                id=str(session.id),
-                user_id=str(user_id),
-                session_date=session.session_date,
-                location=session.location,
-                matcha_type=session.matcha_type,
-                brand=session.brand,
-                rating=session.rating,
-                notes=session.notes,
-            )
-            db.add(db_session)
-        del update_data["matcha_sessions"]
+    # Handle matcha_sessions separately if provided (null leaves them unchanged)
+    stale_keys = [user_key(user_id)]
+    changes = [user_change("updated", user_id)]
+    if update_data.pop("matcha_sessions", None) is not None:
+        if len({s.id for s in update.matcha_sessions}) != len(update.matcha_sessions):
+            raise HTTPException(status_code=400, detail="Duplicate matcha session ID in request")
+        # Only sessions that were added, changed or dropped are written
+        try:
+            diff = replace_user_sessions(db, user_id, update.matcha_sessions)
+        except IntegrityError:
+            # A new session ID is already used by another user's or a standalone session
+            db.rollback()
+            raise HTTPException(status_code=400, detail=DUPLICATE_SESSION_ID)
+        changed_old = [old for old, _ in diff["updated"]]
+        changed_new = [new for _, new in diff["updated"]]
+        apply_session_changes(
+            db, added=diff["inserted"] + changed_new, removed=diff["deleted"] + changed_old
+        )
+        stale_keys += [session_key(s.id) for s in diff["deleted"] + changed_old]
+        changes += [session_change("created", row) for row in diff["inserted"]]
+        changes += [session_change("updated", row) for row in changed_new]
+        changes += [session_change("deleted", row) for row in diff["deleted"]]
     
     # Update other fields
+    old_names = user_names(db_user)
     for field, value in update_data.items():
         setattr(db_user, field, value)
+    if user_names(db_user) != old_names:
+        reindex_user(db, old_names, user_names(db_user))
     
     db_user.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(db_user)
-    return db_user_to_read(db_user)
-
-
-@app.delete("/users/{user_id}", status_code=204)
-def delete_user(user_id: UUID, db: Session = Depends(get_db)):
-    db_user = db.query(UserDB).filter(UserDB.id == str(user_id)).first()
+    record_changes(db, changes)
+    commit_or_conflict(db, DUPLICATE_SESSION_ID)
+    entity_cache.invalidate(*stale_keys)
+    if update.matcha_sessions is not None:
+        # Answer with the sessions just written rather than reloading them
+        set_committed_value(db_user, "matcha_sessions", [MatchaSessionDB(**row) for row in diff["sessions"]])
+    return json_response(UserRead, db_user, headers={"ETag": entity_etag(user_id, db_user.updated_at)})
+
+
+@router.delete("/users/{user_id}", status_code=204)
+def delete_user(
+    user_id: UUID,
+    if_match: Optional[str] = Header(None, description="Only delete if the user's ETag matches"),
+    db: Session = Depends(get_db),
+):
+    db_user = db.query(UserDB).filter(UserDB.id == user_id).first()
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
+    if match_fails(if_match, entity_etag(user_id, db_user.updated_at)):
+        raise HTTPException(status_code=412, detail="User has been modified")
+    stale_keys = [user_key(user_id)] + [session_key(s.id) for s in db_user.matcha_sessions]
+    forget_user(db, user_id, db_user.matcha_sessions)
+    unindex_user(db, user_id)
+    record_changes(
+        db, [user_change("deleted", user_id)] + [session_change("deleted", s) for s in db_user.matcha_sessions]
+    )
     db.delete(db_user)  # Cascade will delete related sessions
     db.commit()
+    entity_cache.invalidate(*stale_keys)
     return None
 
 
+@router.get("/stats", response_model=MatchaStats)
+def get_global_stats(
+    top_brands: int = Query(5, ge=1, le=50, description="Number of brands to include in top_brands"),
+    db: Session = Depends(get_db),
+):
+    """The same statistics as GET /users/{user_id}/stats over every matcha session."""
+    return read_stats(db, GLOBAL_SCOPE, top_brands)
+
+
+@router.get("/changes", response_model=ChangeFeed)
+def list_changes(
+    since: Optional[str] = Query(None, description="next_cursor of the previous call; omit to read from the start"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of changes read"),
+    db: Session = Depends(get_db),
+):
+    """Users and matcha sessions created, updated or deleted after ``since``, latest change per entity."""
+    return json_response(ChangeFeed, read_changes(db, since, limit))
+
+
+# -----------------------------------------------------------------------------
+# Export endpoints
+# -----------------------------------------------------------------------------
+
+def export_response(model, filters, fmt: str, filename: str) -> StreamingResponse:
+    """Stream every column of ``model``'s table matching ``filters`` in creation order."""
+    table_columns = list(model.__table__.columns)
+
+    def build_query(db: Session):
+        query = filters.apply(db.query(*table_columns))
+        return query.order_by(model.created_at, model.id)
+
+    return StreamingResponse(
+        stream_export(build_query, [c.name for c in table_columns], fmt),
+        media_type=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
+
+
+@app.get("/matcha-sessions:export")
+def export_matcha_sessions(
+    filters: MatchaSessionFilters = Depends(),
+    fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$", description="ndjson or csv"),
+):
+    """Stream all matcha sessions matching the GET /matcha-sessions filters."""
+    return export_response(MatchaSessionDB, filters, fmt, "matcha_sessions")
+
+
+@app.get("/users:export")
+def export_users(
+    filters: UserFilters = Depends(),
+    fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$", description="ndjson or csv"),
+):
+    """Stream all users (without embedded sessions) matching the GET /users filters."""
+    return export_response(UserDB, filters, fmt, "users")
+
+
+app.include_router(asyncify_router(router) if ASYNC_DB_ENABLED else router)
+
+
 # -----------------------------------------------------------------------------
 # Root
 # -----------------------------------------------------------------------------
@@ -0,0 +1,217 @@
+"""
+Request metrics in the Prometheus text exposition format.
+
+:class:`MetricsMiddleware` is a plain ASGI middleware, so a request costs two
+``perf_counter`` calls, one wrapped ``send`` and a few dict updates under an
+uncontended lock; nothing is allocated per request beyond the label tuples.
+Requests are labelled by route template (``/users/{user_id}``), never by raw
+path, so the number of series stays bounded; paths no route matched share the
+``<unmatched>`` label. Metrics are kept per worker process, like the other
+``/health`` statistics.
+
+    http_requests_total{method,route,status}             counter
+    http_request_duration_seconds{method,route}          histogram
+    http_requests_in_progress                            gauge
+    db_statements_total{method,route}                    counter
+    db_statement_seconds_total{method,route}             counter
+
+:func:`pool_metrics` turns ``get_pool_stats()`` into gauges and counters for
+the same page.
+"""
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Upper bounds (seconds) of the latency histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+# A sample for the exposition: (metric name, type, help, [(labels, value)])
+Family = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+def route_label(scope) -> str:
+    """The route template the router matched for ``scope``, or :data:`UNMATCHED_ROUTE`."""
+    # The router stores the matched route in the scope it shares with middleware
+    return getattr(scope.get("route"), "path", None) or UNMATCHED_ROUTE
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items()) + "}"
+
+
+def render_families(families: Iterable[Family]) -> str:
+    """Render metric families as Prometheus text."""
+    lines = []
+    for name, kind, help_text, samples in families:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            sample_name = labels.pop("__name__", name)
+            lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsRegistry:
+    """Request counters, latency histograms and the in-flight gauge for one process."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._requests: Dict[Tuple[str, str, int], int] = {}
+        # (method, route) -> [per-bucket counts (last one is +Inf), sum, count]
+        self._durations: Dict[Tuple[str, str], list] = {}
+        self.in_progress = 0
+        # (method, route) -> [statements, seconds] from the query stats middleware
+        self._queries: Dict[Tuple[str, str], list] = {}
+        self._collectors: List[Callable[[], Iterable[Family]]] = []
+
+    def add_collector(self, collector: Callable[[], Iterable[Family]]) -> None:
+        """Add a callable whose families are rendered, read at scrape time, after the request metrics."""
+        self._collectors.append(collector)
+
+    def observe(self, method: str, route: str, status: int, seconds: float) -> None:
+        """Record one finished request."""
+        bucket = bisect_left(self.buckets, seconds)
+        with self._lock:
+            key = (method, route, status)
+            self._requests[key] = self._requests.get(key, 0) + 1
+            histogram = self._durations.get((method, route))
+            if histogram is None:
+                histogram = self._durations[(method, route)] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            histogram[0][bucket] += 1
+            histogram[1] += seconds
+            histogram[2] += 1
+
+    def observe_queries(self, method: str, route: str, count: int, seconds: float) -> None:
+        """Record the SQL statements one request executed and the time they took."""
+        with self._lock:
+            totals = self._queries.get((method, route))
+            if totals is None:
+                totals = self._queries[(method, route)] = [0, 0.0]
+            totals[0] += count
+            totals[1] += seconds
+
+    def families(self) -> List[Family]:
+        """Snapshot of every metric family, collectors included."""
+        with self._lock:
+            requests = sorted(self._requests.items())
+            durations = sorted((key, [list(h[0]), h[1], h[2]]) for key, h in self._durations.items())
+            in_progress = self.in_progress
+            queries = sorted((key, tuple(totals)) for key, totals in self._queries.items())
+
+        histogram_samples = []
+        for (method, route), (counts, total, count) in durations:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                histogram_samples.append((
+                    {"__name__": "http_request_duration_seconds_bucket", "method": method, "route": route,
+                     "le": _format_value(bound)},
+                    cumulative,
+                ))
+            labels = {"method": method, "route": route}
+            histogram_samples.append(({"__name__": "http_request_duration_seconds_sum", **labels}, total))
+            histogram_samples.append(({"__name__": "http_request_duration_seconds_count", **labels}, count))
+
+        families = [
+            (
+                "http_requests_total", "counter", "HTTP requests by route template and status code.",
+                [({"method": m, "route": r, "status": str(s)}, n) for (m, r, s), n in requests],
+            ),
+            ("http_request_duration_seconds", "histogram", "HTTP request latency in seconds.", histogram_samples),
+            ("http_requests_in_progress", "gauge", "HTTP requests being served.", [({}, in_progress)]),
+        ]
+        if queries:
+            families.append((
+                "db_statements_total", "counter", "SQL statements executed by route template.",
+                [({"method": m, "route": r}, count) for (m, r), (count, _) in queries],
+            ))
+            families.append((
+                "db_statement_seconds_total", "counter", "Time spent executing SQL statements by route template.",
+                [({"method": m, "route": r}, seconds) for (m, r), (_, seconds) in queries],
+            ))
+        for collector in self._collectors:
+            families.extend(collector())
+        return families
+
+    def render(self) -> str:
+        """The Prometheus text exposition of all metrics."""
+        return render_families(self.families())
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording every HTTP request in a :class:`MetricsRegistry`."""
+
+    def __init__(self, app, registry: MetricsRegistry, exclude_paths: Sequence[str] = ("/metrics",)):
+        self.app = app
+        self.registry = registry
+        self.exclude_paths = frozenset(exclude_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500  # reported when the app raises before starting a response
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        registry = self.registry
+        registry.in_progress += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            registry.in_progress -= 1
+            registry.observe(scope["method"], route_label(scope), status, elapsed)
+
+
+# get_pool_stats() keys exported as counters; the other numeric keys are gauges
+_POOL_COUNTERS = {
+    "connects": ("db_pool_connects_total", "New database connections opened."),
+    "checkouts": ("db_pool_checkouts_total", "Connections checked out of the pool."),
+    "timeouts": ("db_pool_checkout_timeouts_total", "Checkouts that timed out waiting for a connection."),
+    "checkout_wait_seconds_total": ("db_pool_checkout_wait_seconds_total", "Time spent waiting for a connection."),
+}
+_POOL_GAUGES = {
+    "size": ("db_pool_size", "Configured pool size."),
+    "checked_in": ("db_pool_checked_in", "Idle connections in the pool."),
+    "checked_out": ("db_pool_checked_out", "Connections in use."),
+    "overflow": ("db_pool_overflow", "Overflow connections beyond the pool size."),
+    "checkout_wait_seconds_max": ("db_pool_checkout_wait_seconds_max", "Longest wait for a connection."),
+}
+
+
+def pool_metrics(stats: dict) -> List[Family]:
+    """Metric families for a ``get_pool_stats()`` snapshot."""
+    labels = {"pool_class": stats.get("pool_class", "")}
+    families = []
+    for table, kind in ((_POOL_COUNTERS, "counter"), (_POOL_GAUGES, "gauge")):
+        for key, (name, help_text) in table.items():
+            if key in stats:
+                families.append((name, kind, help_text, [(dict(labels), stats[key])]))
+    return families
@@ -0,0 +1,47 @@
+"""
+Per-request SQL statement counts and database time.
+
+:class:`QueryStatsMiddleware` opens a :func:`utils.database.track_queries`
+context for each HTTP request, so the engine event hooks attribute every
+statement the request executes to it. The totals are reported on the response
+as ``X-DB-Query-Count`` and a ``Server-Timing: db;dur=<ms>`` entry (as of the
+moment the response starts), and recorded per route template in the metrics
+registry once the request finishes.
+
+Like :class:`middleware.metrics.MetricsMiddleware` this is a plain ASGI
+middleware: ``BaseHTTPMiddleware`` would run the endpoint in another task and
+lose the context variable.
+"""
+from typing import Optional
+
+from middleware.metrics import MetricsRegistry, route_label
+from utils.database import track_queries
+
+
+class QueryStatsMiddleware:
+    """ASGI middleware attributing SQL statements and their duration to each request."""
+
+    def __init__(self, app, registry: Optional[MetricsRegistry] = None, headers: bool = True):
+        self.app = app
+        self.registry = registry
+        self.headers = headers
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries() as stats:
+            async def send_with_headers(message):
+                if message["type"] == "http.response.start":
+                    message["headers"] = list(message.get("headers", ())) + [
+                        (b"x-db-query-count", str(stats.count).encode()),
+                        (b"server-timing", f"db;dur={stats.seconds * 1000:.2f}".encode()),
+                    ]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_headers if self.headers else send)
+            finally:
+                if self.registry is not None:
+                    self.registry.observe_queries(scope["method"], route_label(scope), stats.count, stats.seconds)
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Dict, List, Literal, Optional
+from uuid import UUID
+
+from pydantic import BaseModel, Field
+
+
+class Change(BaseModel):
+    """The latest change to one user or matcha session within a feed page."""
+    seq: int = Field(..., description="Position in the change sequence; increases with every change.")
+    entity: Literal["user", "matcha_session"] = Field(..., description="Kind of the changed entity.")
+    id: UUID = Field(..., description="ID of the changed user or session.")
+    op: Literal["created", "updated", "deleted"] = Field(
+        ..., description="What happened. Apply created and updated alike, as an upsert."
+    )
+    user_id: Optional[UUID] = Field(
+        None, description="For sessions, the owning user at the time of the change; null for users."
+    )
+    changed_at: datetime = Field(..., description="When the change was written (UTC).")
+    data: Optional[Dict[str, Any]] = Field(
+        None,
+        description="Current fields of the entity: a user without embedded sessions (those have their "
+        "own changes), or a session with its user_id. Null for deletions, and when the entity has "
+        "since been deleted; its deleted change then follows later in the feed.",
+    )
+
+
+class ChangeFeed(BaseModel):
+    """One page of the change feed."""
+    items: List[Change] = Field(default_factory=list, description="Changes in sequence order.")
+    next_cursor: str = Field(
+        ...,
+        description="Pass as since to continue after this page; also returned when there were no changes.",
+        json_schema_extra={"example": "WzEyMzRd"},
+    )
+    has_more: bool = Field(
+        False, description="True when more changes are already available; otherwise poll again later."
+    )
@@ -1,21 +1,29 @@
 """
 SQLAlchemy database models for User and MatchaSession.
 """
-from sqlalchemy import Column, String, Float, Date, DateTime, Text, ForeignKey
-from sqlalchemy.dialects.mysql import CHAR
+from sqlalchemy import Column, String, Float, Double, Integer, BigInteger, Date, DateTime, Text, ForeignKey, Index
+from sqlalchemy.dialects.mysql import DATETIME
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from uuid import uuid4
-import uuid
 
+from utils.binary_uuid import BinaryUUID
 from utils.database import Base
 
+# Microsecond precision on MySQL (plain DATETIME truncates to seconds), so two
+# writes within the same second still produce different updated_at-based ETags
+Timestamp = DateTime().with_variant(DATETIME(fsp=6), "mysql")
+
 
 class UserDB(Base):
     """SQLAlchemy model for User table."""
     __tablename__ = "users"
+    __table_args__ = (
+        # Keyset pagination order for GET /users
+        Index("ix_users_created_at_id", "created_at", "id"),
+    )
 
-    id = Column(CHAR(36), primary_key=True, default=lambda: str(uuid4()))
+    id = Column(BinaryUUID, primary_key=True, default=uuid4)
     username = Column(String(20), unique=True, nullable=False, index=True)
     email = Column(String(255), unique=True, nullable=False, index=True)
     first_name = Column(String(100), nullable=False)
@@ -25,8 +33,8 @@ class UserDB(Base):
     favorite_matcha_place = Column(String(255), nullable=True)
     matcha_budget = Column(Float, nullable=True)
     join_date = Column(Date, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    created_at = Column(Timestamp, default=datetime.utcnow, nullable=False)
+    updated_at = Column(Timestamp, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
     # Relationship to matcha sessions
     matcha_sessions = relationship("MatchaSessionDB", back_populates="user", cascade="all, delete-orphan")
@@ -38,17 +46,39 @@ class UserDB(Base):
 class MatchaSessionDB(Base):
     """SQLAlchemy model for MatchaSession table."""
     __tablename__ = "matcha_sessions"
+    __table_args__ = (
+        # Keyset pagination order for GET /matcha-sessions and rating-only
+        # filters: rating ranges on a 0-5 scale are too unselective to beat
+        # walking this index and stopping after one page.
+        Index("ix_matcha_sessions_created_at_id", "created_at", "id"),
+        # Equality filters followed by the pagination order, so a filtered
+        # page is one index range read with no sort. The other filters are
+        # applied to the rows that range yields.
+        Index("ix_matcha_sessions_location_created", "location", "created_at", "id"),
+        Index("ix_matcha_sessions_type_created", "matcha_type", "created_at", "id"),
+        Index("ix_matcha_sessions_brand_created", "brand", "created_at", "id"),
+        # Exact session_date and session_date_from/_to ranges
+        Index("ix_matcha_sessions_date_created", "session_date", "created_at", "id"),
+        # A user's timeline (GET /users/{user_id}/matcha-sessions) and the
+        # most recent sessions embedded by sessions_limit, read in index order.
+        # Also serves user_id lookups and the foreign key, so user_id has no
+        # index of its own.
+        Index("ix_matcha_sessions_user_date", "user_id", "session_date", "id"),
+        # GET /matcha-sessions/search on MySQL; SQLite gets an FTS5 table
+        # instead (services/search.py)
+        Index("ix_matcha_sessions_search", "notes", "location", mysql_prefix="FULLTEXT").ddl_if(dialect="mysql"),
+    )
 
-    id = Column(CHAR(36), primary_key=True, default=lambda: str(uuid4()))
-    user_id = Column(CHAR(36), ForeignKey("users.id"), nullable=True, index=True)
+    id = Column(BinaryUUID, primary_key=True, default=uuid4)
+    user_id = Column(BinaryUUID, ForeignKey("users.id"), nullable=True)
     session_date = Column(Date, nullable=False)
     location = Column(String(255), nullable=False)
     matcha_type = Column(String(50), nullable=False)
     brand = Column(String(255), nullable=True)
     rating = Column(Float, nullable=True)
     notes = Column(Text, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    created_at = Column(Timestamp, default=datetime.utcnow, nullable=False)
+    updated_at = Column(Timestamp, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
     # Relationship to user
     user = relationship("UserDB", back_populates="matcha_sessions")
@@ -56,3 +86,76 @@ class MatchaSessionDB(Base):
     def __repr__(self):
         return f"<MatchaSessionDB(id={self.id}, session_date={self.session_date})>"
 
+
+class SessionRollupDB(Base):
+    """
+    SQLAlchemy model for the session_rollups table.
+
+    Pre-aggregated session counts and rating sums per scope (a user, or every
+    session) and bucket, kept current by the session write paths so stats
+    reads never scan matcha_sessions. See services/stats.py.
+    """
+    __tablename__ = "session_rollups"
+
+    # The kind keeps the global scope apart from every user ID
+    scope_kind = Column(String(6), primary_key=True)  # user or global
+    scope_id = Column(BinaryUUID, primary_key=True)  # User ID; the nil UUID for global
+    dimension = Column(String(10), primary_key=True)  # total, month, type or brand
+    bucket = Column(String(255), primary_key=True)  # "" for total, YYYY-MM, matcha_type or brand
+    session_count = Column(Integer, nullable=False, default=0)
+    rating_count = Column(Integer, nullable=False, default=0)
+    rating_sum = Column(Double, nullable=False, default=0)
+
+    def __repr__(self):
+        return (
+            f"<SessionRollupDB(scope_kind={self.scope_kind}, scope_id={self.scope_id}, "
+            f"dimension={self.dimension}, bucket={self.bucket})>"
+        )
+
+
+class UserSearchGramDB(Base):
+    """
+    SQLAlchemy model for the user_search_grams table.
+
+    One row per distinct trigram of a user's username and names, the index
+    behind GET /users/search. Kept in step by the user write paths; see
+    services/user_search.py.
+    """
+    __tablename__ = "user_search_grams"
+    __table_args__ = (
+        # Removing or re-indexing one user's grams
+        Index("ix_user_search_grams_user_id", "user_id"),
+    )
+
+    # Binary collation on MySQL: grams are normalized before storage, and the
+    # default accent-insensitive collation would treat distinct grams as equal
+    gram = Column(String(3).with_variant(String(3, collation="utf8mb4_bin"), "mysql"), primary_key=True)
+    user_id = Column(BinaryUUID, primary_key=True)
+
+    def __repr__(self):
+        return f"<UserSearchGramDB(gram={self.gram!r}, user_id={self.user_id})>"
+
+
+class ChangeLogDB(Base):
+    """
+    SQLAlchemy model for the change_log table.
+
+    Append-only record of every user and session create, update and delete,
+    numbered by ``seq``, the order GET /changes serves them in. Deletes stay
+    as tombstones. Written by the API's write paths; see services/changes.py.
+    """
+    __tablename__ = "change_log"
+    # Never reuse a seq on SQLite, even one whose row is gone
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    # The primary key is the feed's index: a page is one range scan after the cursor.
+    # INTEGER on SQLite, where only that spelling makes the column an autoincrementing rowid
+    seq = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    entity = Column(String(20), nullable=False)  # user or matcha_session
+    entity_id = Column(BinaryUUID, nullable=False)
+    op = Column(String(10), nullable=False)  # created, updated or deleted
+    user_id = Column(BinaryUUID, nullable=True)  # A session's owner
+    changed_at = Column(Timestamp, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<ChangeLogDB(seq={self.seq}, entity={self.entity}, entity_id={self.entity_id}, op={self.op})>"
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Optional
+from typing import Any, Dict, List, Literal, Optional
 from typing_extensions import Annotated
 from uuid import UUID, uuid4
 from datetime import date, datetime
@@ -151,3 +151,55 @@ class MatchaSessionRead(MatchaSessionBase):
             ]
         }
     }
+
+
+class MatchaSessionSearchHit(MatchaSessionRead):
+    """A session matching a search query, with its relevance."""
+    score: float = Field(
+        ...,
+        description="Relevance to the query; higher is better. Only comparable within one query.",
+        json_schema_extra={"example": 5.92},
+    )
+
+
+class MatchaSessionBatchItemResult(BaseModel):
+    """Outcome for one item of a batch create, reported in request order."""
+    index: int = Field(..., description="Position of the item in the request array.")
+    id: Optional[UUID] = Field(None, description="Session ID, when the item was valid.")
+    status: Literal["created", "duplicate", "invalid"] = Field(
+        ..., description="created, duplicate (ID already exists or repeats in the batch) or invalid."
+    )
+    errors: Optional[List[Dict[str, Any]]] = Field(
+        None, description="Validation errors for invalid items."
+    )
+
+
+class MatchaSessionBatchResult(BaseModel):
+    """Summary and per-item results of POST /matcha-sessions:batch."""
+    created: int = Field(..., description="Number of sessions inserted.")
+    duplicates: int = Field(..., description="Number of items skipped as duplicate IDs.")
+    invalid: int = Field(..., description="Number of items that failed validation.")
+    results: List[MatchaSessionBatchItemResult] = Field(default_factory=list)
+
+    model_config = {
+        "json_schema_extra": {
+            "examples": [
+                {
+                    "created": 1,
+                    "duplicates": 1,
+                    "invalid": 1,
+                    "results": [
+                        {"index": 0, "id": "11111111-1111-4111-8111-111111111111", "status": "created"},
+                        {"index": 1, "id": "550e8400-e29b-41d4-a716-446655440000", "status": "duplicate"},
+                        {
+                            "index": 2,
+                            "status": "invalid",
+                            "errors": [
+                                {"loc": ["matcha_type"], "msg": "String should match pattern", "type": "string_pattern_mismatch"}
+                            ],
+                        },
+                    ],
+                }
+            ]
+        }
+    }
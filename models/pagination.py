@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+from typing import Generic, List, Optional, TypeVar
+
+from pydantic import BaseModel, Field
+
+T = TypeVar("T")
+
+
+class Page(BaseModel, Generic[T]):
+    """One page of a cursor-paginated listing."""
+    items: List[T] = Field(
+        default_factory=list,
+        description="Items on this page, ordered by creation time.",
+    )
+    next_cursor: Optional[str] = Field(
+        None,
+        description="Opaque cursor for the next page; null when this is the last page.",
+        json_schema_extra={"example": "WyIyMDI1LTAxLTE1VDEwOjIwOjMwIiwiOTk5OSJd"},
+    )
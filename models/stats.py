@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+
+class BrandStats(BaseModel):
+    """Session count and average rating for one brand."""
+    brand: str = Field(..., description="Brand name as stored on the sessions.")
+    sessions: int = Field(..., description="Number of sessions with this brand.")
+    average_rating: Optional[float] = Field(
+        None, description="Average rating of the rated sessions with this brand."
+    )
+
+
+class MatchaStats(BaseModel):
+    """Aggregated matcha session statistics for one user or for all sessions."""
+    total_sessions: int = Field(0, description="Number of sessions.")
+    rated_sessions: int = Field(0, description="Number of sessions that have a rating.")
+    average_rating: Optional[float] = Field(
+        None, description="Average rating over the rated sessions; null when none are rated."
+    )
+    sessions_per_month: Dict[str, int] = Field(
+        default_factory=dict, description="Session count per YYYY-MM of session_date, oldest first."
+    )
+    sessions_by_type: Dict[str, int] = Field(
+        default_factory=dict, description="Session count per matcha_type."
+    )
+    top_brands: List[BrandStats] = Field(
+        default_factory=list, description="Brands with the most sessions, most sessions first."
+    )
+
+    model_config = {
+        "json_schema_extra": {
+            "examples": [
+                {
+                    "total_sessions": 12,
+                    "rated_sessions": 10,
+                    "average_rating": 4.35,
+                    "sessions_per_month": {"2025-01": 7, "2025-02": 5},
+                    "sessions_by_type": {"Ceremonial Grade": 8, "Latte Grade": 4},
+                    "top_brands": [
+                        {"brand": "Ippodo", "sessions": 6, "average_rating": 4.6},
+                        {"brand": "Marukyu Koyamaen", "sessions": 3, "average_rating": 4.0},
+                    ],
+                }
+            ]
+        }
+    }
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Optional, List
+from typing import Any, Literal, Optional, List
 from typing_extensions import Annotated
 from uuid import UUID, uuid4
 from datetime import date, datetime
@@ -202,6 +202,13 @@ class UserRead(UserBase):
         description="Server-generated User ID.",
         json_schema_extra={"example": "99999999-9999-4999-8999-999999999999"},
     )
+    # Stored emails were validated when written; re-running the pure-Python
+    # email validator on every serialized user dominated list response time.
+    email: str = Field(
+        ...,
+        description="Primary email address.",
+        json_schema_extra={"format": "email", "example": "matcha@example.com"},
+    )
     created_at: datetime = Field(
         default_factory=datetime.utcnow,
         description="Creation timestamp (UTC).",
@@ -243,3 +250,56 @@ class UserRead(UserBase):
             ]
         }
     }
+
+
+class UserSearchHit(BaseModel):
+    """A user suggested for a typeahead query."""
+    id: UUID = Field(..., description="User ID.")
+    username: str = Field(..., json_schema_extra={"example": "matcha_lover"})
+    first_name: str = Field(..., json_schema_extra={"example": "Sakura"})
+    last_name: str = Field(..., json_schema_extra={"example": "Tanaka"})
+    score: float = Field(
+        ...,
+        description="Match quality between 0 and 2; exact prefixes score above typo matches.",
+        json_schema_extra={"example": 2.0},
+    )
+
+
+class UserImportIssue(BaseModel):
+    """A line of an NDJSON import that was not created."""
+    line: int = Field(..., description="1-based line number in the uploaded body.")
+    status: Literal["conflict", "invalid"] = Field(..., description="Why the line was skipped.")
+    detail: Any = Field(None, description="Conflict message or list of validation errors.")
+
+
+class UserImportResult(BaseModel):
+    """Summary of a streaming NDJSON user import."""
+    received: int = Field(0, description="Non-blank lines read from the body.")
+    created: int = Field(0, description="Users inserted (with their embedded sessions).")
+    conflicts: int = Field(0, description="Lines skipped because the username, email or a session ID exists.")
+    invalid: int = Field(0, description="Lines that were not valid JSON or failed UserCreate validation.")
+    issues: List[UserImportIssue] = Field(
+        default_factory=list,
+        description="Details of skipped lines, capped at the first 1000.",
+    )
+
+    model_config = {
+        "json_schema_extra": {
+            "examples": [
+                {
+                    "received": 3,
+                    "created": 1,
+                    "conflicts": 1,
+                    "invalid": 1,
+                    "issues": [
+                        {"line": 2, "status": "conflict", "detail": "Username already exists"},
+                        {
+                            "line": 3,
+                            "status": "invalid",
+                            "detail": [{"type": "missing", "loc": ["email"], "msg": "Field required"}],
+                        },
+                    ],
+                }
+            ]
+        }
+    }
@@ -0,0 +1,233 @@
+"""
+Multi-row write helpers shared by the batch and import endpoints.
+
+Rows are inserted with Core ``INSERT`` statements executed with a list of
+parameter sets, which PyMySQL sends as multi-row ``INSERT ... VALUES`` and
+SQLite runs as a single executemany, instead of one ORM flush per object.
+The statements target the tables, not the mapped classes: an ORM bulk INSERT
+leaves out NULL values and so starts a new statement wherever the set of
+NULL columns changes from one row to the next, which for sessions with
+optional brand, rating and notes meant close to one statement per row.
+"""
+import json
+import math
+from datetime import datetime
+from typing import List, Optional, Tuple
+from uuid import UUID, uuid4
+
+from pydantic import ValidationError
+from sqlalchemy import delete, insert, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models.db_models import MatchaSessionDB, UserDB
+from models.matcha_session import MatchaSessionBase, MatchaSessionCreate
+from models.user import UserCreate
+from services.changes import record_changes, session_change, user_change
+from services.stats import apply_session_changes
+from services.user_search import index_users
+
+# Largest IN-list sent in one existence lookup
+LOOKUP_CHUNK_SIZE = 1000
+
+# Session columns a client can set; a session whose values all match is unchanged
+SESSION_FIELDS = ("session_date", "location", "matcha_type", "brand", "rating", "notes")
+
+
+def session_to_row(session: MatchaSessionBase, user_id: Optional[UUID], now: datetime) -> dict:
+    """Column values for inserting a session with a multi-row Core INSERT."""
+    return {
+        "id": session.id,
+        "user_id": user_id,
+        "session_date": session.session_date,
+        "location": session.location,
+        "matcha_type": session.matcha_type,
+        "brand": session.brand,
+        "rating": session.rating,
+        "notes": session.notes,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def user_to_row(user: UserCreate, user_id: UUID, now: datetime) -> dict:
+    """Column values for inserting a user (without its sessions) with a Core INSERT."""
+    return {
+        "id": user_id,
+        "username": user.username,
+        "email": user.email,
+        "first_name": user.first_name,
+        "last_name": user.last_name,
+        "phone": user.phone,
+        "favorite_matcha_powder": user.favorite_matcha_powder,
+        "favorite_matcha_place": user.favorite_matcha_place,
+        "matcha_budget": user.matcha_budget,
+        "join_date": user.join_date,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def existing_session_ids(db: Session, ids: List[UUID]) -> set:
+    """Return the subset of ``ids`` already stored, looked up in IN-list chunks."""
+    found = set()
+    for start in range(0, len(ids), LOOKUP_CHUNK_SIZE):
+        chunk = ids[start:start + LOOKUP_CHUNK_SIZE]
+        found.update(row[0] for row in db.query(MatchaSessionDB.id).filter(MatchaSessionDB.id.in_(chunk)))
+    return found
+
+
+def existing_usernames_and_emails(db: Session, usernames: List[str], emails: List[str]) -> Tuple[set, set]:
+    """Return the (lower-cased) usernames and emails among the given ones that are taken."""
+    taken_usernames, taken_emails = set(), set()
+    if not usernames and not emails:
+        return taken_usernames, taken_emails
+    rows = db.query(UserDB.username, UserDB.email).filter(
+        or_(UserDB.username.in_(usernames), UserDB.email.in_(emails))
+    )
+    for username, email in rows:
+        taken_usernames.add(username.lower())
+        taken_emails.add(email.lower())
+    return taken_usernames, taken_emails
+
+
+def _same(stored, value) -> bool:
+    # rating is a single-precision FLOAT on MySQL, so 4.1 reads back as 4.0999999
+    if isinstance(stored, float) and isinstance(value, float):
+        return math.isclose(stored, value, rel_tol=1e-6)
+    return stored == value
+
+
+def replace_user_sessions(db: Session, user_id: UUID, sessions: List[MatchaSessionCreate]) -> dict:
+    """
+    Make ``sessions`` the complete session list of ``user_id`` by diffing on session ID.
+
+    Stored sessions missing from the list are deleted, new IDs are inserted and
+    sessions whose fields differ are updated, each kind in batched statements,
+    so the writes scale with what changed rather than with the list length.
+    Returns the diff as ``inserted``, ``updated`` and ``deleted`` lists: the
+    written rows, ``(old, new)`` pairs and the removed rows, where old rows are
+    query rows carrying every session column. ``sessions`` holds the resulting
+    rows in request order, timestamps included, to answer without a reload.
+    """
+    stored = {
+        row.id: row
+        for row in db.query(*MatchaSessionDB.__table__.columns).filter(MatchaSessionDB.user_id == user_id)
+    }
+    now = datetime.utcnow()
+    inserted, updated, current = [], [], []
+    for session in sessions:
+        row = session_to_row(session, user_id, now)
+        old = stored.pop(row["id"], None)
+        if old is None:
+            inserted.append(row)
+        elif any(not _same(getattr(old, f), row[f]) for f in SESSION_FIELDS):
+            row["created_at"] = old.created_at
+            updated.append((old, row))
+        else:
+            row = dict(old._mapping)
+        current.append(row)
+    deleted = list(stored.values())
+
+    if deleted:
+        ids = [row.id for row in deleted]
+        for start in range(0, len(ids), LOOKUP_CHUNK_SIZE):
+            db.execute(
+                delete(MatchaSessionDB).where(MatchaSessionDB.id.in_(ids[start:start + LOOKUP_CHUNK_SIZE])),
+                execution_options={"synchronize_session": False},
+            )
+    if updated:
+        # ORM bulk UPDATE by primary key: one executemany for all changed rows
+        db.execute(
+            update(MatchaSessionDB),
+            [{"id": new["id"], "updated_at": now, **{f: new[f] for f in SESSION_FIELDS}} for _, new in updated],
+        )
+    if inserted:
+        # One statement for all added sessions, whatever their NULL columns (module docstring)
+        db.execute(insert(MatchaSessionDB.__table__), inserted)
+    return {"inserted": inserted, "updated": updated, "deleted": deleted, "sessions": current}
+
+
+def _issue(line: int, status: str, detail=None) -> dict:
+    return {"line": line, "status": status, "detail": detail}
+
+
+def import_users_chunk(db: Session, lines: List[Tuple[int, bytes]]) -> List[dict]:
+    """
+    Validate and insert one chunk of NDJSON user lines in a single transaction.
+
+    Username/email conflicts with stored users are resolved with one batched
+    lookup, and conflicts inside the chunk (case-insensitive, as MySQL compares
+    them) keep the first occurrence. Returns one outcome dict per line with a
+    ``status`` of created, conflict or invalid.
+    """
+    outcomes = {}
+    candidates = []  # (line number, UserCreate)
+    for line_no, raw in lines:
+        try:
+            candidates.append((line_no, UserCreate.model_validate(json.loads(raw))))
+        except ValueError as e:
+            # ValidationError and JSONDecodeError are both ValueErrors
+            detail = (
+                e.errors(include_url=False, include_context=False, include_input=False)
+                if isinstance(e, ValidationError)
+                else [{"type": "json_invalid", "loc": [], "msg": str(e)}]
+            )
+            outcomes[line_no] = _issue(line_no, "invalid", detail)
+
+    # A concurrent writer can take a username, email or session ID between the
+    # lookup and the INSERT, so re-check once and retry before giving up.
+    for attempt in range(2):
+        taken_usernames, taken_emails = existing_usernames_and_emails(
+            db, [u.username for _, u in candidates], [u.email for _, u in candidates]
+        )
+        taken_sessions = existing_session_ids(
+            db, [s.id for _, u in candidates for s in u.matcha_sessions]
+        )
+        accepted, user_rows, session_rows = [], [], []
+        now = datetime.utcnow()
+        for line_no, user in candidates:
+            username, email = user.username.lower(), user.email.lower()
+            session_ids = {s.id for s in user.matcha_sessions}
+            if username in taken_usernames:
+                outcomes[line_no] = _issue(line_no, "conflict", "Username already exists")
+                continue
+            if email in taken_emails:
+                outcomes[line_no] = _issue(line_no, "conflict", "Email already exists")
+                continue
+            if len(session_ids) != len(user.matcha_sessions) or session_ids & taken_sessions:
+                outcomes[line_no] = _issue(line_no, "conflict", "Matcha session with this ID already exists")
+                continue
+            taken_usernames.add(username)
+            taken_emails.add(email)
+            taken_sessions |= session_ids
+
+            user_id = uuid4()
+            user_rows.append(user_to_row(user, user_id, now))
+            session_rows.extend(session_to_row(s, user_id, now) for s in user.matcha_sessions)
+            accepted.append(line_no)
+        try:
+            if user_rows:
+                # Through the tables, so optional fields left empty do not split the INSERTs (module docstring)
+                db.execute(insert(UserDB.__table__), user_rows)
+                index_users(db, user_rows)
+            if session_rows:
+                db.execute(insert(MatchaSessionDB.__table__), session_rows)
+                apply_session_changes(db, added=session_rows)
+            record_changes(
+                db,
+                [user_change("created", row["id"]) for row in user_rows]
+                + [session_change("created", row) for row in session_rows],
+            )
+            db.commit()
+            break
+        except IntegrityError:
+            db.rollback()
+            if attempt:
+                for line_no in accepted:
+                    outcomes[line_no] = _issue(line_no, "conflict", "Conflicting concurrent writes")
+                accepted = []
+
+    for line_no in accepted:
+        outcomes[line_no] = _issue(line_no, "created")
+    return [outcomes[line_no] for line_no, _ in lines]
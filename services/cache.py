@@ -0,0 +1,199 @@
+"""
+Read-through cache for serialized single-entity reads.
+
+``GET /users/{user_id}`` and ``GET /matcha-sessions/{session_id}`` store the
+JSON body they return under an entity key, and every write path that can
+change that body deletes the key after committing. Values are bytes, so a
+backend only has to store opaque blobs: the default is a per-process LRU with
+a TTL, and anything implementing :class:`CacheBackend` (e.g. a Redis client
+wrapper) can be plugged in through :func:`set_backend`.
+
+A read that misses loads the entity and then stores it. A write that commits
+and invalidates in between would leave the body loaded before it in the
+cache, so a miss notes the key's generation before loading and the store is
+dropped if an invalidation bumped it meanwhile.
+
+The in-process backend is per worker, so a write served by one worker cannot
+evict entries held by another; ``CACHE_TTL_SECONDS`` bounds how long such an
+entry can be served stale. Generations are per worker too.
+"""
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional
+
+# Invalidation generations are kept in a fixed number of slots shared by hashed
+# keys. Keys that share a slot only cost each other an occasional skipped store.
+GENERATION_SLOTS = 4096
+
+
+class CacheBackend(ABC):
+    """Storage interface for cached entity bodies."""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the value stored under ``key``, or None when absent or expired."""
+
+    @abstractmethod
+    def set(self, key: str, value: bytes) -> None:
+        """Store ``value`` under ``key``."""
+
+    @abstractmethod
+    def delete(self, *keys: str) -> None:
+        """Remove ``keys``; missing keys are ignored."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove every entry."""
+
+    def size(self) -> Optional[int]:
+        """Number of stored entries, when the backend can tell cheaply."""
+        return None
+
+
+class MemoryCacheBackend(CacheBackend):
+    """Thread-safe in-process LRU cache with a per-entry TTL."""
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 30.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def size(self) -> Optional[int]:
+        return len(self._entries)
+
+
+class NullCacheBackend(CacheBackend):
+    """Backend that stores nothing, used when CACHE_BACKEND=none."""
+
+    def get(self, key: str) -> Optional[bytes]:
+        return None
+
+    def set(self, key: str, value: bytes) -> None:
+        pass
+
+    def delete(self, *keys: str) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+
+class EntityCache:
+    """Counts hits, misses and invalidations around a :class:`CacheBackend`."""
+
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+        self._counters = {"hits": 0, "misses": 0, "sets": 0, "stale_sets": 0, "invalidations": 0}
+        self._lock = threading.Lock()
+        self._generations = [0] * GENERATION_SLOTS
+        # Orders stores against invalidations, so none lands between a bump and its delete
+        self._write_lock = threading.Lock()
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += amount
+
+    def get(self, key: str) -> Optional[bytes]:
+        value = self.backend.get(key)
+        self._count("misses" if value is None else "hits")
+        return value
+
+    def generation(self, key: str) -> int:
+        """Invalidation generation of ``key``: take it before loading a value to :meth:`set`."""
+        return self._generations[hash(key) % GENERATION_SLOTS]
+
+    def set(self, key: str, value: bytes, generation: Optional[int] = None) -> None:
+        """Store ``value``, unless ``key`` was invalidated since ``generation`` was taken."""
+        with self._write_lock:
+            if generation is not None and generation != self.generation(key):
+                stored = False
+            else:
+                self.backend.set(key, value)
+                stored = True
+        self._count("sets" if stored else "stale_sets")
+
+    def invalidate(self, *keys: str) -> None:
+        keys = [k for k in keys if k]
+        if keys:
+            with self._write_lock:
+                for key in keys:
+                    self._generations[hash(key) % GENERATION_SLOTS] += 1
+                self.backend.delete(*keys)
+            self._count("invalidations", len(keys))
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counters)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        stats["backend"] = type(self.backend).__name__
+        stats["entries"] = self.backend.size()
+        return stats
+
+
+def user_key(user_id) -> str:
+    return f"user:{user_id}"
+
+
+def session_key(session_id) -> str:
+    return f"matcha_session:{session_id}"
+
+
+def build_backend() -> CacheBackend:
+    """
+    Create the cache backend from the environment.
+
+    Environment variables:
+    - CACHE_BACKEND: memory (default) or none
+    - CACHE_MAX_ENTRIES: Entries kept per worker process (default: 10000)
+    - CACHE_TTL_SECONDS: Seconds an entry may be served (default: 30)
+    """
+    kind = os.environ.get("CACHE_BACKEND", "memory").strip().lower()
+    if kind == "none":
+        return NullCacheBackend()
+    if kind == "memory":
+        return MemoryCacheBackend(
+            max_entries=int(os.environ.get("CACHE_MAX_ENTRIES", 10000)),
+            ttl_seconds=float(os.environ.get("CACHE_TTL_SECONDS", 30)),
+        )
+    raise ValueError(f"Unsupported CACHE_BACKEND: {kind}")
+
+
+entity_cache = EntityCache(build_backend())
+
+
+def set_backend(backend: CacheBackend) -> None:
+    """Point the shared entity cache at another backend (e.g. an external store)."""
+    entity_cache.backend = backend
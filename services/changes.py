@@ -0,0 +1,178 @@
+"""
+Change feed for client sync.
+
+Every API write path passes what it changed to :func:`record_changes` inside
+its own transaction, which appends one ``change_log`` row per created,
+updated or deleted user or session. Deletions stay in the log as tombstones.
+The table's auto-increment primary key ``seq`` orders the feed, so
+:func:`read_changes` serves a page with one primary key range scan after the
+client's cursor. A page returns the latest change per entity with the
+entity's current fields.
+
+A ``seq`` is handed out when its row is inserted, not when the transaction
+commits. On MySQL a reader can therefore see seq 11 committed while seq 10
+is still in flight. A page stops at a gap in the sequence until the gap is
+:data:`SETTLE_SECONDS` old. After that the missing numbers are taken to be
+rolled back (InnoDB never reuses them) and skipped.
+
+The log starts empty. On a database that already has users and sessions,
+record them once as created, so that a client reading the feed from the
+start receives everything::
+
+    python -m services.changes backfill
+"""
+import argparse
+import os
+import sys
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from sqlalchemy import insert, literal, null, select
+from sqlalchemy.orm import Session
+
+from models.db_models import ChangeLogDB, MatchaSessionDB, UserDB
+from utils.database import SessionLocal, init_db
+from utils.pagination import decode_cursor, encode_cursor
+from utils.projection import USER_FIELDS
+
+USER = "user"
+SESSION = "matcha_session"
+
+# How long a gap in the sequence may be waited on by readers: longer than a
+# write transaction takes from its change_log INSERT to its commit
+SETTLE_SECONDS = float(os.environ.get("CHANGE_FEED_SETTLE_SECONDS", 5))
+
+_COLUMNS = ("entity", "op", "entity_id", "user_id", "changed_at")
+
+
+def user_change(op: str, user_id) -> tuple:
+    """A change to a user, for :func:`record_changes`."""
+    return USER, op, user_id, None
+
+
+def session_change(op: str, session) -> tuple:
+    """A change to a MatchaSessionDB, a query row or a ``session_to_row()`` dict."""
+    if isinstance(session, dict):
+        return SESSION, op, session["id"], session["user_id"]
+    return SESSION, op, session.id, session.user_id
+
+
+def session_changes(op: str, session) -> list:
+    """A session's change plus an update of its owner, whose updated_at the write bumps too."""
+    owner = session["user_id"] if isinstance(session, dict) else session.user_id
+    return [session_change(op, session)] + ([user_change("updated", owner)] if owner else [])
+
+
+def record_changes(db: Session, changes: Iterable[tuple]) -> None:
+    """
+    Append ``changes`` to the log in ``db``'s transaction, with one INSERT.
+
+    Call it last before committing: the sooner the commit follows, the less
+    readers wait on the new sequence numbers.
+    """
+    now = datetime.utcnow()
+    rows = [dict(zip(_COLUMNS, change + (now,))) for change in changes]
+    if rows:
+        db.execute(insert(ChangeLogDB.__table__), rows)
+
+
+def _current_fields(db: Session, entries: list) -> dict:
+    """(entity, id) -> current fields of the entries' entities that still exist."""
+    ids = {USER: [], SESSION: []}
+    for entry in entries:
+        if entry.op != "deleted":
+            ids[entry.entity].append(entry.entity_id)
+    fields = {}
+    if ids[USER]:
+        columns = [getattr(UserDB, f) for f in USER_FIELDS]
+        for row in db.query(*columns).filter(UserDB.id.in_(ids[USER])):
+            fields[(USER, row.id)] = dict(row._mapping)
+    if ids[SESSION]:
+        query = db.query(*MatchaSessionDB.__table__.columns).filter(MatchaSessionDB.id.in_(ids[SESSION]))
+        for row in query:
+            fields[(SESSION, row.id)] = dict(row._mapping)
+    return fields
+
+
+def read_changes(db: Session, since: Optional[str], limit: int) -> dict:
+    """
+    The changes after cursor ``since`` (from the start of the log when None).
+
+    Reads up to ``limit`` log entries and keeps the latest per entity. Returns
+    a ChangeFeed-shaped dict. Raises InvalidCursorError for a bad cursor.
+    """
+    c = ChangeLogDB
+    after = decode_cursor(since, [c.seq])[0] if since else 0
+    rows = (
+        db.query(c.seq, *(c.__table__.c[name] for name in _COLUMNS))
+        .filter(c.seq > after)
+        .order_by(c.seq)
+        .limit(limit + 1)
+        .all()
+    )
+
+    settled = datetime.utcnow() - timedelta(seconds=SETTLE_SECONDS)
+    latest, last = {}, after
+    for row in rows[:limit]:
+        if row.seq != last + 1 and row.changed_at > settled:
+            break  # An earlier seq may still commit
+        latest.pop((row.entity, row.entity_id), None)
+        latest[(row.entity, row.entity_id)] = row
+        last = row.seq
+
+    fields = _current_fields(db, list(latest.values()))
+    items = [
+        {
+            "seq": row.seq,
+            "entity": row.entity,
+            "id": row.entity_id,
+            "op": row.op,
+            "user_id": row.user_id,
+            "changed_at": row.changed_at,
+            "data": fields.get((row.entity, row.entity_id)) if row.op != "deleted" else None,
+        }
+        for row in latest.values()
+    ]
+    has_more = len(rows) > limit and last == rows[limit - 1].seq
+    return {"items": items, "next_cursor": encode_cursor([last]), "has_more": has_more}
+
+
+def backfill(db: Session) -> int:
+    """
+    Record every stored user, then every session, as created, and commit.
+
+    Only for an empty log: entries already there would be duplicated.
+    Returns the number of entries written.
+    """
+    if db.query(ChangeLogDB.seq).first() is not None:
+        raise ValueError("change_log is not empty")
+    u, s = UserDB, MatchaSessionDB
+    for query in (
+        select(literal(USER), literal("created"), u.id, null(), u.updated_at).order_by(u.created_at, u.id),
+        select(literal(SESSION), literal("created"), s.id, s.user_id, s.updated_at).order_by(s.created_at, s.id),
+    ):
+        db.execute(insert(ChangeLogDB).from_select(list(_COLUMNS), query))
+    db.commit()
+    return db.query(ChangeLogDB).count()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Maintain the change feed log.")
+    parser.add_argument("command", choices=["backfill"], help="backfill: record existing rows as created")
+    parser.parse_args(argv)
+
+    init_db()
+    db = SessionLocal()
+    try:
+        entries = backfill(db)
+    except ValueError as e:
+        print(f"Not backfilled: {e}", file=sys.stderr)
+        return 1
+    finally:
+        db.close()
+    print(f"Recorded {entries} existing users and sessions in the change log")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""
+Streaming NDJSON/CSV export of table rows.
+
+Rows are read through a server-side cursor in ``yield_per`` batches (PyMySQL
+``SSCursor`` on MySQL) and encoded batch by batch, so an export of millions of
+rows holds one batch in memory and the first bytes go out as soon as the first
+batch is fetched.
+"""
+import csv
+import io
+import json
+from datetime import date, datetime
+from typing import Callable, Iterator, List
+from uuid import UUID
+
+from sqlalchemy.orm import Query, Session
+
+from utils.database import SessionLocal
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+# Rows fetched from the server-side cursor and encoded per yielded chunk
+EXPORT_BATCH_ROWS = 1000
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _encode_ndjson(columns: List[str], rows) -> bytes:
+    return "".join(
+        json.dumps(dict(zip(columns, row)), default=_json_default, separators=(",", ":")) + "\n"
+        for row in rows
+    ).encode()
+
+
+def _encode_csv(rows) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(
+        [v.isoformat() if isinstance(v, (date, datetime)) else v for v in row] for row in rows
+    )
+    return buffer.getvalue().encode()
+
+
+def stream_export(build_query: Callable[[Session], Query], columns: List[str], fmt: str) -> Iterator[bytes]:
+    """
+    Yield encoded chunks of the rows returned by ``build_query(session)``.
+
+    ``build_query`` must select exactly ``columns``. The generator owns its own
+    session, since it is consumed by the response after the endpoint returns.
+    """
+    db = SessionLocal()
+    try:
+        if fmt == "csv":
+            yield _encode_csv([columns])
+        batch = []
+        for row in build_query(db).yield_per(EXPORT_BATCH_ROWS):
+            batch.append(tuple(row))
+            if len(batch) >= EXPORT_BATCH_ROWS:
+                yield _encode_csv(batch) if fmt == "csv" else _encode_ndjson(columns, batch)
+                batch = []
+        if batch:
+            yield _encode_csv(batch) if fmt == "csv" else _encode_ndjson(columns, batch)
+    finally:
+        db.close()
@@ -0,0 +1,138 @@
+"""
+Full-text search over matcha session notes and locations.
+
+MySQL uses an InnoDB ``FULLTEXT`` index on ``(notes, location)`` (declared on
+MatchaSessionDB) queried with ``MATCH ... AGAINST`` in natural language mode.
+SQLite, used for local runs, uses an FTS5 table over the same columns with
+porter stemming. It is an external-content index: it stores only the terms,
+keyed by the session's rowid, and triggers on matcha_sessions keep it in
+step with every insert, update and delete, whichever code path writes them.
+Both engines return results ranked by relevance, best first, and pages are
+keyset-paginated on (score, id) like the other listings.
+
+The FTS5 table is created with the schema and filled from existing rows the
+first time. SQLite may renumber rowids in ``VACUUM``, so after one, or if the
+index is ever in doubt, rebuild it with::
+
+    python -m services.search rebuild
+"""
+import argparse
+import re
+import sys
+from typing import List, Optional, Tuple
+
+from sqlalchemy import Float, column, event, func, literal_column, table, text, type_coerce
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.orm import Session
+
+from models.db_models import MatchaSessionDB
+from utils.database import Base, SessionLocal, init_db
+from utils.pagination import paginate
+
+FTS_TABLE = "matcha_sessions_fts"
+_fts = table(FTS_TABLE, column("rowid"))
+
+# Terms of a query longer than this are ignored
+MAX_QUERY_TERMS = 32
+
+_SQLITE_DDL = (
+    f"""CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        notes, location, content='matcha_sessions', content_rowid='rowid', tokenize='porter unicode61'
+    )""",
+    f"""CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON matcha_sessions BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, notes, location) VALUES (new.rowid, new.notes, new.location);
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON matcha_sessions BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, notes, location)
+        VALUES ('delete', old.rowid, old.notes, old.location);
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF notes, location ON matcha_sessions BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, notes, location)
+        VALUES ('delete', old.rowid, old.notes, old.location);
+        INSERT INTO {FTS_TABLE}(rowid, notes, location) VALUES (new.rowid, new.notes, new.location);
+    END""",
+)
+
+
+def _create_sqlite_index(target, connection, **kw):
+    """Create the FTS5 table and its triggers on SQLite if missing, indexing existing sessions."""
+    if connection.dialect.name != "sqlite":
+        return
+    exists = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": FTS_TABLE}
+    ).first()
+    if exists:
+        return
+    for statement in _SQLITE_DDL:
+        connection.exec_driver_sql(statement)
+    connection.exec_driver_sql(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+# init_db runs create_all on every start, so existing databases get the index too
+event.listen(Base.metadata, "after_create", _create_sqlite_index)
+
+
+def query_terms(q: str) -> List[str]:
+    """The words of a search query; punctuation and search operators are dropped."""
+    return re.findall(r"\w+", q)[:MAX_QUERY_TERMS]
+
+
+def _score(db: Session, terms: List[str]):
+    """(relevance score column, match condition) for the session's dialect."""
+    dialect = db.get_bind().dialect.name
+    s = MatchaSessionDB
+    if dialect == "mysql":
+        relevance = match(s.notes, s.location, against=" ".join(terms)).in_natural_language_mode()
+        return type_coerce(relevance, Float), relevance
+    if dialect == "sqlite":
+        fts = literal_column(FTS_TABLE)
+        # bm25() is lower for better matches; negate it so higher is better on both engines
+        fts_query = " OR ".join(f'"{term}"' for term in terms)
+        return type_coerce(-func.bm25(fts), Float), fts.op("MATCH")(fts_query)
+    raise NotImplementedError(f"Full-text search is not supported on {dialect}")
+
+
+def search_sessions(db: Session, q: str, limit: int, cursor: Optional[str]) -> Tuple[list, Optional[str]]:
+    """
+    One page of sessions whose notes or location match ``q``, best match first.
+
+    Rows carry every session column plus ``score``. Raises ValueError when
+    ``q`` contains no searchable words and NotImplementedError on databases
+    without a text index.
+    """
+    terms = query_terms(q)
+    if not terms:
+        raise ValueError("Search query must contain at least one word")
+    score, condition = _score(db, terms)
+    score = score.label("score")
+    query = db.query(*MatchaSessionDB.__table__.columns, score)
+    if db.get_bind().dialect.name == "sqlite":
+        query = query.select_from(MatchaSessionDB).join(_fts, _fts.c.rowid == literal_column("matcha_sessions.rowid"))
+    query = query.filter(condition)
+    return paginate(query, [score, MatchaSessionDB.id], cursor, limit, descending=True)
+
+
+def rebuild(db: Session) -> None:
+    """Re-index every session (SQLite only; MySQL maintains its FULLTEXT index itself)."""
+    if db.get_bind().dialect.name == "sqlite":
+        db.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+        db.commit()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Maintain the matcha session search index.")
+    parser.add_argument("command", choices=["rebuild"], help="rebuild: re-index all sessions")
+    parser.parse_args(argv)
+
+    init_db()
+    db = SessionLocal()
+    try:
+        rebuild(db)
+    finally:
+        db.close()
+    print("Rebuilt the session search index")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,267 @@
+"""
+Incrementally maintained matcha session statistics.
+
+Every write path that creates, changes or removes sessions passes them to
+:func:`apply_session_changes` inside its transaction. The changes are folded
+into per-bucket deltas of (session count, rated count, rating sum) and added to
+the ``session_rollups`` rows of the owning user's scope and of the global
+scope with one upsert, so the counters are incremented atomically and never
+read first. Stats reads then fetch a handful of rollup rows by primary key
+prefix instead of scanning the user's sessions. A scope is a (kind, id) pair,
+so the global scope cannot be reached through a user ID.
+
+Every session write changes the global counters, and an upsert holds its row
+locks until commit. So that concurrent writers do not all queue on the same
+few rows, the global scope is split into :data:`GLOBAL_SHARDS` shards (ids
+0, 1, ...). Each database session adds its deltas to one shard picked at
+random, and global reads sum the shards.
+
+If the rollups ever drift (e.g. rows written outside the API) or the table is
+new on an existing database, recompute them from matcha_sessions with::
+
+    python -m services.stats rebuild [--recreate]
+
+``--recreate`` first drops and recreates the table, for when its columns
+changed.
+"""
+import argparse
+import heapq
+import os
+import random
+import sys
+from collections import defaultdict
+from typing import Iterable, NamedTuple, Optional
+from uuid import UUID
+
+from sqlalchemy import func, insert, literal
+from sqlalchemy.orm import Session
+
+from models.db_models import MatchaSessionDB, SessionRollupDB
+from models.stats import BrandStats, MatchaStats
+from utils.binary_uuid import BinaryUUID, as_uuid
+from utils.database import SessionLocal, init_db
+from utils.upsert import upsert_statement
+
+# Rollup scope of every session, whoever owns it; read_stats() sums its shards
+GLOBAL_KIND = "global"
+GLOBAL_SCOPE = (GLOBAL_KIND, None)
+
+# Shards the global counters are spread over. Reads sum whatever shards hold
+# rows, so the number can be changed at any time.
+GLOBAL_SHARDS = int(os.environ.get("STATS_GLOBAL_SHARDS", 16))
+
+# Rollup rows sent per upsert statement
+UPSERT_CHUNK_ROWS = 500
+
+_KEY = ("scope_kind", "scope_id", "dimension", "bucket")
+_COUNTERS = ("session_count", "rating_count", "rating_sum")
+
+
+class SessionFacts(NamedTuple):
+    """The session fields the rollups depend on."""
+    user_id: Optional[UUID]
+    session_date: object
+    matcha_type: str
+    brand: Optional[str]
+    rating: Optional[float]
+
+
+def session_facts(session) -> SessionFacts:
+    """Snapshot a MatchaSessionDB, a query row or a ``session_to_row()`` dict."""
+    if isinstance(session, dict):
+        return SessionFacts(*(session[field] for field in SessionFacts._fields))
+    return SessionFacts(*(getattr(session, field) for field in SessionFacts._fields))
+
+
+def user_scope(user_id) -> tuple:
+    """Rollup scope of one user's sessions."""
+    # Owners may come as UUIDs or strings; one type keeps the keys sortable
+    return "user", as_uuid(user_id)
+
+
+def global_shard(shard: int) -> tuple:
+    """Rollup scope of one shard of the global counters."""
+    return GLOBAL_KIND, UUID(int=shard)
+
+
+def _buckets(facts: SessionFacts):
+    yield "total", ""
+    yield "month", facts.session_date.strftime("%Y-%m")
+    yield "type", facts.matcha_type
+    if facts.brand is not None:
+        yield "brand", facts.brand
+
+
+def rollup_deltas(added: Iterable = (), removed: Iterable = (), shard: int = 0) -> dict:
+    """
+    Net counter changes per (scope_kind, scope_id, dimension, bucket), without
+    no-op entries; global changes go to ``shard``.
+    """
+    deltas = defaultdict(lambda: [0, 0, 0.0])
+    for sign, sessions in ((1, added), (-1, removed)):
+        for session in sessions:
+            facts = session_facts(session)
+            scopes = [global_shard(shard)] + ([user_scope(facts.user_id)] if facts.user_id else [])
+            for dimension, bucket in _buckets(facts):
+                for scope in scopes:
+                    delta = deltas[scope + (dimension, bucket)]
+                    delta[0] += sign
+                    if facts.rating is not None:
+                        delta[1] += sign
+                        delta[2] += sign * facts.rating
+    return {key: delta for key, delta in deltas.items() if any(delta)}
+
+
+def apply_session_changes(db: Session, added: Iterable = (), removed: Iterable = ()) -> None:
+    """
+    Add the rollup changes for ``added`` and ``removed`` sessions to ``db``'s transaction.
+
+    An updated session is passed as its old snapshot (see :func:`session_facts`)
+    in ``removed`` and its new state in ``added``; fields that did not change
+    cancel out. Rows are upserted in key order so concurrent writers touching
+    the same buckets lock them in the same order. The global shard is picked
+    once per database session, so a transaction never locks rows of two.
+    """
+    shard = db.info.get("rollup_shard")
+    if shard is None:
+        shard = db.info["rollup_shard"] = random.randrange(GLOBAL_SHARDS)
+    deltas = rollup_deltas(added, removed, shard)
+    if not deltas:
+        return
+    rows = [dict(zip(_KEY + _COUNTERS, key + tuple(deltas[key]))) for key in sorted(deltas)]
+    table = SessionRollupDB.__table__
+    for start in range(0, len(rows), UPSERT_CHUNK_ROWS):
+        db.execute(upsert_statement(
+            db,
+            table,
+            rows[start:start + UPSERT_CHUNK_ROWS],
+            _KEY,
+            lambda new: {c: table.c[c] + new[c] for c in _COUNTERS},
+        ))
+
+
+def forget_user(db: Session, user_id: UUID, sessions: Iterable) -> None:
+    """Remove a deleted user's rollups and take its ``sessions`` out of the global ones."""
+    apply_session_changes(db, removed=[session_facts(s)._replace(user_id=None) for s in sessions])
+    kind, scope_id = user_scope(user_id)
+    db.query(SessionRollupDB).filter(
+        SessionRollupDB.scope_kind == kind, SessionRollupDB.scope_id == scope_id
+    ).delete(synchronize_session=False)
+
+
+def read_stats(db: Session, scope: tuple, top_brands: int) -> MatchaStats:
+    """Assemble the stats of one scope (:func:`user_scope` or GLOBAL_SCOPE) from its rollup rows."""
+    r = SessionRollupDB
+    if scope is GLOBAL_SCOPE:
+        session_count = func.sum(r.session_count)
+        rows = (
+            db.query(r.dimension, r.bucket, session_count, func.sum(r.rating_count), func.sum(r.rating_sum))
+            .filter(r.scope_kind == GLOBAL_KIND)
+            .group_by(r.dimension, r.bucket)
+            .having(session_count > 0)
+            .all()
+        )
+    else:
+        kind, scope_id = scope
+        rows = (
+            db.query(r.dimension, r.bucket, r.session_count, r.rating_count, r.rating_sum)
+            .filter(r.scope_kind == kind, r.scope_id == scope_id, r.session_count > 0)
+            .all()
+        )
+    stats = MatchaStats()
+    brands = []
+    for dimension, bucket, session_count, rating_count, rating_sum in rows:
+        # MySQL sums integers as DECIMAL
+        session_count, rating_count, rating_sum = int(session_count), int(rating_count), float(rating_sum)
+        average = rating_sum / rating_count if rating_count else None
+        if dimension == "total":
+            stats.total_sessions = session_count
+            stats.rated_sessions = rating_count
+            stats.average_rating = average
+        elif dimension == "month":
+            stats.sessions_per_month[bucket] = session_count
+        elif dimension == "type":
+            stats.sessions_by_type[bucket] = session_count
+        elif dimension == "brand":
+            brands.append(BrandStats(brand=bucket, sessions=session_count, average_rating=average))
+    stats.sessions_per_month = dict(sorted(stats.sessions_per_month.items()))
+    stats.top_brands = heapq.nlargest(top_brands, brands, key=lambda b: (b.sessions, b.brand))
+    return stats
+
+
+def _month_bucket(db: Session):
+    """SQL expression for the YYYY-MM bucket of session_date."""
+    if db.get_bind().dialect.name == "mysql":
+        return func.date_format(MatchaSessionDB.session_date, "%Y-%m")
+    return func.strftime("%Y-%m", MatchaSessionDB.session_date)
+
+
+def rebuild(db: Session, recreate: bool = False) -> int:
+    """
+    Recompute every rollup row from matcha_sessions and commit.
+
+    With ``recreate`` the table is dropped and created from the model first,
+    which brings an existing table's columns up to date.
+
+    Each (scope, dimension) pair is one ``INSERT ... SELECT ... GROUP BY``, so
+    the sessions are aggregated by the database and never loaded into Python.
+    Returns the number of rollup rows written.
+    """
+    s = MatchaSessionDB
+    if recreate:
+        table = SessionRollupDB.__table__
+        table.drop(db.connection(), checkfirst=True)
+        table.create(db.connection())
+    db.query(SessionRollupDB).delete(synchronize_session=False)
+    dimensions = [
+        ("total", None),
+        ("month", _month_bucket(db)),
+        ("type", s.matcha_type),
+        ("brand", s.brand),
+    ]
+    for dimension, bucket in dimensions:
+        for per_user in (False, True):
+            group_by = ([s.user_id] if per_user else []) + ([bucket] if bucket is not None else [])
+            if per_user:
+                kind, scope_id = "user", s.user_id
+            else:
+                kind, scope_id = global_shard(0)
+                scope_id = literal(scope_id, BinaryUUID)
+            query = db.query(
+                literal(kind),
+                scope_id,
+                literal(dimension),
+                bucket if bucket is not None else literal(""),
+                func.count(),
+                func.count(s.rating),
+                func.coalesce(func.sum(s.rating), 0),
+            )
+            if per_user:
+                query = query.filter(s.user_id.isnot(None))
+            if dimension == "brand":
+                query = query.filter(s.brand.isnot(None))
+            if group_by:
+                query = query.group_by(*group_by)
+            db.execute(insert(SessionRollupDB).from_select(list(_KEY + _COUNTERS), query.statement))
+    db.commit()
+    return db.query(SessionRollupDB).count()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Maintain the matcha session rollups.")
+    parser.add_argument("command", choices=["rebuild"], help="rebuild: recompute all rollups from matcha_sessions")
+    parser.add_argument("--recreate", action="store_true", help="drop and recreate the table first")
+    args = parser.parse_args(argv)
+
+    init_db()
+    db = SessionLocal()
+    try:
+        rows = rebuild(db, recreate=args.recreate)
+    finally:
+        db.close()
+    print(f"Rebuilt {rows} session rollup rows")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,259 @@
+"""
+Typeahead search over usernames and names.
+
+Every user's username, first name and last name are broken into words
+(accents stripped, case folded, split on anything but letters and digits;
+the username is also kept whole without its separators), and each word into
+trigrams of the word padded with a space on both sides, so ``"Sakura"`` is
+indexed as `` sa``, ``sak``, ``aku``, ``kur``, ``ura`` and ``ra ``. The
+distinct trigrams go in ``user_search_grams`` with the user's ID, and the
+user write paths keep them in step: creates and imports insert them, updates
+that touch a name write only the trigrams that changed and deletes remove
+them.
+
+A query is split the same way, except that its last word gets no trailing
+space: the user is still typing it, so ``"saku"`` looks up `` sa``, ``sak``
+and ``aku`` and matches as a prefix. A match is a user sharing at least
+:data:`MIN_GRAM_OVERLAP` of the query's trigrams, so a typo costs a few
+trigrams rather than the match. Matches are ranked by the share of trigrams
+they hit, with a bonus when every query word is a prefix of one of their
+words.
+
+Common trigrams (`` ma``, ``an ``) have posting lists covering much of the
+table, so they are never read whole. A user with ``k`` of the query's ``n``
+trigrams must have at least one of its ``n - k + 1`` rarest, so the
+candidates are read from those rarest trigrams only. Each trigram's
+frequency is counted up to :data:`FREQUENCY_CAP` rows, and the candidates
+are limited to :data:`CANDIDATE_SCAN` postings, taken rarest first. The full
+overlap is then counted for the candidates alone, by primary key. A search
+therefore reads a bounded number of index entries however many users there
+are. Only a query made of nothing but common trigrams is cut short. It then
+ranks a sample of its matches, which are too many to show anyway.
+
+The table starts empty on an existing database; fill it (or repair it after
+writes made outside the API) with::
+
+    python -m services.user_search rebuild
+"""
+import argparse
+import math
+import re
+import sys
+import unicodedata
+from typing import Iterable, List, NamedTuple
+from uuid import UUID
+
+from sqlalchemy import delete, func, insert, literal, select, union_all
+from sqlalchemy.orm import Session
+
+from models.db_models import UserDB, UserSearchGramDB
+from utils.database import SessionLocal, init_db
+
+# Share of the query's trigrams a user must have to be a candidate
+MIN_GRAM_OVERLAP = 0.4
+
+# Candidates fetched from the database before ranking
+CANDIDATES = 50
+
+# Postings counted per trigram to tell rare trigrams from common ones
+FREQUENCY_CAP = 1000
+
+# Postings read from the rarest trigrams to collect candidates
+CANDIDATE_SCAN = 2000
+
+# Query words beyond this are ignored
+MAX_QUERY_WORDS = 8
+
+# Users indexed per INSERT in rebuild()
+REBUILD_CHUNK_USERS = 1000
+
+_SEPARATORS = re.compile(r"[\W_]+")
+
+
+class UserNames(NamedTuple):
+    """The user fields the search index depends on."""
+    id: UUID
+    username: str
+    first_name: str
+    last_name: str
+
+
+def user_names(user) -> UserNames:
+    """Snapshot a UserDB, a query row or a ``user_to_row()`` dict."""
+    if isinstance(user, dict):
+        return UserNames(*(user[field] for field in UserNames._fields))
+    return UserNames(*(getattr(user, field) for field in UserNames._fields))
+
+
+def normalize(value: str) -> List[str]:
+    """The searchable words of ``value``: accents stripped, case folded, split on separators."""
+    decomposed = unicodedata.normalize("NFKD", value)
+    folded = "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+    return [word for word in _SEPARATORS.split(folded) if word]
+
+
+def _word_grams(word: str, prefix: bool = False) -> List[str]:
+    padded = f" {word}" if prefix else f" {word} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def name_words(names: UserNames) -> List[str]:
+    """The words indexed for a user, including the username without its separators."""
+    username_words = normalize(names.username)
+    words = username_words + normalize(names.first_name) + normalize(names.last_name)
+    if len(username_words) > 1:
+        words.append("".join(username_words))
+    return words
+
+
+def name_grams(names: UserNames) -> set:
+    """The trigrams indexed for a user."""
+    return {gram for word in name_words(names) for gram in _word_grams(word)}
+
+
+def query_grams(q: str) -> set:
+    """The trigrams looked up for a query, its last word treated as a prefix."""
+    words = normalize(q)[:MAX_QUERY_WORDS]
+    grams = set()
+    for i, word in enumerate(words):
+        grams.update(_word_grams(word, prefix=i == len(words) - 1))
+    return grams
+
+
+def index_users(db: Session, users: Iterable) -> None:
+    """Add the trigrams of newly inserted users (UserDB objects, rows or dicts) in one INSERT."""
+    rows = [
+        {"gram": gram, "user_id": names.id}
+        for names in map(user_names, users)
+        for gram in name_grams(names)
+    ]
+    if rows:
+        db.execute(insert(UserSearchGramDB.__table__), rows)
+
+
+def reindex_user(db: Session, old: UserNames, new: UserNames) -> None:
+    """Replace a user's trigrams after a name change, writing only the ones that differ."""
+    old_grams, new_grams = name_grams(old), name_grams(new)
+    user_id = new.id
+    if old_grams - new_grams:
+        db.execute(
+            delete(UserSearchGramDB.__table__).where(
+                UserSearchGramDB.user_id == user_id,
+                UserSearchGramDB.gram.in_(sorted(old_grams - new_grams)),
+            )
+        )
+    if new_grams - old_grams:
+        db.execute(
+            insert(UserSearchGramDB.__table__),
+            [{"gram": gram, "user_id": user_id} for gram in sorted(new_grams - old_grams)],
+        )
+
+
+def unindex_user(db: Session, user_id: UUID) -> None:
+    """Remove a deleted user's trigrams."""
+    db.execute(delete(UserSearchGramDB.__table__).where(UserSearchGramDB.user_id == user_id))
+
+
+def _prefix_match(query_words: List[str], names: UserNames) -> bool:
+    words = name_words(names)
+    return all(any(word.startswith(q) for word in words) for q in query_words)
+
+
+def search_users(db: Session, q: str, limit: int) -> List[dict]:
+    """
+    Up to ``limit`` users matching the typeahead query ``q``, best first.
+
+    Each hit has the user's ID, username and names plus a ``score`` between 0
+    and 2: the share of the query's trigrams the user has, plus 1 when every
+    query word is a prefix of one of the user's words. Raises ValueError when
+    ``q`` has no word of at least two characters.
+    """
+    grams = query_grams(q)
+    if not grams:
+        raise ValueError("Search query must contain a word of at least 2 characters")
+    g = UserSearchGramDB
+    required = max(1, math.ceil(len(grams) * MIN_GRAM_OVERLAP))
+
+    # How common each trigram is, counting no further than FREQUENCY_CAP
+    frequencies = dict(db.execute(union_all(*(
+        select(literal(gram), func.count()).select_from(
+            select(g.user_id).where(g.gram == gram).limit(FREQUENCY_CAP).subquery()
+        )
+        for gram in sorted(grams)
+    ))).all())
+    rarest = sorted(grams, key=lambda gram: (frequencies[gram], gram))[:len(grams) - required + 1]
+
+    # Candidates: postings of the rarest trigrams, rarest first, CANDIDATE_SCAN in all
+    scans, budget = [], CANDIDATE_SCAN
+    for gram in rarest:
+        rows = min(frequencies[gram], budget)
+        if rows:
+            scans.append(select(g.user_id).where(g.gram == gram).limit(rows).subquery().select())
+            budget -= rows
+    if not scans:
+        return []
+    candidate_ids = union_all(*scans).subquery()
+
+    hits = func.count().label("hits")
+    candidates = (
+        db.query(g.user_id, hits)
+        .filter(g.gram.in_(sorted(grams)), g.user_id.in_(select(candidate_ids.c.user_id)))
+        .group_by(g.user_id)
+        .having(func.count() >= required)
+        .order_by(hits.desc(), g.user_id)
+        .limit(CANDIDATES)
+        .all()
+    )
+    if not candidates:
+        return []
+    counts = dict(candidates)
+    query_words = normalize(q)[:MAX_QUERY_WORDS]
+    scored = []
+    for user in db.query(UserDB.id, UserDB.username, UserDB.first_name, UserDB.last_name).filter(
+        UserDB.id.in_(list(counts))
+    ):
+        names = user_names(user)
+        score = counts[user.id] / len(grams) + (1.0 if _prefix_match(query_words, names) else 0.0)
+        scored.append({**names._asdict(), "score": round(score, 4)})
+    scored.sort(key=lambda hit: (-hit["score"], hit["username"].lower()))
+    return scored[:limit]
+
+
+def rebuild(db: Session) -> int:
+    """Re-index every user from the users table and commit. Returns the number of users indexed."""
+    db.query(UserSearchGramDB).delete(synchronize_session=False)
+    columns = (UserDB.id, UserDB.username, UserDB.first_name, UserDB.last_name)
+    indexed, last_id = 0, None
+    # Keyset chunks by ID rather than one streamed query, which MySQL would not
+    # allow alongside the INSERTs on the same connection
+    while True:
+        query = db.query(*columns)
+        if last_id is not None:
+            query = query.filter(UserDB.id > last_id)
+        chunk = query.order_by(UserDB.id).limit(REBUILD_CHUNK_USERS).all()
+        if not chunk:
+            break
+        index_users(db, chunk)
+        indexed += len(chunk)
+        last_id = chunk[-1].id
+    db.commit()
+    return indexed
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Maintain the user search index.")
+    parser.add_argument("command", choices=["rebuild"], help="rebuild: re-index all users")
+    parser.parse_args(argv)
+
+    init_db()
+    db = SessionLocal()
+    try:
+        users = rebuild(db)
+    finally:
+        db.close()
+    print(f"Rebuilt the user search index for {users} users")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""
+Shared fixtures: the API on an in-memory SQLite database (a temporary file
+with DB_ASYNC=true).
+
+The environment is set before ``main`` is imported, so the engine is built
+for it. The entity cache is off, so every read reaches the database and
+statement counts do not depend on test order.
+"""
+import os
+import tempfile
+from uuid import uuid4
+
+if os.environ.get("DB_ASYNC", "").strip().lower() in ("1", "true", "yes", "on"):
+    # The async engine cannot share an in-memory database with the sync one
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/test.db")
+else:
+    os.environ.setdefault("DATABASE_URL", "sqlite://")
+    os.environ.setdefault("DB_POOL_CLASS", "static")
+os.environ["CACHE_BACKEND"] = "none"
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+pytest_plugins = ["utils.pytest_statement_budget"]
+
+
+@pytest.fixture(scope="session")
+def client():
+    import main
+
+    with TestClient(main.app) as client:
+        yield client
+
+
+@pytest.fixture
+def tag() -> str:
+    """A value unique to the test, to tell its rows apart from other tests'."""
+    return uuid4().hex[:8]
+
+
+def session_body(**fields) -> dict:
+    body = {"session_date": "2025-01-15", "location": "Home", "matcha_type": "Ceremonial Grade", "rating": 4.0}
+    body.update(fields)
+    return body
+
+
+@pytest.fixture
+def make_user(client, tag):
+    """Factory: POST a user with last name ``tag`` (or ``last_name``) and ``sessions`` sessions."""
+    created = 0
+
+    def make(sessions: int = 0, last_name: str = None) -> dict:
+        nonlocal created
+        created += 1
+        name = f"u_{tag}_{created}"
+        response = client.post("/users", json={
+            "username": name,
+            "email": f"{name}@example.com",
+            "first_name": "Test",
+            "last_name": last_name or tag,
+            "matcha_sessions": [session_body(brand=f"Brand {i}") for i in range(sessions)],
+        })
+        assert response.status_code == 201, response.text
+        return response.json()
+
+    return make
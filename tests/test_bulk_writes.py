@@ -0,0 +1,63 @@
+"""
+Multi-row writes insert each table's rows with one statement, whichever
+optional fields the rows leave empty.
+"""
+import json
+
+from tests.conftest import session_body
+
+
+def inserts_into(statements, table: str) -> list:
+    return [s for s in statements if s.lstrip().startswith(f"INSERT INTO {table} ")]
+
+
+def mixed_sessions(count: int) -> list:
+    """Sessions whose set of NULL optional fields changes from one to the next."""
+    return [
+        session_body(
+            brand="Ippodo" if i % 2 else None,
+            rating=None if i % 3 == 0 else 4.0,
+            notes="Grassy" if i % 4 == 1 else None,
+        )
+        for i in range(count)
+    ]
+
+
+def test_batch_inserts_sessions_with_one_statement(client, statement_budget):
+    with statement_budget(10) as statements:
+        response = client.post("/matcha-sessions:batch", json=mixed_sessions(12))
+    assert response.status_code == 200, response.text
+    assert response.json()["created"] == 12
+    assert len(inserts_into(statements, "matcha_sessions")) == 1
+
+
+def test_import_inserts_users_and_sessions_with_one_statement_each(client, statement_budget, tag):
+    lines = [
+        {
+            "username": f"imp_{tag}_{i}",
+            "email": f"imp_{tag}_{i}@example.com",
+            "first_name": "Import",
+            "last_name": tag,
+            "phone": "+1-212-555-0100" if i % 2 else None,
+            "matcha_budget": None if i % 3 else 50.0,
+            "matcha_sessions": mixed_sessions(i % 3),
+        }
+        for i in range(12)
+    ]
+    body = "\n".join(json.dumps(line) for line in lines)
+    with statement_budget(10) as statements:
+        response = client.post("/users:import", content=body)
+    assert response.status_code == 200, response.text
+    assert response.json()["created"] == 12
+    assert len(inserts_into(statements, "users")) == 1
+    assert len(inserts_into(statements, "matcha_sessions")) == 1
+
+
+def test_replacing_sessions_inserts_added_ones_with_one_statement(client, statement_budget, make_user):
+    user = make_user(sessions=2)
+    kept = [{k: v for k, v in s.items() if k != "user_id"} for s in user["matcha_sessions"]]
+    with statement_budget(10) as statements:
+        response = client.put(f"/users/{user['id']}", json={"matcha_sessions": kept + mixed_sessions(12)})
+    assert response.status_code == 200, response.text
+    assert len(response.json()["matcha_sessions"]) == 14
+    assert len(inserts_into(statements, "matcha_sessions")) == 1
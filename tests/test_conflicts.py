@@ -0,0 +1,44 @@
+"""Unique-key violations become 400 responses on every backend's message format."""
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from main import DUPLICATE_SESSION_ID, conflict_detail
+from tests.conftest import session_body
+
+
+def integrity_error(message) -> IntegrityError:
+    return IntegrityError("INSERT ...", {}, Exception(message))
+
+
+@pytest.mark.parametrize("message, detail", [
+    # MySQL 8.0 (pymysql error args)
+    ("(1062, \"Duplicate entry 'a' for key 'users.ix_users_username'\")", "Username already exists"),
+    ("(1062, \"Duplicate entry 'a@b.c' for key 'users.ix_users_email'\")", "Email already exists"),
+    ("(1062, \"Duplicate entry '\\x01' for key 'matcha_sessions.PRIMARY'\")", DUPLICATE_SESSION_ID),
+    # MySQL 5.7: no table name
+    ("(1062, \"Duplicate entry 'a' for key 'ix_users_username'\")", "Username already exists"),
+    ("(1062, \"Duplicate entry 'a@b.c' for key 'ix_users_email'\")", "Email already exists"),
+    ("(1062, \"Duplicate entry '\\x01' for key 'PRIMARY'\")", DUPLICATE_SESSION_ID),
+    # SQLite
+    ("UNIQUE constraint failed: users.username", "Username already exists"),
+    ("UNIQUE constraint failed: users.email", "Email already exists"),
+    ("UNIQUE constraint failed: matcha_sessions.id", DUPLICATE_SESSION_ID),
+    # Not a unique key
+    ("(1452, 'Cannot add or update a child row: a foreign key constraint fails')", None),
+    ("NOT NULL constraint failed: matcha_sessions.location", None),
+])
+def test_conflict_detail(message, detail):
+    assert conflict_detail(integrity_error(message), DUPLICATE_SESSION_ID) == detail
+
+
+def test_primary_key_needs_the_callers_detail():
+    assert conflict_detail(integrity_error("(1062, \"Duplicate entry 'x' for key 'PRIMARY'\")")) is None
+
+
+def test_duplicate_session_id_is_400(client):
+    body = session_body()
+    first = client.post("/matcha-sessions", json=body)
+    assert first.status_code == 201
+    response = client.post("/matcha-sessions", json=dict(body, id=first.json()["id"]))
+    assert response.status_code == 400
+    assert response.json()["detail"] == DUPLICATE_SESSION_ID
@@ -0,0 +1,45 @@
+"""A body loaded before a write's invalidation is not stored in the entity cache."""
+from services.cache import EntityCache, MemoryCacheBackend, user_key
+
+
+def test_set_after_invalidation_during_load_is_dropped():
+    cache = EntityCache(MemoryCacheBackend())
+    key = user_key("a")
+    generation = cache.generation(key)
+    stale = b'"etag-1"\n{"first_name": "Old"}'
+    cache.invalidate(key)  # a write commits while the read is loading
+    cache.set(key, stale, generation)
+    assert cache.get(key) is None
+    assert cache.stats()["stale_sets"] == 1
+
+
+def test_set_without_intervening_invalidation_is_stored():
+    cache = EntityCache(MemoryCacheBackend())
+    key = user_key("a")
+    cache.invalidate(user_key("b"))
+    generation = cache.generation(key)
+    cache.set(key, b"body", generation)
+    assert cache.get(key) == b"body"
+
+
+def test_read_racing_a_write_leaves_the_cache_empty(client, make_user, monkeypatch):
+    import main
+    from services.cache import entity_cache
+
+    monkeypatch.setattr(entity_cache, "backend", MemoryCacheBackend())
+    user = make_user()
+    key = user_key(user["id"])
+    original = main.dump_json
+
+    def dump_then_invalidate(*args, **kwargs):
+        # A write commits and invalidates after the body was loaded, before it is cached
+        body = original(*args, **kwargs)
+        entity_cache.invalidate(key)
+        return body
+
+    monkeypatch.setattr(main, "dump_json", dump_then_invalidate)
+    assert client.get(f"/users/{user['id']}").status_code == 200
+    assert entity_cache.get(key) is None
+    monkeypatch.setattr(main, "dump_json", original)
+    assert client.get(f"/users/{user['id']}").status_code == 200
+    assert entity_cache.get(key) is not None
@@ -0,0 +1,23 @@
+"""List filters reject malformed dates with 422 instead of failing."""
+import pytest
+
+
+@pytest.mark.parametrize("path, param", [
+    ("/matcha-sessions", "session_date"),
+    ("/matcha-sessions", "session_date_from"),
+    ("/users", "join_date"),
+])
+def test_bad_date_is_422(client, path, param):
+    response = client.get(path, params={param: "nope"})
+    assert response.status_code == 422, response.text
+
+
+def test_session_date_filters(client, make_user, tag):
+    make_user(sessions=1)
+    response = client.get("/matcha-sessions", params={"session_date": "2025-01-15", "brand": "Brand 0"})
+    assert response.status_code == 200
+    assert response.json()["items"]
+
+    response = client.get("/users", params={"join_date": "1999-01-01", "last_name": tag})
+    assert response.status_code == 200
+    assert response.json()["items"] == []
@@ -0,0 +1,28 @@
+"""Startup leaves missing indexes to the explicit index migration."""
+from utils import migrate_indexes
+from utils.database import engine, init_db, missing_indexes
+
+
+def test_init_db_reports_and_migration_creates_missing_index(client, caplog):
+    with engine.begin() as connection:
+        connection.exec_driver_sql("DROP INDEX ix_matcha_sessions_user_date")
+
+    init_db()
+    assert "ix_matcha_sessions_user_date" in caplog.text
+    with engine.connect() as connection:
+        assert [index.name for index in missing_indexes(connection)] == ["ix_matcha_sessions_user_date"]
+
+    assert migrate_indexes.migrate() == (["ix_matcha_sessions_user_date"], [])
+    with engine.connect() as connection:
+        assert missing_indexes(connection) == []
+
+
+def test_migration_drops_retired_index(client):
+    with engine.begin() as connection:
+        connection.exec_driver_sql("CREATE INDEX ix_matcha_sessions_user_id ON matcha_sessions (user_id)")
+
+    assert migrate_indexes.migrate(dry_run=True) == ([], ["ix_matcha_sessions_user_id"])
+    assert migrate_indexes.migrate() == ([], ["ix_matcha_sessions_user_id"])
+    with engine.connect() as connection:
+        assert migrate_indexes.retired_indexes(connection) == []
+    assert migrate_indexes.migrate() == ([], [])
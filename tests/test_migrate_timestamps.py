@@ -0,0 +1,28 @@
+"""The timestamp migration widens MySQL columns to their declared precision."""
+import pytest
+from sqlalchemy.dialects import mysql
+
+from models.db_models import MatchaSessionDB
+from utils import database, migrate_timestamps
+
+
+def test_modify_statement_keeps_nullability():
+    table = MatchaSessionDB.__table__
+    statement = migrate_timestamps.modify_statement(
+        table.name, [table.c.created_at, table.c.updated_at], mysql.dialect(),
+    )
+    assert statement == (
+        "ALTER TABLE matcha_sessions MODIFY created_at DATETIME(6) NOT NULL, "
+        "MODIFY updated_at DATETIME(6) NOT NULL, ALGORITHM=COPY, LOCK=SHARED"
+    )
+
+
+def test_nothing_to_widen_outside_mysql(client):
+    assert migrate_timestamps.migrate() == []
+
+
+def test_init_db_refuses_narrow_timestamps(client, monkeypatch):
+    narrow = [MatchaSessionDB.__table__.c.updated_at]
+    monkeypatch.setattr(database, "low_precision_timestamps", lambda connection: narrow)
+    with pytest.raises(database.SchemaOutdatedError, match="matcha_sessions.updated_at"):
+        database.init_db()
@@ -0,0 +1,42 @@
+"""
+User reads load sessions in batches: the number of SQL statements does not
+grow with the number of users or sessions returned.
+"""
+
+# Statements per read: the users, then one batch of their sessions
+READ_BUDGET = 2
+
+
+def count_reads(client, statement_budget, url: str, params=None) -> int:
+    with statement_budget(READ_BUDGET) as statements:
+        response = client.get(url, params=params)
+    assert response.status_code == 200, response.text
+    return len(statements)
+
+
+def test_list_users_statements_do_not_grow_with_users(client, statement_budget, make_user, tag):
+    make_user(sessions=1, last_name=f"{tag}a")
+    for _ in range(10):
+        make_user(sessions=3, last_name=f"{tag}b")
+
+    one = count_reads(client, statement_budget, "/users", {"last_name": f"{tag}a"})
+    many = count_reads(client, statement_budget, "/users", {"last_name": f"{tag}b"})
+    assert one == many
+
+
+def test_list_users_statements_do_not_grow_with_limit(client, statement_budget, make_user, tag):
+    for _ in range(12):
+        make_user(sessions=2)
+
+    small = count_reads(client, statement_budget, "/users", {"last_name": tag, "limit": 1})
+    large = count_reads(client, statement_budget, "/users", {"last_name": tag, "limit": 12})
+    assert small == large
+
+
+def test_get_user_statements_do_not_grow_with_sessions(client, statement_budget, make_user):
+    few = make_user(sessions=1)
+    many = make_user(sessions=25)
+
+    assert count_reads(client, statement_budget, f"/users/{few['id']}") == count_reads(
+        client, statement_budget, f"/users/{many['id']}"
+    )
@@ -0,0 +1,51 @@
+"""Stats endpoints read the rollups kept by the session write paths."""
+from uuid import UUID
+
+from tests.conftest import session_body
+
+
+def test_user_stats_follow_session_writes(client, make_user):
+    user = make_user(sessions=2)
+    stats = client.get(f"/users/{user['id']}/stats").json()
+    assert stats["total_sessions"] == 2
+
+    session_id = user["matcha_sessions"][0]["id"]
+    assert client.delete(f"/matcha-sessions/{session_id}").status_code == 204
+    assert client.get(f"/users/{user['id']}/stats").json()["total_sessions"] == 1
+
+
+def test_global_stats_count_every_session(client, make_user):
+    before = client.get("/stats").json()["total_sessions"]
+    make_user(sessions=3)
+    assert client.post("/matcha-sessions", json=session_body()).status_code == 201
+    assert client.get("/stats").json()["total_sessions"] == before + 4
+
+
+def test_global_scope_is_not_a_user(client, make_user):
+    make_user(sessions=1)
+    assert client.get(f"/users/{UUID(int=0)}/stats").status_code == 404
+
+
+def test_global_shards_sum_to_a_rebuild(client, make_user, monkeypatch):
+    from itertools import count
+
+    from services import stats
+    from utils.database import SessionLocal
+
+    shards = count()
+    monkeypatch.setattr(stats.random, "randrange", lambda n: next(shards) % n)
+    for _ in range(4):
+        user = make_user(sessions=2)
+        assert client.put(f"/matcha-sessions/{user['matcha_sessions'][0]['id']}", json={"rating": 1.0}).status_code == 200
+    assert client.delete(f"/users/{user['id']}").status_code == 204
+    incremental = client.get("/stats", params={"top_brands": 50}).json()
+
+    db = SessionLocal()
+    try:
+        assert db.query(stats.SessionRollupDB.scope_id).filter(
+            stats.SessionRollupDB.scope_kind == stats.GLOBAL_KIND
+        ).distinct().count() > 1
+        stats.rebuild(db)
+    finally:
+        db.close()
+    assert client.get("/stats", params={"top_brands": 50}).json() == incremental
@@ -0,0 +1,54 @@
+"""PUT ?upsert=true retries a deadlock once and nothing else."""
+import sqlite3
+from uuid import uuid4
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+import main
+from tests.conftest import session_body
+
+
+def operational_error(*args) -> OperationalError:
+    return OperationalError("INSERT ...", {}, Exception(*args))
+
+
+@pytest.mark.parametrize("error, deadlock", [
+    (operational_error(1213, "Deadlock found when trying to get lock; try restarting transaction"), True),
+    (operational_error(1205, "Lock wait timeout exceeded; try restarting transaction"), False),
+    (operational_error(2013, "Lost connection to MySQL server during query"), False),
+    (OperationalError("INSERT ...", {}, sqlite3.OperationalError("database is locked")), True),
+    (OperationalError("INSERT ...", {}, sqlite3.OperationalError("disk I/O error")), False),
+])
+def test_is_deadlock(error, deadlock):
+    assert main.is_deadlock(error) is deadlock
+
+
+def failing_touch(errors):
+    def touch_user(db, user_id):
+        if errors:
+            raise errors.pop(0)
+    return touch_user
+
+
+def upsert(client):
+    return client.put(f"/matcha-sessions/{uuid4()}", params={"upsert": "true"}, json=session_body())
+
+
+def test_deadlock_is_retried(client, monkeypatch):
+    monkeypatch.setattr(main, "touch_user", failing_touch([operational_error(1213, "Deadlock found")]))
+    assert upsert(client).status_code == 201
+
+
+def test_second_deadlock_is_409(client, monkeypatch):
+    errors = [operational_error(1213, "Deadlock found") for _ in range(2)]
+    monkeypatch.setattr(main, "touch_user", failing_touch(errors))
+    assert upsert(client).status_code == 409
+
+
+def test_other_errors_are_not_retried(client, monkeypatch):
+    errors = [operational_error(2013, "Lost connection"), operational_error(2013, "Lost connection")]
+    monkeypatch.setattr(main, "touch_user", failing_touch(errors))
+    with pytest.raises(OperationalError):
+        upsert(client)
+    assert len(errors) == 1
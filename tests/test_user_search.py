@@ -0,0 +1,31 @@
+"""Typeahead candidates come from the query's rarest trigrams."""
+from services import user_search
+
+
+def test_rare_trigrams_find_the_match_among_common_ones(client, tag, monkeypatch):
+    # Far more users share the first name than the candidate scan may read
+    monkeypatch.setattr(user_search, "FREQUENCY_CAP", 5)
+    monkeypatch.setattr(user_search, "CANDIDATE_SCAN", 5)
+    for i in range(20):
+        body = {"username": f"c_{tag}_{i}", "email": f"c_{tag}_{i}@example.com", "first_name": "Marguerite",
+                "last_name": f"Common{i}"}
+        assert client.post("/users", json=body).status_code == 201
+    body = {"username": f"r_{tag}", "email": f"r_{tag}@example.com", "first_name": "Marguerite",
+            "last_name": "Qwyxz"}
+    assert client.post("/users", json=body).status_code == 201
+
+    hits = client.get("/users/search", params={"q": "Marguerite Qwy"}).json()
+    assert hits[0]["username"] == f"r_{tag}"
+    assert hits[0]["score"] > 1
+
+
+def test_query_of_common_trigrams_still_returns_prefix_matches(client, tag, monkeypatch):
+    monkeypatch.setattr(user_search, "CANDIDATE_SCAN", 3)
+    for i in range(6):
+        body = {"username": f"p_{tag}_{i}", "email": f"p_{tag}_{i}@example.com", "first_name": "Bartholomew",
+                "last_name": "Test"}
+        assert client.post("/users", json=body).status_code == 201
+
+    hits = client.get("/users/search", params={"q": "Barth", "limit": 10}).json()
+    assert 1 <= len(hits) <= 3
+    assert all(hit["first_name"] == "Bartholomew" for hit in hits)
@@ -0,0 +1,58 @@
+"""
+The single-entity write endpoints stay within their SQL statement budgets
+(BEGIN/COMMIT excluded), so an existence SELECT or a post-commit refresh
+cannot creep back in unnoticed. The budgets, and what each one is made of,
+are listed in benchmarks/write_statements.py.
+"""
+from uuid import uuid4
+
+from benchmarks.write_statements import BUDGETS
+from tests.conftest import session_body
+
+
+def test_create_session(client, statement_budget):
+    with statement_budget(BUDGETS["POST /matcha-sessions"]):
+        assert client.post("/matcha-sessions", json=session_body()).status_code == 201
+
+
+def test_create_user_with_sessions(client, statement_budget, make_user):
+    with statement_budget(BUDGETS["POST /users (with sessions)"]):
+        make_user(sessions=2)
+
+
+def test_update_session(client, statement_budget, make_user):
+    session = make_user(sessions=1)["matcha_sessions"][0]
+    with statement_budget(BUDGETS["PUT /matcha-sessions/{id}"]):
+        assert client.put(f"/matcha-sessions/{session['id']}", json={"rating": 5.0}).status_code == 200
+
+
+def test_upsert_new_session(client, statement_budget):
+    with statement_budget(BUDGETS["PUT /matcha-sessions/{id}?upsert=true"]):
+        response = client.put(f"/matcha-sessions/{uuid4()}", params={"upsert": "true"}, json=session_body())
+    assert response.status_code == 201
+
+
+def test_update_user(client, statement_budget, make_user):
+    user = make_user(sessions=2)
+    with statement_budget(BUDGETS["PUT /users/{id}"]):
+        assert client.put(f"/users/{user['id']}", json={"first_name": "Budgeted"}).status_code == 200
+
+
+def test_replace_user_sessions(client, statement_budget, make_user):
+    user = make_user(sessions=2)
+    kept, changed = [{k: v for k, v in s.items() if k != "user_id"} for s in user["matcha_sessions"]]
+    sessions = [kept, {**changed, "rating": 2.0}, session_body(location="Cafe")]
+    with statement_budget(BUDGETS["PUT /users/{id} (matcha_sessions)"]):
+        assert client.put(f"/users/{user['id']}", json={"matcha_sessions": sessions}).status_code == 200
+
+
+def test_delete_session(client, statement_budget, make_user):
+    session = make_user(sessions=1)["matcha_sessions"][0]
+    with statement_budget(BUDGETS["DELETE /matcha-sessions/{id}"]):
+        assert client.delete(f"/matcha-sessions/{session['id']}").status_code == 204
+
+
+def test_delete_user(client, statement_budget, make_user):
+    user = make_user(sessions=2)
+    with statement_budget(BUDGETS["DELETE /users/{id}"]):
+        assert client.delete(f"/users/{user['id']}").status_code == 204
@@ -0,0 +1,83 @@
+"""
+Serve sync SQLAlchemy route handlers from the async engine.
+
+The CRUD handlers in main.py are written once against a blocking ``Session``.
+When DB_ASYNC is enabled, :func:`asyncify_router` re-registers each of them
+as an ``async def`` endpoint that receives an ``AsyncSession`` and runs the
+original handler through ``AsyncSession.run_sync``. The handler's queries then
+go through the asyncio driver on the event loop instead of occupying one of
+Starlette's threadpool workers for the whole request.
+"""
+import functools
+import inspect
+import typing
+
+from fastapi import APIRouter, Depends
+from fastapi import params
+from fastapi.routing import APIRoute
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from utils.database import get_async_db, get_db
+
+
+def _db_parameter(signature: inspect.Signature):
+    for param in signature.parameters.values():
+        if isinstance(param.default, params.Depends) and param.default.dependency is get_db:
+            return param.name
+    return None
+
+
+def asyncify_endpoint(endpoint):
+    """
+    Wrap a sync handler that depends on ``get_db`` in an async handler.
+
+    Returns ``endpoint`` unchanged when it does not use the database.
+    """
+    signature = inspect.signature(endpoint)
+    db_name = _db_parameter(signature)
+    if db_name is None:
+        return endpoint
+
+    # Resolve string annotations (main.py uses postponed evaluation) against the
+    # handler's own module, since FastAPI would look them up in this one.
+    hints = typing.get_type_hints(endpoint, include_extras=True)
+    parameters = []
+    for param in signature.parameters.values():
+        if param.name == db_name:
+            param = param.replace(annotation=AsyncSession, default=Depends(get_async_db))
+        else:
+            param = param.replace(annotation=hints.get(param.name, param.annotation))
+        parameters.append(param)
+
+    @functools.wraps(endpoint)
+    async def wrapper(**kwargs):
+        db = kwargs.pop(db_name)
+        return await db.run_sync(lambda session: endpoint(**kwargs, **{db_name: session}))
+
+    wrapper.__signature__ = signature.replace(parameters=parameters, return_annotation=inspect.Signature.empty)
+    return wrapper
+
+
+def asyncify_router(router: APIRouter) -> APIRouter:
+    """Copy ``router`` with every database-backed endpoint served by the async engine."""
+    async_router = APIRouter()
+    for route in router.routes:
+        if not isinstance(route, APIRoute):
+            async_router.routes.append(route)
+            continue
+        async_router.add_api_route(
+            route.path,
+            asyncify_endpoint(route.endpoint),
+            response_model=route.response_model,
+            status_code=route.status_code,
+            tags=route.tags,
+            dependencies=route.dependencies,
+            summary=route.summary,
+            description=route.description,
+            responses=route.responses,
+            methods=route.methods,
+            name=route.name,
+            response_class=route.response_class,
+            include_in_schema=route.include_in_schema,
+        )
+    return async_router
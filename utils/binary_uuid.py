@@ -0,0 +1,51 @@
+"""
+UUID column type stored as 16 raw bytes.
+
+IDs used to be ``CHAR(36)`` strings: at least 36 bytes in every primary key,
+in every secondary index (which InnoDB suffixes with the primary key) and in
+every foreign key. :class:`BinaryUUID` keeps the same values in ``BINARY(16)`` on
+MySQL and as a 16-byte ``BLOB`` on SQLite. Both compare bytes with memcmp,
+which orders UUIDs the same way Python does.
+
+Parameters may be :class:`uuid.UUID` objects or any string ``UUID()``
+accepts; results are always :class:`uuid.UUID`, so responses serialize them
+without parsing a string per row.
+"""
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy.types import BINARY, LargeBinary, TypeDecorator
+
+
+def as_uuid(value) -> Optional[UUID]:
+    """``value`` as a UUID (None stays None); accepts UUIDs and their string forms."""
+    if value is None or isinstance(value, UUID):
+        return value
+    return UUID(str(value))
+
+
+class BinaryUUID(TypeDecorator):
+    """A UUID stored as ``BINARY(16)`` (MySQL) or a 16-byte ``BLOB`` (SQLite)."""
+
+    impl = BINARY(16)
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "sqlite":
+            # SQLite has no fixed-size binary type; BINARY(16) would get NUMERIC affinity
+            return dialect.type_descriptor(LargeBinary())
+        return dialect.type_descriptor(BINARY(16))
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return as_uuid(value).bytes
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return UUID(bytes=bytes(value))
+
+    @property
+    def python_type(self):
+        return UUID
@@ -2,11 +2,22 @@
 Database configuration and connection setup for CloudSQL.
 Supports both Cloud Run (Unix socket) and local development.
 """
+import logging
 import os
-from sqlalchemy import create_engine
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy import exc as sa_exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import NullPool
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool, StaticPool
+from starlette.concurrency import run_in_threadpool
 
 Base = declarative_base()
 
@@ -23,10 +34,16 @@ def get_database_url() -> str:
     - DB_NAME: Database name (default: matcha_db)
     - CLOUD_SQL_CONNECTION_NAME: CloudSQL connection name (e.g., project:region:instance)
     - DB_SOCKET_DIR: Unix socket directory (default: /cloudsql)
+    - DATABASE_URL: Full SQLAlchemy URL; overrides everything above
+      (e.g. sqlite:///./matcha.db for local runs without MySQL)
     
     For Cloud Run with CloudSQL, use Unix socket connection.
     For local development, use TCP connection.
     """
+    database_url = os.environ.get("DATABASE_URL")
+    if database_url:
+        return database_url
+
     # CloudSQL connection via Unix socket (Cloud Run)
     cloud_sql_connection_name = os.environ.get("CLOUD_SQL_CONNECTION_NAME")
     db_socket_dir = os.environ.get("DB_SOCKET_DIR", "/cloudsql")
@@ -58,17 +75,246 @@ def get_database_url() -> str:
         )
 
 
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return default if value in (None, "") else int(value)
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Counters behind GET /health/pool; updated from pool events on every worker thread
+_pool_counters = {
+    "connects": 0,
+    "checkouts": 0,
+    "timeouts": 0,
+    "checkout_wait_seconds_total": 0.0,
+    "checkout_wait_seconds_max": 0.0,
+}
+_pool_counters_lock = threading.Lock()
+
+
+class _CheckoutTimingMixin:
+    """Records how long callers wait to get a connection from a queue pool."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except sa_exc.TimeoutError:
+            with _pool_counters_lock:
+                _pool_counters["timeouts"] += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            with _pool_counters_lock:
+                _pool_counters["checkout_wait_seconds_total"] += waited
+                if waited > _pool_counters["checkout_wait_seconds_max"]:
+                    _pool_counters["checkout_wait_seconds_max"] = waited
+
+
+class InstrumentedQueuePool(_CheckoutTimingMixin, QueuePool):
+    """QueuePool with checkout wait statistics."""
+
+
+class InstrumentedAsyncQueuePool(_CheckoutTimingMixin, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool with checkout wait statistics, for the async engine."""
+
+
+def get_pool_options(use_async: bool = False) -> dict:
+    """
+    Build engine pool keyword arguments from the environment.
+
+    Environment variables:
+    - DB_POOL_CLASS: queue (default), null (new connection per checkout) or
+      static (single shared connection, for in-memory SQLite)
+    - DB_POOL_SIZE: Connections kept open per worker process (default: 5)
+    - DB_MAX_OVERFLOW: Extra connections allowed under bursts (default: 10)
+    - DB_POOL_TIMEOUT: Seconds to wait for a free connection (default: 30)
+    - DB_POOL_RECYCLE: Seconds before a connection is replaced; keep it below
+      MySQL's wait_timeout (default: 1800)
+    - DB_POOL_PRE_PING: Ping connections on checkout (default: false; the
+      recycle interval already retires idle connections before MySQL drops them)
+    """
+    pool_class = os.environ.get("DB_POOL_CLASS", "queue").strip().lower()
+    if pool_class == "null":
+        options = {"poolclass": NullPool}
+    elif pool_class == "static":
+        options = {"poolclass": StaticPool}
+    elif pool_class == "queue":
+        options = {
+            "poolclass": InstrumentedAsyncQueuePool if use_async else InstrumentedQueuePool,
+            "pool_size": _env_int("DB_POOL_SIZE", 5),
+            "max_overflow": _env_int("DB_MAX_OVERFLOW", 10),
+            "pool_timeout": _env_int("DB_POOL_TIMEOUT", 30),
+            "pool_recycle": _env_int("DB_POOL_RECYCLE", 1800),
+        }
+    else:
+        raise ValueError(f"Unsupported DB_POOL_CLASS: {pool_class}")
+    options["pool_pre_ping"] = _env_bool("DB_POOL_PRE_PING", False)
+    return options
+
+
+# Async drivers used when DB_ASYNC is enabled
+_ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+
+def get_async_database_url(url: str):
+    """Swap the blocking driver in ``url`` for its asyncio counterpart."""
+    parsed = make_url(url)
+    return parsed.set(drivername=_ASYNC_DRIVERS.get(parsed.drivername, parsed.drivername))
+
+
 # Create engine with appropriate pool settings
 database_url = get_database_url()
 engine = create_engine(
     database_url,
-    poolclass=NullPool,  # Cloud Run doesn't need connection pooling
-    pool_pre_ping=True,  # Verify connections before using
+    connect_args={"check_same_thread": False} if database_url.startswith("sqlite") else {},
     echo=False,  # Set to True for SQL query logging
+    **get_pool_options(),
+)
+
+# DB_ASYNC=true serves the CRUD endpoints from an asyncio engine (aiomysql,
+# or aiosqlite locally) so a worker is not capped by the threadpool size.
+# The async driver is only imported when the engine first connects.
+ASYNC_DB_ENABLED = _env_bool("DB_ASYNC", False)
+async_engine = (
+    create_async_engine(get_async_database_url(database_url), echo=False, **get_pool_options(use_async=True))
+    if ASYNC_DB_ENABLED
+    else None
 )
 
+
+def _count_connect(dbapi_connection, connection_record):
+    with _pool_counters_lock:
+        _pool_counters["connects"] += 1
+
+
+def _count_checkout(dbapi_connection, connection_record, connection_proxy):
+    with _pool_counters_lock:
+        _pool_counters["checkouts"] += 1
+
+
+# Pool statistics follow whichever engine serves requests
+_serving_engine = async_engine.sync_engine if async_engine is not None else engine
+event.listen(_serving_engine, "connect", _count_connect)
+event.listen(_serving_engine, "checkout", _count_checkout)
+
+
+class QueryStats:
+    """Statements executed and time spent in the database, for one request."""
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+# Set per request by the query stats middleware. run_in_threadpool and
+# AsyncSession.run_sync both carry the context into the code that executes
+# statements, so each statement is attributed to the request that ran it.
+_current_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("current_query_stats", default=None)
+
+# Statements at least this slow are logged; 0 disables the slow query log
+SLOW_QUERY_SECONDS = _env_int("DB_SLOW_QUERY_MS", 500) / 1000
+slow_query_log = logging.getLogger("matcha.sql.slow")
+
+
+@contextmanager
+def track_queries():
+    """Count the statements executed in this context (and threads it spawns) in a :class:`QueryStats`."""
+    stats = QueryStats()
+    token = _current_query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_query_stats.reset(token)
+
+
+def redact_parameters(parameters, executemany: bool) -> str:
+    """Describe bound parameters by type only, so logged statements carry no user data."""
+    if executemany:
+        return f"<{len(parameters)} parameter sets>"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{k}: {type(v).__name__}" for k, v in parameters.items()) + "}"
+    return "(" + ", ".join(type(v).__name__ for v in parameters or ()) + ")"
+
+
+def _start_statement_timer(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._query_started
+    stats = _current_query_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += elapsed
+    if SLOW_QUERY_SECONDS and elapsed >= SLOW_QUERY_SECONDS:
+        slow_query_log.warning(
+            "slow query (%.1f ms): %s params=%s",
+            elapsed * 1000, " ".join(statement.split()), redact_parameters(parameters, executemany),
+        )
+
+
+# Exports run on the blocking engine even with DB_ASYNC on
+_instrumented_engines = (engine,) if async_engine is None else (engine, async_engine.sync_engine)
+for _engine in _instrumented_engines:
+    event.listen(_engine, "before_cursor_execute", _start_statement_timer)
+    event.listen(_engine, "after_cursor_execute", _record_statement)
+
+
+@contextmanager
+def record_statements():
+    """Collect the text of every statement executed inside the block, from any thread."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    for _engine in _instrumented_engines:
+        event.listen(_engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        for _engine in _instrumented_engines:
+            event.remove(_engine, "before_cursor_execute", record)
+
+
+def get_pool_stats() -> dict:
+    """Snapshot of pool occupancy and checkout counters for this worker process."""
+    pool = _serving_engine.pool
+    stats = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+        )
+    with _pool_counters_lock:
+        stats.update(_pool_counters)
+    return stats
+
+
 # Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Sessions live for one request, so objects are not expired on commit: write
+# endpoints answer from the values they just wrote instead of reloading them.
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+AsyncSessionLocal = (
+    async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    if async_engine is not None
+    else None
+)
 
 
 def get_db():
@@ -80,7 +326,116 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    """Dependency for FastAPI to get an async database session (DB_ASYNC mode)."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def _run_in_session(fn, *args):
+    db = SessionLocal()
+    try:
+        return fn(db, *args)
+    finally:
+        db.close()
+
+
+async def run_db(fn, *args):
+    """
+    Run ``fn(session, *args)`` in a fresh session from an async endpoint.
+
+    Uses the async engine when DB_ASYNC is enabled and a threadpool worker with
+    a blocking session otherwise, so ``fn`` is written once as sync code.
+    """
+    if ASYNC_DB_ENABLED:
+        async with AsyncSessionLocal() as db:
+            return await db.run_sync(fn, *args)
+    return await run_in_threadpool(_run_in_session, fn, *args)
+
+
+schema_log = logging.getLogger("matcha.schema")
+
+
+def missing_indexes(connection) -> list:
+    """Model indexes absent from existing tables on ``connection``'s database, in table order."""
+    inspector = inspect(connection)
+    dialect = connection.dialect.name
+    missing = []
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        present = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            # ddl_if(dialect=...) limits an index to one backend, e.g. MySQL's FULLTEXT
+            only_on = index._ddl_if.dialect if index._ddl_if is not None else None
+            if index.name not in present and only_on in (None, dialect):
+                missing.append(index)
+    return missing
+
+
+def low_precision_timestamps(connection) -> list:
+    """
+    Columns declared ``DATETIME(6)`` that ``connection``'s MySQL database
+    stores with fewer fractional digits (tables created before the models
+    declared microsecond timestamps), in table order. Always empty elsewhere.
+    """
+    if connection.dialect.name != "mysql":
+        return []
+    rows = connection.execute(text(
+        "SELECT TABLE_NAME, COLUMN_NAME FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND DATA_TYPE = 'datetime' AND DATETIME_PRECISION < 6"
+    ))
+    stored = {(row[0], row[1]) for row in rows}
+    return [
+        column
+        for table in Base.metadata.sorted_tables
+        for column in table.columns
+        if (table.name, column.name) in stored and column.type.compile(dialect=connection.dialect) == "DATETIME(6)"
+    ]
+
+
+class SchemaOutdatedError(RuntimeError):
+    """The database lacks a column change the API relies on; a migration has to run first."""
+
+
+def _create_schema(connection):
+    Base.metadata.create_all(bind=connection)
+    # ETags hash the updated_at the API wrote, without reading it back. A
+    # whole-second column would store a different value, so the ETag a write
+    # returns would never match the next read's and every If-Match would fail.
+    narrow = low_precision_timestamps(connection)
+    if narrow:
+        raise SchemaOutdatedError(
+            "Timestamp columns lack microsecond precision, widen them with "
+            "`python -m utils.migrate_timestamps`: "
+            + ", ".join(f"{column.table.name}.{column.name}" for column in narrow)
+        )
+    # create_all skips tables that already exist, and building an index on a
+    # large production table must not happen as a side effect of starting a
+    # worker: indexes added to the models later are left to utils.migrate_indexes.
+    missing = missing_indexes(connection)
+    if missing:
+        schema_log.warning(
+            "Indexes missing, create them with `python -m utils.migrate_indexes`: %s",
+            ", ".join(index.name for index in missing),
+        )
+
+
 def init_db():
-    """Initialize database tables."""
-    Base.metadata.create_all(bind=engine)
+    """
+    Create missing tables, with their indexes.
+
+    Indexes the models gained since a table was created are only reported;
+    ``python -m utils.migrate_indexes`` builds them. Raises
+    :class:`SchemaOutdatedError` while MySQL timestamp columns are narrower
+    than declared (``python -m utils.migrate_timestamps``).
+    """
+    with engine.begin() as connection:
+        _create_schema(connection)
+
+
+async def init_db_async():
+    """Async counterpart of :func:`init_db`, run through the async engine."""
+    async with async_engine.begin() as connection:
+        await connection.run_sync(_create_schema)
 
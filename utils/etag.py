@@ -0,0 +1,47 @@
+"""
+Entity tags for conditional requests.
+
+A user or session ETag is derived from its id and ``updated_at``; a list ETag
+from the (id, updated_at) pairs on the page plus the next cursor. Computing
+either only needs those columns, so ``If-None-Match`` can be answered before
+anything is serialized.
+"""
+import hashlib
+from typing import Iterable, Optional
+
+
+def make_etag(*parts) -> str:
+    """Build a strong ETag from ``parts``."""
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def entity_etag(entity_id, updated_at) -> str:
+    """ETag of a single user or matcha session."""
+    return make_etag(entity_id, updated_at.isoformat())
+
+
+def page_etag(rows: Iterable, next_cursor: Optional[str]) -> str:
+    """ETag of a page of rows carrying ``id`` and ``updated_at``."""
+    return make_etag(*(f"{r.id}@{r.updated_at.isoformat()}" for r in rows), next_cursor)
+
+
+def _parse(header: str):
+    return [tag.strip() for tag in header.split(",") if tag.strip()]
+
+
+def none_match(if_none_match: Optional[str], etag: str) -> bool:
+    """True when an If-None-Match header matches ``etag`` (weak comparison)."""
+    if not if_none_match:
+        return False
+    for tag in _parse(if_none_match):
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def match_fails(if_match: Optional[str], etag: str) -> bool:
+    """True when an If-Match header is present and does not match ``etag`` (strong comparison)."""
+    if not if_match:
+        return False
+    return not any(tag == "*" or tag == etag for tag in _parse(if_match))
@@ -0,0 +1,107 @@
+"""
+Query-parameter filters shared by the list and export endpoints.
+
+Used as FastAPI class dependencies (``filters: UserFilters = Depends()``).
+This module deliberately does not use postponed annotations, since FastAPI
+resolves a class dependency's parameter types without access to its module.
+"""
+from datetime import date
+from typing import Optional
+
+from fastapi import Query
+
+from models.db_models import MatchaSessionDB, UserDB
+
+
+class MatchaSessionFilters:
+    """Query-parameter filters for matcha session listings."""
+
+    def __init__(
+        self,
+        session_date: Optional[date] = Query(None, description="Filter by session date (YYYY-MM-DD)"),
+        session_date_from: Optional[date] = Query(None, description="Sessions on or after this date (YYYY-MM-DD)"),
+        session_date_to: Optional[date] = Query(None, description="Sessions on or before this date (YYYY-MM-DD)"),
+        location: Optional[str] = Query(None, description="Filter by location"),
+        matcha_type: Optional[str] = Query(None, description="Filter by matcha type"),
+        brand: Optional[str] = Query(None, description="Filter by brand"),
+        min_rating: Optional[float] = Query(None, description="Filter by minimum rating (0.0-5.0)"),
+        max_rating: Optional[float] = Query(None, description="Filter by maximum rating (0.0-5.0)"),
+    ):
+        self.session_date = session_date
+        self.session_date_from = session_date_from
+        self.session_date_to = session_date_to
+        self.location = location
+        self.matcha_type = matcha_type
+        self.brand = brand
+        self.min_rating = min_rating
+        self.max_rating = max_rating
+
+    def apply(self, query):
+        if self.session_date is not None:
+            query = query.filter(MatchaSessionDB.session_date == self.session_date)
+        if self.session_date_from is not None:
+            query = query.filter(MatchaSessionDB.session_date >= self.session_date_from)
+        if self.session_date_to is not None:
+            query = query.filter(MatchaSessionDB.session_date <= self.session_date_to)
+        if self.location is not None:
+            query = query.filter(MatchaSessionDB.location == self.location)
+        if self.matcha_type is not None:
+            query = query.filter(MatchaSessionDB.matcha_type == self.matcha_type)
+        if self.brand is not None:
+            query = query.filter(MatchaSessionDB.brand == self.brand)
+        if self.min_rating is not None:
+            query = query.filter(MatchaSessionDB.rating >= self.min_rating)
+        if self.max_rating is not None:
+            query = query.filter(MatchaSessionDB.rating <= self.max_rating)
+        return query
+
+
+class UserFilters:
+    """Query-parameter filters for user listings."""
+
+    def __init__(
+        self,
+        username: Optional[str] = Query(None, description="Filter by username"),
+        first_name: Optional[str] = Query(None, description="Filter by first name"),
+        last_name: Optional[str] = Query(None, description="Filter by last name"),
+        email: Optional[str] = Query(None, description="Filter by email"),
+        phone: Optional[str] = Query(None, description="Filter by phone number"),
+        favorite_matcha_powder: Optional[str] = Query(None, description="Filter by favorite matcha powder"),
+        favorite_matcha_place: Optional[str] = Query(None, description="Filter by favorite matcha place"),
+        min_budget: Optional[float] = Query(None, description="Filter by minimum matcha budget"),
+        max_budget: Optional[float] = Query(None, description="Filter by maximum matcha budget"),
+        join_date: Optional[date] = Query(None, description="Filter by join date (YYYY-MM-DD)"),
+    ):
+        self.username = username
+        self.first_name = first_name
+        self.last_name = last_name
+        self.email = email
+        self.phone = phone
+        self.favorite_matcha_powder = favorite_matcha_powder
+        self.favorite_matcha_place = favorite_matcha_place
+        self.min_budget = min_budget
+        self.max_budget = max_budget
+        self.join_date = join_date
+
+    def apply(self, query):
+        if self.username is not None:
+            query = query.filter(UserDB.username == self.username)
+        if self.first_name is not None:
+            query = query.filter(UserDB.first_name == self.first_name)
+        if self.last_name is not None:
+            query = query.filter(UserDB.last_name == self.last_name)
+        if self.email is not None:
+            query = query.filter(UserDB.email == self.email)
+        if self.phone is not None:
+            query = query.filter(UserDB.phone == self.phone)
+        if self.favorite_matcha_powder is not None:
+            query = query.filter(UserDB.favorite_matcha_powder == self.favorite_matcha_powder)
+        if self.favorite_matcha_place is not None:
+            query = query.filter(UserDB.favorite_matcha_place == self.favorite_matcha_place)
+        if self.min_budget is not None:
+            query = query.filter(UserDB.matcha_budget >= self.min_budget)
+        if self.max_budget is not None:
+            query = query.filter(UserDB.matcha_budget <= self.max_budget)
+        if self.join_date is not None:
+            query = query.filter(UserDB.join_date == self.join_date)
+        return query
@@ -0,0 +1,154 @@
+"""
+One-off migration of stored IDs from ``CHAR(36)`` strings to 16-byte binary.
+
+Run it once, with the API stopped, before starting a version that declares
+the ID columns as :class:`utils.binary_uuid.BinaryUUID`::
+
+    python -m utils.migrate_binary_ids [--dry-run]
+
+``users.id``, ``matcha_sessions.id`` and ``matcha_sessions.user_id`` are
+converted in place:
+
+- MySQL: the foreign key is dropped, each table's ID columns are widened to
+  ``VARBINARY(36)`` (keeping the text bytes), rewritten with
+  ``UNHEX(REPLACE(id, '-', ''))`` and narrowed to ``BINARY(16)``, then the
+  foreign key is added back. Both ``ALTER`` statements copy the table and the
+  ``UPDATE`` rewrites every row, so run it in a maintenance window.
+- SQLite: column types cannot be altered, but any column can hold a BLOB, so
+  the text values are replaced by their bytes with a registered function.
+
+``session_rollups`` and ``user_search_grams`` only hold data derived from the
+two tables, so they are dropped, recreated with the new column types and
+rebuilt. Running the migration again finds nothing to convert and only
+rebuilds those two tables.
+"""
+import argparse
+import sys
+from uuid import UUID
+
+from sqlalchemy import text
+
+from models.db_models import SessionRollupDB, UserSearchGramDB
+from services import stats, user_search
+from utils.database import SessionLocal, engine, init_db
+
+# Table -> (column, nullable) pairs holding UUIDs as text
+ID_COLUMNS = {
+    "users": [("id", False)],
+    "matcha_sessions": [("id", False), ("user_id", True)],
+}
+
+# Tables rebuilt from users and matcha_sessions instead of converted
+DERIVED_TABLES = (SessionRollupDB.__table__, UserSearchGramDB.__table__)
+
+
+def _mysql_pending(connection) -> list:
+    """Tables whose ID columns are not BINARY(16) yet on MySQL (VARBINARY: an interrupted run)."""
+    rows = connection.execute(text(
+        "SELECT TABLE_NAME FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND COLUMN_NAME = 'id' AND DATA_TYPE IN ('char', 'varchar', 'varbinary') "
+        "AND TABLE_NAME IN ('users', 'matcha_sessions')"
+    ))
+    return [row[0] for row in rows]
+
+
+def _sqlite_pending(connection) -> list:
+    """Tables that still hold text IDs on SQLite."""
+    return [
+        table for table, columns in ID_COLUMNS.items()
+        if connection.execute(text(
+            f"SELECT 1 FROM {table} WHERE "
+            + " OR ".join(f"typeof({column}) = 'text'" for column, _ in columns)
+            + " LIMIT 1"
+        )).first()
+    ]
+
+
+def _mysql_foreign_keys(connection) -> list:
+    return [row[0] for row in connection.execute(text(
+        "SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS "
+        "WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = 'matcha_sessions' "
+        "AND REFERENCED_TABLE_NAME = 'users'"
+    ))]
+
+
+def _migrate_mysql(connection, tables: list) -> None:
+    # Every ALTER commits implicitly, so each step must be safe to repeat
+    # after a run that stopped part-way
+    if tables:
+        for name in _mysql_foreign_keys(connection):
+            connection.exec_driver_sql(f"ALTER TABLE matcha_sessions DROP FOREIGN KEY `{name}`")
+    for table in tables:
+        columns = ID_COLUMNS[table]
+
+        def modify(column_type):
+            return ", ".join(
+                f"MODIFY `{column}` {column_type}{'' if nullable else ' NOT NULL'}" for column, nullable in columns
+            )
+
+        connection.exec_driver_sql(f"ALTER TABLE `{table}` {modify('VARBINARY(36)')}")
+        connection.exec_driver_sql(
+            f"UPDATE `{table}` SET "
+            + ", ".join(
+                f"`{column}` = IF(LENGTH(`{column}`) = 36, UNHEX(REPLACE(`{column}`, '-', '')), `{column}`)"
+                for column, _ in columns
+            )
+        )
+        connection.exec_driver_sql(f"ALTER TABLE `{table}` {modify('BINARY(16)')}")
+    if not _mysql_foreign_keys(connection):
+        connection.exec_driver_sql("ALTER TABLE matcha_sessions ADD FOREIGN KEY (user_id) REFERENCES users (id)")
+
+
+def _migrate_sqlite(connection, tables: list) -> None:
+    connection.connection.driver_connection.create_function(
+        "uuid_bytes", 1, lambda value: UUID(value).bytes if isinstance(value, str) else value, deterministic=True
+    )
+    for table in tables:
+        connection.exec_driver_sql(
+            f"UPDATE {table} SET "
+            + ", ".join(f"{column} = uuid_bytes({column})" for column, _ in ID_COLUMNS[table])
+        )
+
+
+def migrate(dry_run: bool = False) -> list:
+    """Convert the ID columns that still hold text; returns the tables converted."""
+    dialect = engine.dialect.name
+    if dialect not in ("mysql", "sqlite"):
+        raise NotImplementedError(f"No ID migration for {dialect}")
+    with engine.begin() as connection:
+        pending = _mysql_pending(connection) if dialect == "mysql" else _sqlite_pending(connection)
+        if dry_run:
+            return pending
+        if dialect == "mysql":
+            _migrate_mysql(connection, pending)
+        else:
+            _migrate_sqlite(connection, pending)
+        for table in DERIVED_TABLES:
+            table.drop(connection, checkfirst=True)
+
+    # Recreate the derived tables with the new column types, then fill them
+    init_db()
+    db = SessionLocal()
+    try:
+        stats.rebuild(db)
+        user_search.rebuild(db)
+    finally:
+        db.close()
+    return pending
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Convert stored UUIDs from CHAR(36) to 16-byte binary.")
+    parser.add_argument("--dry-run", action="store_true", help="only list the tables that still need converting")
+    args = parser.parse_args(argv)
+
+    tables = migrate(dry_run=args.dry_run)
+    if args.dry_run:
+        print(f"To convert: {', '.join(tables) or 'nothing'}")
+    else:
+        print(f"Converted: {', '.join(tables) or 'nothing'}; rebuilt session rollups and user search index")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+Build the indexes declared on the models that existing tables lack.
+
+Starting the API creates missing tables with their indexes, but only reports
+indexes added to the models after a table was created: on a large table an
+index build takes minutes, and every instance would start it at once. Run
+this once per deploy that adds or retires an index, before or after the new version
+starts::
+
+    python -m utils.migrate_indexes [--dry-run]
+
+Indexes are created one at a time, each in its own statement. On MySQL a
+regular index is built online (``ALGORITHM=INPLACE LOCK=NONE``), so reads
+and writes carry on meanwhile. InnoDB cannot take writes while it adds a
+``FULLTEXT`` index, so that one is built with ``LOCK=SHARED``: reads carry on,
+but session writes wait until it is done. Schedule it in a quiet period.
+
+Indexes the models no longer declare are listed in ``RETIRED_INDEXES`` and
+dropped afterwards, once their replacements exist (online on MySQL as well).
+Running the script again creates and drops nothing.
+"""
+import argparse
+import sys
+import time
+
+from sqlalchemy import inspect
+from sqlalchemy.schema import CreateIndex
+
+import models.db_models  # noqa: F401  (declares the tables on Base.metadata)
+from utils.database import engine, missing_indexes
+
+
+# Table -> indexes superseded by a model index, still present on older tables
+RETIRED_INDEXES = {
+    # Covered by the leading column of ix_matcha_sessions_user_date
+    "matcha_sessions": ["ix_matcha_sessions_user_id"],
+}
+
+
+def retired_indexes(connection) -> list:
+    """``(table, index)`` name pairs of ``RETIRED_INDEXES`` that still exist."""
+    inspector = inspect(connection)
+    return [
+        (table, name)
+        for table, names in RETIRED_INDEXES.items()
+        if inspector.has_table(table)
+        for name in names
+        if name in {index["name"] for index in inspector.get_indexes(table)}
+    ]
+
+
+def _is_fulltext(index) -> bool:
+    return index.dialect_options["mysql"]["prefix"] == "FULLTEXT"
+
+
+def create_index(connection, index) -> None:
+    if connection.dialect.name != "mysql":
+        index.create(bind=connection)
+        return
+    ddl = str(CreateIndex(index).compile(dialect=connection.dialect))
+    lock = "SHARED" if _is_fulltext(index) else "NONE"
+    connection.exec_driver_sql(f"{ddl} ALGORITHM=INPLACE LOCK={lock}")
+
+
+def drop_index(connection, table: str, name: str) -> None:
+    if connection.dialect.name != "mysql":
+        connection.exec_driver_sql(f"DROP INDEX {name}")
+        return
+    connection.exec_driver_sql(f"DROP INDEX {name} ON {table} ALGORITHM=INPLACE LOCK=NONE")
+
+
+def migrate(dry_run: bool = False) -> tuple:
+    """
+    Create the missing indexes of existing tables, then drop the retired
+    ones; returns the names created and the names dropped.
+    """
+    with engine.connect() as connection:
+        missing = missing_indexes(connection)
+        retired = retired_indexes(connection)
+    created, dropped = [index.name for index in missing], [name for _, name in retired]
+    if dry_run:
+        return created, dropped
+    for index in missing:
+        started = time.perf_counter()
+        with engine.begin() as connection:
+            create_index(connection, index)
+        print(f"Created {index.name} on {index.table.name} in {time.perf_counter() - started:.1f}s")
+    for table, name in retired:
+        with engine.begin() as connection:
+            drop_index(connection, table, name)
+        print(f"Dropped {name} on {table}")
+    return created, dropped
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Create model indexes missing from existing tables, drop retired ones.")
+    parser.add_argument("--dry-run", action="store_true", help="only list the missing and retired indexes")
+    args = parser.parse_args(argv)
+
+    created, dropped = migrate(dry_run=args.dry_run)
+    if args.dry_run:
+        print(f"Missing: {', '.join(created) or 'nothing'}")
+        print(f"Retired: {', '.join(dropped) or 'nothing'}")
+    elif not created and not dropped:
+        print("Every index exists and none is retired")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+"""
+Widen ``created_at``/``updated_at`` on existing MySQL tables to ``DATETIME(6)``.
+
+The models declare microsecond timestamps, so two writes within the same
+second still produce different ``updated_at``-based ETags. Tables created
+before that are still ``DATETIME`` (whole seconds), and MySQL rounds the
+microseconds the API writes. Run this once, before deploying a version that
+requires the wider columns::
+
+    python -m utils.migrate_timestamps [--dry-run]
+
+Each table is altered with one statement covering all of its narrow columns.
+Changing the precision changes the stored size, so InnoDB copies the table
+(``ALGORITHM=COPY LOCK=SHARED``): reads carry on, but writes to the table wait
+until it is done. Schedule it in a quiet period. Existing values keep their
+whole seconds. The columns to widen are read from
+``information_schema.COLUMNS.DATETIME_PRECISION``, so running the script again
+alters nothing. Other databases need no migration.
+"""
+import argparse
+import sys
+import time
+from itertools import groupby
+
+import models.db_models  # noqa: F401  (declares the tables on Base.metadata)
+from utils.database import engine, low_precision_timestamps
+
+
+def modify_statement(table_name: str, columns: list, dialect) -> str:
+    """``ALTER TABLE`` widening ``columns`` of ``table_name`` to their declared type."""
+    clauses = ", ".join(
+        f"MODIFY {column.name} {column.type.compile(dialect=dialect)} {'NULL' if column.nullable else 'NOT NULL'}"
+        for column in columns
+    )
+    return f"ALTER TABLE {table_name} {clauses}, ALGORITHM=COPY, LOCK=SHARED"
+
+
+def migrate(dry_run: bool = False) -> list:
+    """Widen the narrow timestamp columns; returns them as ``table.column`` names."""
+    with engine.connect() as connection:
+        narrow = low_precision_timestamps(connection)
+    names = [f"{column.table.name}.{column.name}" for column in narrow]
+    if dry_run:
+        return names
+    for table, columns in groupby(narrow, key=lambda column: column.table):
+        started = time.perf_counter()
+        with engine.begin() as connection:
+            connection.exec_driver_sql(modify_statement(table.name, list(columns), connection.dialect))
+        print(f"Widened the timestamps of {table.name} in {time.perf_counter() - started:.1f}s")
+    return names
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Widen MySQL timestamp columns to microsecond precision.")
+    parser.add_argument("--dry-run", action="store_true", help="only list the columns to widen")
+    args = parser.parse_args(argv)
+
+    names = migrate(dry_run=args.dry_run)
+    if args.dry_run:
+        print(f"To widen: {', '.join(names) or 'nothing'}")
+    elif not names:
+        print("Every timestamp column has microsecond precision")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,42 @@
+"""
+Incremental NDJSON (newline-delimited JSON) reading.
+"""
+from typing import AsyncIterator, List, Tuple
+
+# Longest single line accepted; guards memory against a body with no newlines
+MAX_LINE_BYTES = 1024 * 1024
+
+
+class LineTooLongError(ValueError):
+    """Raised when an NDJSON line exceeds :data:`MAX_LINE_BYTES`."""
+
+
+async def iter_ndjson_chunks(
+    stream: AsyncIterator[bytes], chunk_size: int
+) -> AsyncIterator[List[Tuple[int, bytes]]]:
+    """
+    Group the non-blank lines of a byte stream into lists of ``chunk_size``.
+
+    Lines are yielded as ``(line_number, raw_bytes)`` with 1-based line
+    numbers, so memory use is bounded by the chunk size rather than the
+    length of the stream.
+    """
+    buffer = b""
+    line_no = 0
+    chunk: List[Tuple[int, bytes]] = []
+    async for data in stream:
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        if len(buffer) > MAX_LINE_BYTES:
+            raise LineTooLongError(f"Line {line_no + len(lines) + 1} exceeds {MAX_LINE_BYTES} bytes")
+        for line in lines:
+            line_no += 1
+            if line.strip():
+                chunk.append((line_no, line))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if buffer.strip():
+        chunk.append((line_no + 1, buffer))
+    if chunk:
+        yield chunk
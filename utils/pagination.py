@@ -0,0 +1,97 @@
+"""
+Keyset (cursor) pagination helpers.
+
+Pages are ordered by a fixed list of columns that ends with a unique column
+(e.g. ``created_at, id``). The cursor handed to clients is an opaque,
+URL-safe encoding of the ordering values of the last row on the page, and
+the next page is fetched with a ``WHERE (a, b) > (:a, :b)`` style predicate,
+so every page costs one index range scan no matter how deep the client is.
+"""
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from typing import Any, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a client supplies a cursor that cannot be decoded."""
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    return value
+
+
+def _decode_value(column, raw: Any) -> Any:
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(raw)
+    if python_type is date:
+        return date.fromisoformat(raw)
+    if python_type is UUID:
+        return UUID(str(raw))
+    return python_type(raw)
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Encode the ordering values of a row into an opaque cursor string."""
+    payload = json.dumps([_encode_value(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: Sequence) -> List[Any]:
+    """Decode a cursor produced by :func:`encode_cursor` for ``columns``."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(raw, list) or len(raw) != len(columns):
+            raise ValueError("cursor shape mismatch")
+        return [_decode_value(col, v) for col, v in zip(columns, raw)]
+    except (ValueError, TypeError, binascii.Error) as e:
+        raise InvalidCursorError("Invalid pagination cursor") from e
+
+
+def _after(columns: Sequence, values: Sequence[Any], descending: bool):
+    """Build ``(c1, c2, ...) > (v1, v2, ...)`` expanded into portable OR/AND form."""
+    clauses = []
+    for i, col in enumerate(columns):
+        equal_prefix = [columns[j] == values[j] for j in range(i)]
+        step = col < values[i] if descending else col > values[i]
+        clauses.append(and_(*equal_prefix, step))
+    return or_(*clauses)
+
+
+def paginate(
+    query,
+    columns: Sequence,
+    cursor: Optional[str],
+    limit: int,
+    descending: bool = False,
+) -> Tuple[list, Optional[str]]:
+    """
+    Fetch one page of ``query`` ordered by ``columns``.
+
+    Returns the rows of the page and the cursor for the next page, or ``None``
+    when this is the last page. One extra row is fetched to detect the end.
+    """
+    if cursor:
+        query = query.filter(_after(columns, decode_cursor(cursor, columns), descending))
+    order = [c.desc() for c in columns] if descending else list(columns)
+    rows = query.order_by(*order).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, c.key) for c in columns])
+    return rows, next_cursor
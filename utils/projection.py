@@ -0,0 +1,127 @@
+"""
+Sparse fieldsets and session embedding for user reads.
+
+``GET /users`` and ``GET /users/{user_id}`` accept ``fields``, ``include`` and
+``sessions_limit``. Only the requested user columns are selected, sessions are
+fetched only when embedded, and ``sessions_limit`` is applied in SQL with a
+``ROW_NUMBER()`` window per user, so both the payload and the database work
+follow what the client asked for.
+
+Like utils/filters.py, this module does not use postponed annotations because
+:class:`UserProjection` is a FastAPI class dependency.
+"""
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException, Query
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from models.db_models import MatchaSessionDB, UserDB
+from models.matcha_session import MatchaSessionBase
+from models.user import UserRead
+from utils.etag import make_etag
+
+# Selectable user fields, in UserRead's order
+USER_FIELDS = tuple(f for f in UserRead.model_fields if f != "matcha_sessions")
+
+# Fields of an embedded session, as in the full UserRead body
+SESSION_FIELDS = tuple(MatchaSessionBase.model_fields)
+
+# Largest accepted sessions_limit
+MAX_SESSIONS_LIMIT = 1000
+
+# Always loaded: id identifies the row, created_at/id are the pagination
+# order and id/updated_at make up the ETag
+_REQUIRED_COLUMNS = ("id", "created_at", "updated_at")
+
+
+def _split(value: str) -> List[str]:
+    return [part.strip() for part in value.split(",") if part.strip()]
+
+
+class UserProjection:
+    """The representation of a user requested through query parameters."""
+
+    def __init__(
+        self,
+        fields: Optional[str] = Query(
+            None,
+            description="Comma-separated user fields to return (id is always included), "
+            "e.g. username,first_name,last_name",
+        ),
+        include: Optional[str] = Query(
+            None,
+            description="Embedded relations: 'sessions', or empty for none. "
+            "Defaults to sessions unless fields is given",
+        ),
+        sessions_limit: Optional[int] = Query(
+            None,
+            ge=0,
+            le=MAX_SESSIONS_LIMIT,
+            description="Embed at most this many sessions per user, most recent session_date first",
+        ),
+    ):
+        self.is_default = fields is None and include is None and sessions_limit is None
+
+        requested = _split(fields) if fields is not None else list(USER_FIELDS)
+        embed = "matcha_sessions" in requested
+        requested = [f for f in requested if f != "matcha_sessions"]
+        unknown = [f for f in requested if f not in USER_FIELDS]
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown field(s): {', '.join(unknown)}. Allowed: {', '.join(USER_FIELDS)}, matcha_sessions",
+            )
+        self.fields = tuple(f for f in USER_FIELDS if f == "id" or f in requested)
+
+        if include is not None:
+            relations = _split(include)
+            if any(r != "sessions" for r in relations):
+                raise HTTPException(status_code=400, detail="include only supports 'sessions'")
+            embed = embed or bool(relations)
+        elif fields is None:
+            embed = True
+        self.sessions = embed
+        self.sessions_limit = sessions_limit
+
+    def user_columns(self):
+        """UserDB columns to select: the requested fields plus those needed for paging and ETags."""
+        names = list(self.fields) + [c for c in _REQUIRED_COLUMNS if c not in self.fields]
+        return [getattr(UserDB, name) for name in names]
+
+    def etag(self, representation_etag: str) -> str:
+        """Tag a user or page ETag with this representation, so variants never match each other."""
+        return make_etag(representation_etag, self.fields, self.sessions, self.sessions_limit)
+
+    def load_sessions(self, db: Session, user_ids: List[str]) -> Dict[str, List[dict]]:
+        """Embedded sessions per user ID, most recent first, capped by sessions_limit in SQL."""
+        by_user = defaultdict(list)
+        if not self.sessions or not user_ids or self.sessions_limit == 0:
+            return by_user
+        s = MatchaSessionDB
+        columns = [s.user_id] + [getattr(s, name) for name in SESSION_FIELDS]
+        recency = (s.session_date.desc(), s.id.desc())
+        if self.sessions_limit is None:
+            query = select(*columns).where(s.user_id.in_(user_ids)).order_by(s.user_id, *recency)
+        else:
+            ranked = (
+                select(*columns, func.row_number().over(partition_by=s.user_id, order_by=recency).label("rn"))
+                .where(s.user_id.in_(user_ids))
+                .subquery()
+            )
+            query = (
+                select(*(ranked.c[c.key] for c in columns))
+                .where(ranked.c.rn <= self.sessions_limit)
+                .order_by(ranked.c.user_id, ranked.c.session_date.desc(), ranked.c.id.desc())
+            )
+        for row in db.execute(query):
+            by_user[row.user_id].append({name: getattr(row, name) for name in SESSION_FIELDS})
+        return by_user
+
+    def render(self, row, sessions: Dict[str, List[dict]]) -> dict:
+        """The response object for one selected user row."""
+        item = {name: getattr(row, name) for name in self.fields}
+        if self.sessions:
+            item["matcha_sessions"] = sessions.get(row.id, [])
+        return item
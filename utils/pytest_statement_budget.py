@@ -0,0 +1,35 @@
+"""
+pytest plugin: fail a test when a block of code exceeds its SQL statement budget.
+
+Enable it with ``-p utils.pytest_statement_budget`` or
+``pytest_plugins = ["utils.pytest_statement_budget"]`` in a conftest, then::
+
+    def test_get_user_is_two_queries(client, user_id, statement_budget):
+        with statement_budget(2):
+            client.get(f"/users/{user_id}")
+
+Statements are recorded on the engines themselves, so requests served on the
+TestClient's worker thread (or through the async engine) are counted too.
+On failure the statements are listed, which usually shows the lazy load or
+refresh that crept in. ``tests/conftest.py`` enables it for the test suite.
+"""
+from contextlib import contextmanager
+
+import pytest
+
+
+@pytest.fixture
+def statement_budget():
+    """Context manager factory: ``with statement_budget(n):`` fails the test above ``n`` statements."""
+    # Imported here so a conftest can set DATABASE_URL before the engine is built
+    from utils.database import record_statements
+
+    @contextmanager
+    def budget(limit: int):
+        with record_statements() as statements:
+            yield statements
+        if len(statements) > limit:
+            listing = "\n".join("  " + " ".join(statement.split())[:200] for statement in statements)
+            pytest.fail(f"{len(statements)} SQL statements executed, budget is {limit}:\n{listing}", pytrace=False)
+
+    return budget
@@ -0,0 +1,213 @@
+"""
+Synthetic data for reproducing production volumes locally.
+
+Generates users and matcha sessions with realistic shapes and writes them
+with multi-row Core INSERTs, one transaction per chunk, into whatever
+database DATABASE_URL (or the DB_* settings) points at:
+
+- sessions per user follow a log-normal distribution, so most users have a
+  handful and a long tail has hundreds;
+- brands, locations and favorite places are Zipf-distributed over fixed
+  vocabularies, so a few values dominate as they do in real data;
+- ``matcha_type`` only takes the four valid MatchaType values, weighted;
+- sessions are spread between the user's join date and the end of the
+  range, ratings cluster around 4 and some are missing, and about a third
+  of sessions have notes built from a tasting vocabulary.
+
+Users are added to the typeahead search index and users and sessions to the
+change feed as they are written. Session
+rollups are rebuilt once at the end (``--no-rollups`` skips that),
+which is far cheaper than maintaining them row by row during the load.
+
+    python -m utils.seed --users 100000 [--mean-sessions 20] [--chunk-rows 20000] [--seed 1]
+"""
+import argparse
+import math
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+from itertools import accumulate
+from uuid import UUID
+
+from sqlalchemy import insert
+
+from models.db_models import MatchaSessionDB, UserDB
+from services.changes import record_changes, session_change, user_change
+from services.stats import rebuild
+from services.user_search import index_users
+from utils.database import SessionLocal, init_db
+
+MATCHA_TYPES = ("Ceremonial Grade", "Premium Grade", "Latte Grade", "Culinary Grade")
+MATCHA_TYPE_WEIGHTS = (45, 25, 20, 10)
+
+BRANDS = (
+    "Ippodo", "Marukyu Koyamaen", "Aiya", "Encha", "Matchaful", "Naoki", "Rishi", "Jade Leaf",
+    "Mizuba", "Kettl", "Yamamasa Koyamaen", "Hibiki-an", "Chalait", "DoMatcha", "Sazen", "Uji Origin",
+)
+LOCATIONS = (
+    "Home", "Office", "Cha Cha Matcha NYC", "Blue Bottle", "Cafe Kitsune", "Matchabar", "Ippodo Tea NYC",
+    "Library", "Park", "Train", "Kettl Greenpoint", "Hotel", "Airport", "Friend's place", "Tea ceremony",
+)
+FIRST_NAMES = (
+    "Sakura", "Hana", "Yuki", "Emi", "Kenji", "Haruto", "Aiko", "Ren", "Mei", "Sora",
+    "Alex", "Sam", "Jordan", "Taylor", "Morgan", "Riley", "Casey", "Jamie", "Avery", "Quinn",
+)
+LAST_NAMES = (
+    "Tanaka", "Sato", "Suzuki", "Takahashi", "Watanabe", "Ito", "Yamamoto", "Nakamura", "Kobayashi",
+    "Kato", "Smith", "Johnson", "Lee", "Garcia", "Chen", "Kim", "Nguyen", "Patel", "Brown", "Lopez",
+)
+NOTE_WORDS = (
+    "umami", "grassy", "sweet", "bitter", "creamy", "frothy", "vegetal", "nutty", "smooth", "astringent",
+    "bright", "mellow", "rich", "clumpy", "perfect", "morning", "ritual", "foam", "whisked", "oat milk",
+    "iced", "usucha", "koicha", "seaweed", "chocolatey", "floral", "earthy", "delicate",
+)
+
+# Sessions per user: log-normal with this sigma, scaled to the requested mean
+SESSIONS_SIGMA = 1.1
+MAX_SESSIONS_PER_USER = 5000
+
+
+def zipf_cum_weights(count: int, s: float = 1.1):
+    """Cumulative Zipf(s) weights for ranks 1..count, for ``random.choices(cum_weights=...)``."""
+    return list(accumulate(1 / rank ** s for rank in range(1, count + 1)))
+
+
+class Generator:
+    """Deterministic (per seed) source of user and session rows."""
+
+    def __init__(self, seed: int, mean_sessions: float, start: date, end: date, run_tag: str):
+        # Seeded with the tag too, so a second run into the same database draws new IDs
+        self.rng = random.Random(f"{seed}:{run_tag}")
+        self.mu = math.log(max(mean_sessions, 0.01)) - SESSIONS_SIGMA ** 2 / 2
+        self.start = start
+        self.days = (end - start).days
+        self.run_tag = run_tag
+        self.brand_weights = zipf_cum_weights(len(BRANDS))
+        self.location_weights = zipf_cum_weights(len(LOCATIONS))
+        self.type_weights = list(accumulate(MATCHA_TYPE_WEIGHTS))
+
+    def uuid(self) -> UUID:
+        return UUID(int=self.rng.getrandbits(128), version=4)
+
+    def user(self, index: int, now: datetime):
+        """One user row and its number of sessions."""
+        rng = self.rng
+        join_offset = rng.randrange(self.days)
+        join_date = self.start + timedelta(days=join_offset)
+        username = f"{self.run_tag}_{index}"
+        created_at = datetime.combine(join_date, datetime.min.time()) + timedelta(seconds=rng.randrange(86400))
+        row = {
+            "id": self.uuid(),
+            "username": username,
+            "email": f"{username}@example.com",
+            "first_name": rng.choice(FIRST_NAMES),
+            "last_name": rng.choice(LAST_NAMES),
+            "phone": f"+1-212-555-{rng.randrange(10000):04d}" if rng.random() < 0.6 else None,
+            "favorite_matcha_powder": rng.choices(BRANDS, cum_weights=self.brand_weights)[0],
+            "favorite_matcha_place": rng.choices(LOCATIONS, cum_weights=self.location_weights)[0],
+            "matcha_budget": round(rng.lognormvariate(4.5, 0.6), 2) if rng.random() < 0.8 else None,
+            "join_date": join_date,
+            "created_at": created_at,
+            "updated_at": now,
+        }
+        sessions = min(int(rng.lognormvariate(self.mu, SESSIONS_SIGMA)), MAX_SESSIONS_PER_USER)
+        return row, sessions, join_offset
+
+    def sessions(self, user_id: UUID, count: int, join_offset: int, now: datetime):
+        """``count`` session rows for a user who joined ``join_offset`` days into the range."""
+        rng = self.rng
+        span = self.days - join_offset
+        brands = rng.choices(BRANDS, cum_weights=self.brand_weights, k=count)
+        locations = rng.choices(LOCATIONS, cum_weights=self.location_weights, k=count)
+        types = rng.choices(MATCHA_TYPES, cum_weights=self.type_weights, k=count)
+        rows = []
+        for i in range(count):
+            session_date = self.start + timedelta(days=join_offset + rng.randrange(span))
+            rating = None if rng.random() < 0.15 else round(min(5.0, max(0.0, rng.gauss(3.9, 0.8))), 1)
+            notes = " ".join(rng.sample(NOTE_WORDS, rng.randint(2, 6))) if rng.random() < 0.35 else None
+            rows.append({
+                "id": self.uuid(),
+                "user_id": user_id,
+                "session_date": session_date,
+                "location": locations[i],
+                "matcha_type": types[i],
+                "brand": None if rng.random() < 0.1 else brands[i],
+                "rating": rating,
+                "notes": notes,
+                "created_at": datetime.combine(session_date, datetime.min.time())
+                + timedelta(seconds=rng.randrange(86400)),
+                "updated_at": now,
+            })
+        return rows
+
+
+def write_chunk(users, sessions) -> None:
+    db = SessionLocal()
+    try:
+        if users:
+            db.execute(insert(UserDB.__table__), users)
+            index_users(db, users)
+        if sessions:
+            db.execute(insert(MatchaSessionDB.__table__), sessions)
+        record_changes(
+            db, [user_change("created", row["id"]) for row in users] + [session_change("created", row) for row in sessions]
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def seed(args) -> int:
+    init_db()
+    now = datetime.utcnow()
+    end = date.today()
+    generator = Generator(args.seed, args.mean_sessions, end - timedelta(days=args.days), end, args.run_tag)
+
+    started = time.perf_counter()
+    written = 0
+    users, sessions = [], []
+    for index in range(args.users):
+        row, count, join_offset = generator.user(index, now)
+        users.append(row)
+        sessions.extend(generator.sessions(row["id"], count, join_offset, now))
+        if len(users) + len(sessions) >= args.chunk_rows or index == args.users - 1:
+            write_chunk(users, sessions)
+            written += len(users) + len(sessions)
+            elapsed = time.perf_counter() - started
+            print(f"{index + 1} users, {written} rows, {written / elapsed * 60:,.0f} rows/min", file=sys.stderr)
+            users, sessions = [], []
+
+    if args.rollups:
+        db = SessionLocal()
+        try:
+            rebuild(db)
+        finally:
+            db.close()
+    elapsed = time.perf_counter() - started
+    print(f"Seeded {args.users} users ({written} rows) in {elapsed:.1f}s, {written / elapsed * 60:,.0f} rows/min")
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Seed the database with synthetic users and matcha sessions.")
+    parser.add_argument("--users", type=int, required=True, help="users to create")
+    parser.add_argument("--mean-sessions", type=float, default=20.0, help="average sessions per user")
+    parser.add_argument("--days", type=int, default=3 * 365, help="date range (ending today) for joins and sessions")
+    parser.add_argument("--chunk-rows", type=int, default=20000, help="rows written per transaction")
+    parser.add_argument("--seed", type=int, default=1, help="random seed; the same seed generates the same data")
+    parser.add_argument(
+        "--run-tag", default=None,
+        help="username prefix (default: derived from the seed); use a new one to seed again into the same database",
+    )
+    parser.add_argument("--no-rollups", dest="rollups", action="store_false", help="skip rebuilding the stats rollups")
+    args = parser.parse_args(argv)
+    if args.run_tag is None:
+        args.run_tag = f"s{args.seed}"
+    if not 1 <= len(args.run_tag) <= 8 or not args.run_tag.replace("_", "").isalnum():
+        parser.error("--run-tag must be 1-8 letters, digits or underscores")
+    return seed(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
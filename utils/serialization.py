@@ -0,0 +1,44 @@
+"""
+ORM rows to JSON response bodies in one pass.
+
+Endpoints that return a model instance pay for it three times: building the
+instance in Python, FastAPI re-validating it against ``response_model`` and
+then encoding it through ``json.dumps``. Here a cached ``TypeAdapter`` reads
+the ORM attributes directly (``from_attributes``), parsing IDs and dates in
+pydantic-core, and encodes the result with pydantic's own JSON serializer.
+Endpoints keep their ``response_model`` for the OpenAPI schema and return the
+bytes in a plain :class:`Response`, which FastAPI passes through untouched.
+"""
+import threading
+from typing import Any, Dict, Optional
+
+from fastapi.responses import Response
+from pydantic import TypeAdapter
+
+_adapters: Dict[Any, TypeAdapter] = {}
+_adapters_lock = threading.Lock()
+
+
+def get_adapter(tp) -> TypeAdapter:
+    """The shared TypeAdapter for ``tp``; building one compiles its validator and serializer."""
+    adapter = _adapters.get(tp)
+    if adapter is None:
+        with _adapters_lock:
+            adapter = _adapters.setdefault(tp, TypeAdapter(tp))
+    return adapter
+
+
+def dump_json(tp, value) -> bytes:
+    """Validate ``value`` (ORM objects, rows, dicts or models) as ``tp`` and encode it."""
+    adapter = get_adapter(tp)
+    return adapter.dump_json(adapter.validate_python(value, from_attributes=True))
+
+
+def json_response(tp, value, status_code: int = 200, headers: Optional[dict] = None) -> Response:
+    """A JSON :class:`Response` holding ``value`` serialized as ``tp``."""
+    return Response(
+        content=dump_json(tp, value),
+        status_code=status_code,
+        media_type="application/json",
+        headers=headers,
+    )
@@ -0,0 +1,38 @@
+"""
+Dialect-aware single-statement upserts.
+
+MySQL spells it ``INSERT ... ON DUPLICATE KEY UPDATE`` and SQLite (used for
+local runs) ``INSERT ... ON CONFLICT (...) DO UPDATE``; both let the update
+refer to the row that failed to insert, which is what lets counters be
+incremented atomically without reading them first.
+"""
+from typing import Callable, Dict, List, Sequence
+
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+
+def upsert_statement(
+    db: Session,
+    table,
+    rows: List[dict],
+    key_columns: Sequence[str],
+    update: Callable[[object], Dict[str, object]],
+):
+    """
+    Build an upsert of ``rows`` into ``table`` for the session's dialect.
+
+    ``key_columns`` name the primary/unique key that detects the conflict
+    (MySQL infers it from the table). ``update(new)`` returns the column
+    assignments applied to an existing row, where ``new`` exposes the values
+    that failed to insert as ``new.<column>``.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "mysql":
+        stmt = mysql_insert(table).values(rows)
+        return stmt.on_duplicate_key_update(**update(stmt.inserted))
+    if dialect == "sqlite":
+        stmt = sqlite_insert(table).values(rows)
+        return stmt.on_conflict_do_update(index_elements=list(key_columns), set_=update(stmt.excluded))
+    raise NotImplementedError(f"Upsert is not implemented for the {dialect} dialect")